@@ -0,0 +1,406 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+import tracemalloc
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from scan_engine import (FILE_CATEGORIES, ScanIndex, FileStore, ParallelScanner, TrigramIndex,
+                         SortIndex, all_extensions, filter_rows, export_rows, list_subfolders,
+                         count_folder_entries, AdaptiveLimiter)
+
+# Benchmarks for the scan engine's hot paths on generated trees.
+#
+#   python benchmark.py --shape wide-flat --shape deep-narrow --latency 2 -o run.json
+#   python benchmark.py --shape wide-flat --latency 2 --compare run.json
+#
+# Trees are generated from a fixed seed and kept between runs, so numbers from
+# two runs with the same arguments can be compared. The latency layer puts a
+# sleep in front of every listing page and stat call to stand in for SMB/NFS
+# round trips; sleeping releases the GIL, just like waiting on the network.
+
+SHAPES = {
+    # depth, subfolders per folder, files per folder
+    'wide-flat': (1, 2000, 50),
+    'deep-narrow': (12, 2, 5),
+    'bushy': (3, 12, 40),
+    'million': (2, 32, 1000),
+}
+
+# Extensions the generated files get; the last few are outside every category
+TREE_EXTENSIONS = [ext for exts in FILE_CATEGORIES.values() for ext in exts] + ['.tmp', '.log', '.bak']
+
+def generate_tree(root, depth, fanout, files, seed=0):
+    """Create the tree with sparse files of random size and fixed modification times"""
+    rng = random.Random(seed)
+    folders = [root]
+    os.makedirs(root, exist_ok=True)
+    
+    for level in range(depth + 1):
+        next_folders = []
+        for folder in folders:
+            for i in range(files):
+                path = os.path.join(folder, f"file_{i:05d}_{rng.randrange(100000)}{rng.choice(TREE_EXTENSIONS)}")
+                with open(path, 'wb') as f:
+                    f.truncate(rng.randrange(1, 10 * 1024 * 1024))
+                mtime = 1600000000 + rng.randrange(100000000)
+                os.utime(path, (mtime, mtime))
+            
+            if level < depth:
+                for i in range(fanout):
+                    subfolder = os.path.join(folder, f"folder_{i:04d}")
+                    os.mkdir(subfolder)
+                    next_folders.append(subfolder)
+        folders = next_folders
+
+def ensure_tree(base_dir, shape, seed=0):
+    """Path of the generated tree for shape, building it on first use"""
+    depth, fanout, files = SHAPES[shape]
+    root = os.path.join(base_dir, f"{shape}-{seed}")
+    # The marker sits next to the tree so it is never scanned itself
+    marker = root + ".json"
+    spec = {'shape': shape, 'depth': depth, 'fanout': fanout, 'files': files, 'seed': seed}
+    
+    try:
+        with open(marker, 'r', encoding='utf-8') as f:
+            if json.load(f) == spec:
+                return root
+    except (OSError, ValueError):
+        pass
+    
+    shutil.rmtree(root, ignore_errors=True)
+    print(f"Generating {shape} tree in {root}...", file=sys.stderr)
+    generate_tree(root, depth, fanout, files, seed)
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump(spec, f)
+    return root
+
+class LatencyFS:
+    """Puts a delay in front of os.scandir and os.stat and counts the calls
+    
+    Every listing costs one round trip plus one per page of entries, and every
+    stat one round trip, which is roughly how SMB and NFS clients behave. With a
+    capacity, the simulated server only keeps that many calls at full speed and
+    slows every call down in proportion beyond it, like a saturated NAS.
+    Use it as a context manager; os is patched for the whole process meanwhile.
+    """
+    
+    def __init__(self, latency=0.0, page_size=100, capacity=0):
+        self.latency = latency
+        self.page_size = page_size
+        self.capacity = capacity
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self.lock:
+            self.counts = {'scandir': 0, 'pages': 0, 'entries': 0, 'stat': 0}
+    
+    def call(self, kind, n=1):
+        with self.lock:
+            self.counts[kind] += n
+        if not self.latency or kind not in ('pages', 'stat'):
+            return
+        
+        with self.lock:
+            self.in_flight += 1
+            load = self.in_flight / self.capacity if self.capacity else 1.0
+        try:
+            time.sleep(self.latency * n * max(1.0, load))
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+    
+    def __enter__(self):
+        self._scandir = os.scandir
+        self._stat = os.stat
+        os.scandir = self.scandir
+        os.stat = self.stat
+        return self
+    
+    def __exit__(self, *exc):
+        os.scandir = self._scandir
+        os.stat = self._stat
+    
+    def scandir(self, path='.'):
+        self.call('scandir')
+        return SlowScandir(self, self._scandir(path))
+    
+    def stat(self, path, *args, **kwargs):
+        self.call('stat')
+        return self._stat(path, *args, **kwargs)
+
+class SlowScandir:
+    def __init__(self, fs, iterator):
+        self.fs = fs
+        self.iterator = iterator
+        self.count = 0
+        # Opening the listing returns the first page
+        fs.call('pages')
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.iterator.close()
+    
+    def close(self):
+        self.iterator.close()
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        entry = next(self.iterator)
+        self.count += 1
+        self.fs.call('entries')
+        if self.count % self.fs.page_size == 0:
+            self.fs.call('pages')
+        return SlowDirEntry(self.fs, entry)
+
+class SlowDirEntry:
+    """DirEntry whose type comes free with the listing but whose stat() is a round trip"""
+    
+    __slots__ = ('fs', 'entry', 'name', 'path')
+    
+    def __init__(self, fs, entry):
+        self.fs = fs
+        self.entry = entry
+        self.name = entry.name
+        self.path = entry.path
+    
+    def is_dir(self, follow_symlinks=True):
+        return self.entry.is_dir(follow_symlinks=follow_symlinks)
+    
+    def is_file(self, follow_symlinks=True):
+        return self.entry.is_file(follow_symlinks=follow_symlinks)
+    
+    def is_symlink(self):
+        return self.entry.is_symlink()
+    
+    def stat(self, follow_symlinks=True):
+        self.fs.call('stat')
+        return self.entry.stat(follow_symlinks=follow_symlinks)
+    
+    def inode(self):
+        return self.entry.inode()
+    
+    def __fspath__(self):
+        return self.path
+
+def bench_scan(root, workers, **context):
+    store = FileStore(FILE_CATEGORIES)
+    ParallelScanner(root, all_extensions(FILE_CATEGORIES), store, workers=workers).run()
+    context['state']['store'] = store
+    return {'files': len(store)}
+
+def bench_scan_adaptive(root, workers, **context):
+    """Full scan with an AdaptiveLimiter choosing how many of the workers may call the server"""
+    store = FileStore(FILE_CATEGORIES)
+    limiter = AdaptiveLimiter(root, cap=workers)
+    ParallelScanner(root, all_extensions(FILE_CATEGORIES), store, workers=workers, limiter=limiter).run()
+    concurrency = limiter.snapshot()
+    return {'files': len(store), 'final_limit': concurrency['limit'], 'peak_limit': concurrency['peak'],
+            'backoffs': concurrency['decreases']}
+
+def bench_rescan_index(root, workers, **context):
+    """Second scan of an unchanged tree with the folder index, as the GUI does by default"""
+    index = context['state']['index']
+    extensions = all_extensions(FILE_CATEGORIES)
+    scanner = ParallelScanner(root, extensions, FileStore(FILE_CATEGORIES), workers=workers,
+                              cache=index.load_tree(root, extensions))
+    scanner.run()
+    index.save_tree(scanner.index_updates, scanner.removed_directories())
+    return {'files': len(scanner.store), 'cached': scanner.counters['directories_cached']}
+
+def bench_folders(root, workers, **context):
+    """Folder pane load: list the top folders, then count each one's contents in parallel"""
+    folders = list_subfolders(root)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda folder: count_folder_entries(folder['path']), folders))
+    return {'folders': len(folders)}
+
+def bench_filter(root, workers, **context):
+    """Category filter, linear name search, index build and indexed name search"""
+    store = context['state']['store']
+    rows = range(len(store))
+    documents = {store.category_code('Documents'), store.category_code('Images')}
+    
+    by_category = filter_rows(store, rows, documents)
+    by_name = filter_rows(store, rows, documents, "file_0001")
+    index = TrigramIndex()
+    index.sync(store)
+    indexed = filter_rows(store, rows, documents, "file_0001", index)
+    assert list(indexed) == list(by_name)
+    context['state']['rows'] = array('I', by_category)
+    return {'category_rows': len(by_category), 'search_rows': len(by_name)}
+
+def bench_sort(root, workers, **context):
+    """Column orders built from scratch, then the filtered rows re-sorted from the cache"""
+    store = context['state']['store']
+    # The filter benchmark's rows when it ran, else every row
+    rows = context['state'].get('rows') or array('I', range(len(store)))
+    index = SortIndex()
+    for column in SortIndex.COLUMNS:
+        index.order(store, column)
+    
+    started = time.perf_counter()
+    for column in SortIndex.COLUMNS:
+        index.sort(store, rows, column)
+        index.sort(store, rows, column, descending=True)
+    resort_ms = (time.perf_counter() - started) * 1000 / (2 * len(SortIndex.COLUMNS))
+    return {'rows': len(rows), 'resort_ms': round(resort_ms, 2)}
+
+def bench_export(root, workers, **context):
+    store = context['state']['store']
+    rows = array('I', range(len(store)))
+    sizes = {}
+    for name in ("export.csv", "export.jsonl.gz"):
+        path = os.path.join(context['work_dir'], name)
+        export_rows(store, rows, path)
+        sizes[name] = os.path.getsize(path)
+    return {'rows': len(rows), 'bytes': sizes}
+
+# Run in this order - filter, sort and export use the store left by the scan
+BENCHMARKS = [
+    ('scan', bench_scan),
+    ('scan_adaptive', bench_scan_adaptive),
+    ('rescan_index', bench_rescan_index),
+    ('folders', bench_folders),
+    ('filter', bench_filter),
+    ('sort', bench_sort),
+    ('export', bench_export),
+]
+
+def run_benchmark(func, fs, repeat, **context):
+    """Median wall time over repeat runs, then one more run under tracemalloc for peak memory"""
+    times = []
+    for _ in range(repeat):
+        fs.reset()
+        started = time.perf_counter()
+        result = func(**context)
+        times.append(time.perf_counter() - started)
+    calls = dict(fs.counts)
+    
+    # Tracing slows Python down a lot, so memory gets its own run
+    tracemalloc.start()
+    try:
+        func(**context)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    return {
+        'wall_seconds': statistics.median(times),
+        'wall_seconds_all': times,
+        'peak_memory_mb': round(peak / (1024 * 1024), 2),
+        'calls': calls,
+        'result': result
+    }
+
+def run_shape(shape, args):
+    root = ensure_tree(args.tree_dir, shape, args.seed)
+    work_dir = tempfile.mkdtemp(prefix="nfe-bench-")
+    state = {'index': ScanIndex(os.path.join(work_dir, "index.db"))}
+    results = {}
+    
+    try:
+        with LatencyFS(args.latency / 1000.0, args.page_size, args.server_capacity) as fs:
+            # Prime the index so rescan_index measures the unchanged-tree path
+            extensions = all_extensions(FILE_CATEGORIES)
+            state['index'].load_tree(root, extensions)
+            primer = ParallelScanner(root, extensions, workers=args.workers, cache={})
+            primer.run()
+            state['index'].save_tree(primer.index_updates)
+            
+            for name, func in BENCHMARKS:
+                if args.only and name not in args.only:
+                    continue
+                if name in ('filter', 'sort', 'export') and 'store' not in state:
+                    bench_scan(root, args.workers, state=state, work_dir=work_dir)
+                results[name] = run_benchmark(func, fs, args.repeat, root=root, workers=args.workers,
+                                              state=state, work_dir=work_dir)
+                print(f"  {shape:<12} {name:<13} {results[name]['wall_seconds']:>9.3f} s "
+                      f"{results[name]['peak_memory_mb']:>9.1f} MB  {format_calls(results[name]['calls'])}",
+                      file=sys.stderr)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    return results
+
+def format_calls(calls):
+    return ", ".join(f"{kind} {count:,}" for kind, count in calls.items() if count)
+
+def compare(results, baseline):
+    """Print wall time and memory changes against an earlier results file"""
+    print(f"\n{'shape':<12} {'benchmark':<13} {'wall':>10} {'change':>8} {'memory':>10} {'change':>8}")
+    for shape, benchmarks in results['shapes'].items():
+        for name, current in benchmarks.items():
+            before = baseline.get('shapes', {}).get(shape, {}).get(name)
+            if not before:
+                continue
+            wall_change = (current['wall_seconds'] / before['wall_seconds'] - 1) * 100 if before['wall_seconds'] else 0
+            memory_change = ((current['peak_memory_mb'] / before['peak_memory_mb'] - 1) * 100
+                             if before['peak_memory_mb'] else 0)
+            print(f"{shape:<12} {name:<13} {current['wall_seconds']:>9.3f}s {wall_change:>+7.1f}% "
+                  f"{current['peak_memory_mb']:>8.1f}MB {memory_change:>+7.1f}%")
+    
+    if baseline.get('settings') != results['settings']:
+        print("\nNote: the baseline was run with different settings:", baseline.get('settings'))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark scanning, filtering and export on generated trees.")
+    parser.add_argument("-s", "--shape", action="append", choices=list(SHAPES),
+                        help="tree shape to run; repeat for more (default: wide-flat and deep-narrow)")
+    parser.add_argument("-b", "--benchmark", dest="only", action="append", choices=[name for name, _ in BENCHMARKS],
+                        help="only run this benchmark; repeat for more")
+    parser.add_argument("-l", "--latency", type=float, default=0.0,
+                        help="simulated round trip per listing page and stat call, in ms (default: 0)")
+    parser.add_argument("--page-size", type=int, default=100,
+                        help="directory entries returned per listing round trip (default: 100)")
+    parser.add_argument("--server-capacity", type=int, default=0,
+                        help="calls the simulated server handles at full speed; more slow every call "
+                             "down (default: unlimited)")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="scan workers (default: 8)")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="timed runs per benchmark (default: 3)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the generated trees (default: 0)")
+    parser.add_argument("--tree-dir", default=os.path.join(tempfile.gettempdir(), "nfe-benchmark-trees"),
+                        help="where generated trees are kept between runs")
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", metavar="FILE", help="compare against an earlier --output file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    shapes = args.shape or ['wide-flat', 'deep-narrow']
+    
+    results = {
+        'settings': {'latency_ms': args.latency, 'page_size': args.page_size,
+                     'server_capacity': args.server_capacity, 'workers': args.workers,
+                     'repeat': args.repeat, 'seed': args.seed},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+        'shapes': {}
+    }
+    for shape in shapes:
+        results['shapes'][shape] = run_shape(shape, args)
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(results, json.load(f))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,9 +7,186 @@ import platform
 from pathlib import Path
 import json
 import webbrowser
+import time
+import sqlite3
+import re
+import base64
 from datetime import datetime
-import shutil
-import string
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from scan_engine import (FILE_CATEGORIES, ScanIndex, FileStore, ParallelScanner, TrigramIndex, SortIndex,
+                         new_scan_counters, all_extensions, filter_rows, format_file_size,
+                         is_network_path, diagnose_path, diagnosis_report,
+                         export_rows, ScanTelemetry, format_telemetry, list_subfolders,
+                         count_folder_entries, HashCache, find_duplicates, ScanRules,
+                         DEFAULT_EXCLUDED_DIRS, parse_size, format_size_exact, parse_date, FolderSizes, TreeWatcher,
+                         ServerLimits, parse_server_caps, MultiRootScanner, unique_roots,
+                         parse_roots, format_roots,
+                         ScanCheckpoint, compile_content_query, content_search_candidates,
+                         search_contents, CONTENT_MAX_SIZE, ThumbnailCache, ThumbnailLoader,
+                         thumbnail_requests, can_make_thumbnails, list_drives, PathProbe)
+
+class VirtualFileList:
+    """Treeview that only holds Tk items for the visible window of rows
+    
+    The rows stay in a Python list; scrolling refills the same few items
+    instead of inserting one Tk item per file.
+    """
+    
+    def __init__(self, tree, scrollbar, format_row, on_change=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.format_row = format_row
+        # Called after the visible rows or the selection change
+        self.on_change = on_change
+        
+        self.rows = []
+        self.offset = 0
+        self.item_ids = []
+        self.selected_index = None
+        
+        self.scrollbar.configure(command=self.on_scrollbar)
+        self.tree.bind("<Configure>", lambda e: self.refresh())
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Up>", lambda e: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self.move_selection(-self.page_size()))
+        self.tree.bind("<Next>", lambda e: self.move_selection(self.page_size()))
+        self.tree.bind("<Home>", lambda e: self.move_selection(-len(self.rows)))
+        self.tree.bind("<End>", lambda e: self.move_selection(len(self.rows)))
+    
+    def row_height(self):
+        height = ttk.Style().lookup(self.tree.cget("style") or "Treeview", "rowheight")
+        try:
+            return max(1, int(height))
+        except (TypeError, ValueError):
+            return 20
+    
+    def page_size(self):
+        """Number of rows that fit in the widget"""
+        height = self.tree.winfo_height()
+        if height <= 1:
+            return int(self.tree.cget("height"))
+        
+        # One row's worth of space goes to the headings
+        row_height = self.row_height()
+        return max(1, (height - row_height) // row_height)
+    
+    def set_rows(self, rows, keep_position=False):
+        self.rows = rows
+        if not keep_position:
+            self.offset = 0
+            self.selected_index = None
+        self.refresh()
+    
+    def refresh(self):
+        count = self.page_size()
+        self.offset = max(0, min(self.offset, len(self.rows) - count))
+        visible = self.rows[self.offset:self.offset + count]
+        
+        # Reuse the existing items and only create or drop the difference
+        while len(self.item_ids) < len(visible):
+            self.item_ids.append(self.tree.insert("", "end"))
+        while len(self.item_ids) > len(visible):
+            self.tree.delete(self.item_ids.pop())
+        
+        for item, row in zip(self.item_ids, visible):
+            self.tree.item(item, values=self.format_row(row))
+        
+        selected = ()
+        if self.selected_index is not None:
+            position = self.selected_index - self.offset
+            if 0 <= position < len(self.item_ids):
+                selected = (self.item_ids[position],)
+        self.tree.selection_set(selected)
+        if selected:
+            self.tree.focus(selected[0])
+        self.tree.yview_moveto(0)
+        
+        if self.rows:
+            self.scrollbar.set(self.offset / len(self.rows),
+                               min(1.0, (self.offset + count) / len(self.rows)))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        
+        if self.on_change:
+            self.on_change()
+    
+    def scroll(self, amount):
+        self.offset += amount
+        self.refresh()
+        return "break"
+    
+    def on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self.rows))
+            self.refresh()
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.page_size()
+            self.scroll(amount)
+    
+    def on_mousewheel(self, event):
+        # Windows reports multiples of 120 per notch, macOS reports small deltas
+        if abs(event.delta) >= 120:
+            steps = -int(event.delta / 120)
+        else:
+            steps = -event.delta
+        return self.scroll(steps * 3)
+    
+    def on_select(self, event=None):
+        selection = self.tree.selection()
+        if selection and selection[0] in self.item_ids:
+            self.selected_index = self.offset + self.item_ids.index(selection[0])
+            if self.on_change:
+                self.on_change()
+    
+    def move_selection(self, step):
+        if not self.rows:
+            return "break"
+        
+        if self.selected_index is None:
+            index = self.offset
+        else:
+            index = max(0, min(len(self.rows) - 1, self.selected_index + step))
+        
+        count = self.page_size()
+        if index < self.offset:
+            self.offset = index
+        elif index >= self.offset + count:
+            self.offset = index - count + 1
+        
+        self.selected_index = index
+        self.refresh()
+        return "break"
+    
+    def row_for_item(self, item):
+        if item in self.item_ids:
+            index = self.offset + self.item_ids.index(item)
+            if index < len(self.rows):
+                return self.rows[index]
+        return None
+    
+    def selected_row(self):
+        if self.selected_index is not None and self.selected_index < len(self.rows):
+            return self.rows[self.selected_index]
+        return None
+
+# Duplicate groups put in the tab; the rest only count towards the totals
+MAX_DUPLICATE_GROUPS = 2000
+
+# Folders listed at once on the folder sizes tab, per level and in the largest-folders view
+MAX_SIZE_FOLDERS = 200
+
+# Seconds between checkpoints of a running scan, so a stopped scan can resume
+CHECKPOINT_SECONDS = 30
+
+# Thumbnails kept in memory for the preview pane; the rest come back from the cache file
+MAX_PREVIEW_THUMBNAILS = 500
 
 class NetworkFileExplorer:
     def __init__(self, root):
@@ -19,30 +196,110 @@ class NetworkFileExplorer:
         self.root.minsize(800, 600)
         
         # File extension categories
-        self.file_categories = {
-            'Documents': ['.doc', '.docx', '.pdf', '.txt', '.rtf', '.odt'],
-            'Presentations': ['.ppt', '.pptx', '.odp'],
-            'Spreadsheets': ['.xls', '.xlsx', '.csv', '.ods'],
-            'Images': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif', '.svg', '.webp'],
-            'CAD Files': ['.dwg', '.dxf', '.dwf', '.dgn'],
-            'Archives': ['.zip', '.rar', '.7z', '.tar', '.gz'],
-            'Videos': ['.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv'],
-            'Audio': ['.mp3', '.wav', '.flac', '.aac', '.ogg'],
-            'Code': ['.py', '.js', '.html', '.css', '.cpp', '.java', '.c']
-        }
+        self.file_categories = {category: list(exts) for category, exts in FILE_CATEGORIES.items()}
         
         # Flatten extensions for quick lookup
-        self.all_extensions = set()
-        for exts in self.file_categories.values():
-            self.all_extensions.update(exts)
+        self.all_extensions = all_extensions(self.file_categories)
         
-        self.filtered_files = []
+        # Scan results, the row ids currently shown, and how many store rows have been shown
+        self.file_store = FileStore(self.file_categories)
+        self.displayed_files = array('I')
+        self.shown_rows = 0
         self.scanning = False
+        self.scan_id = 0
+        
+        # Name search index over file_store, and the pending debounced search
+        self.search_index = TrigramIndex()
+        self.search_index_thread = None
+        self.search_after_id = None
+        
+        # Content search over the shown results: matches found so far by the running
+        # search, how many of them are shown, and an id that stops older searches
+        self.content_matches = []
+        self.content_shown = 0
+        self.content_search_id = 0
+        self.content_thread = None
+        
+        # Cached per-column row orders of file_store, and the column the Files list is sorted by
+        self.sort_index = SortIndex()
+        self.sort_column = None
+        self.sort_descending = False
+        
+        # Timings of the current or last scan, shown on the telemetry tab
+        self.scan_telemetry = None
+        
+        # Folder size rollup of the current or last scan, and the folder sizes tab rows
+        self.folder_sizes = None
+        self.folder_size_items = {}
+        self.folder_sizes_key = 'bytes'
+        
+        # Folder pane loads: bumping the id cancels loads for an earlier path
+        self.folder_load_id = 0
+        self.folder_items = {}
+        self.folders_expanding = set()
+        
+        # Path checks run off the UI thread, since a stale mount can hang them for half a minute;
+        # the typed path is checked once typing pauses, and bumping the id drops older answers
+        self.path_probe = PathProbe()
+        self.path_check_id = 0
+        self.path_check_after_id = None
+        
+        # Background export and its progress dialog
+        self.export_thread = None
+        self.export_cancelled = False
+        self.export_dialog = None
+        self.export_label_var = None
         self.diagnosis_results = {}
         
+        # Number of worker threads used to list directories during a scan
+        self.scan_workers = 8
+        
+        # Calls in flight per file server, adapted to its latency and kept between scans
+        self.adaptive_workers = True
+        self.server_caps = {}
+        self.server_limits = ServerLimits(default_cap=self.scan_workers)
+        
+        # Name, size, date and folder rules the scanner applies while walking
+        self.scan_rules = ScanRules(self.all_extensions, exclude_dirs=DEFAULT_EXCLUDED_DIRS)
+        
+        # Watchers (one per root) applying file changes to the last completed scan, when watching is on
+        self.watch_changes = False
+        self.watchers = []
+        
+        # Scanner of the running scan and the per-root progress window of a multi-root scan
+        self.active_scanner = None
+        self.root_progress_dialog = None
+        
+        # Folder index kept next to the settings file for incremental rescans, and the
+        # checkpoints of scans that were stopped before they finished
+        self.scan_index = ScanIndex("file_explorer_index.db")
+        self.scan_checkpoint = ScanCheckpoint(self.scan_index.db_path)
+        self.scan_thread = None
+        self.resume_folders = 0
+        self.closing = False
+        
+        # Duplicate search over the shown results; hashes are kept next to the folder index
+        self.hash_cache = HashCache(self.scan_index.db_path)
+        self.duplicate_thread = None
+        self.duplicates_cancelled = False
+        
+        # Preview pane thumbnails, made on worker threads and kept in a file next to the settings
+        self.thumbnail_cache = ThumbnailCache("file_explorer_thumbnails.db")
+        self.thumbnail_loader = ThumbnailLoader(
+            self.thumbnail_cache, lambda request, image: self.root.after(0, lambda: self.thumbnail_ready(request, image)))
+        self.thumbnails = {}
+        self.preview_request = None
+        self.preview_image = None
+        self.preview_after_id = None
+        
+        # Quick Select drives as last listed; the window starts with these while a fresh list is made
+        self.drives = []
+        self.drives_thread = None
+        
         self.setup_gui()
-        self.populate_drives()
         self.load_settings()
+        self.show_drives(self.drives)
+        self.populate_drives()
     
     def setup_gui(self):
         # Menu bar
@@ -102,7 +359,20 @@ class NetworkFileExplorer:
         self.stop_button = ttk.Button(buttons_frame, text="⏹ Stop", command=self.stop_scan, state="disabled")
         self.stop_button.pack(side=tk.LEFT, padx=(0, 10))
         
-        ttk.Button(buttons_frame, text="🔄 Refresh Drives", command=self.populate_drives).pack(side=tk.LEFT)
+        ttk.Button(buttons_frame, text="🔄 Refresh Drives", command=self.populate_drives).pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Button(buttons_frame, text="🗂 Scan Several...", command=self.show_scan_several).pack(side=tk.LEFT)
+        
+        # Keep the results current after a scan instead of rescanning
+        self.watch_var = tk.BooleanVar(value=self.watch_changes)
+        ttk.Checkbutton(buttons_frame, text="👁 Watch for changes", variable=self.watch_var,
+                        command=self.toggle_watch).pack(side=tk.RIGHT, padx=(10, 0))
+        
+        # Scan worker count
+        self.workers_var = tk.IntVar(value=self.scan_workers)
+        ttk.Spinbox(buttons_frame, from_=1, to=64, width=4, 
+                   textvariable=self.workers_var).pack(side=tk.RIGHT)
+        ttk.Label(buttons_frame, text="Workers:").pack(side=tk.RIGHT, padx=(10, 5))
         
         # Filter frame
         filter_frame = ttk.LabelFrame(main_frame, text="File Filters", padding="5")
@@ -168,9 +438,20 @@ class NetworkFileExplorer:
         self.search_var.trace('w', self.filter_by_search)
         search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
         search_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(0, 5))
+        search_entry.bind('<Return>', self.start_content_search)
         
         ttk.Button(search_frame, text="Clear", command=self.clear_search).grid(row=0, column=2)
         
+        # Content search reads the text files among the results instead of matching names
+        self.content_search_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(search_frame, text="📝 In file contents", variable=self.content_search_var,
+                        command=self.toggle_content_search).grid(row=0, column=3, padx=(10, 0))
+        self.content_regex_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(search_frame, text="Regex", variable=self.content_regex_var).grid(row=0, column=4, padx=(5, 0))
+        self.content_stop_button = ttk.Button(search_frame, text="⏹ Stop", command=self.stop_content_search,
+                                              state="disabled")
+        self.content_stop_button.grid(row=0, column=5, padx=(5, 0))
+        
         # Treeview for file list
         columns = ("Name", "Type", "Size", "Modified", "Path")
         self.tree = ttk.Treeview(files_frame, columns=columns, show="tree headings", height=15)
@@ -180,7 +461,7 @@ class NetworkFileExplorer:
         self.tree.column("#0", width=20, minwidth=20)
         
         for col in columns:
-            self.tree.heading(col, text=col, anchor=tk.W)
+            self.tree.heading(col, text=col, anchor=tk.W, command=lambda c=col: self.sort_files(c))
             if col == "Name":
                 self.tree.column(col, width=200, minwidth=100)
             elif col == "Type":
@@ -193,21 +474,131 @@ class NetworkFileExplorer:
                 self.tree.column(col, width=300, minwidth=200)
         
         # Scrollbars for files treeview
-        tree_scroll_y = ttk.Scrollbar(files_frame, orient="vertical", command=self.tree.yview)
+        tree_scroll_y = ttk.Scrollbar(files_frame, orient="vertical")
         tree_scroll_x = ttk.Scrollbar(files_frame, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=tree_scroll_y.set, xscrollcommand=tree_scroll_x.set)
+        self.tree.configure(xscrollcommand=tree_scroll_x.set)
+        
+        # Only the visible rows exist as Tk items; the vertical scrollbar pages through displayed_files
+        self.file_list = VirtualFileList(self.tree, tree_scroll_y, self.format_file_row,
+                                         on_change=self.schedule_previews)
         
         self.tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         tree_scroll_y.grid(row=1, column=1, sticky=(tk.N, tk.S))
         tree_scroll_x.grid(row=2, column=0, sticky=(tk.W, tk.E))
         
+        # Preview pane - thumbnail of the selected image or drawing
+        self.preview_frame = ttk.LabelFrame(files_frame, text="🖼 Preview", padding="5")
+        self.preview_frame.grid(row=1, column=2, rowspan=2, sticky=(tk.N, tk.S), padx=(5, 0))
+        self.preview_label = ttk.Label(self.preview_frame, text="Select an image or drawing to preview",
+                                       width=26, anchor=tk.CENTER, justify=tk.CENTER, compound="top",
+                                       wraplength=190)
+        self.preview_label.pack(fill=tk.BOTH, expand=True)
+        
         files_frame.columnconfigure(0, weight=1)
         files_frame.rowconfigure(1, weight=1)
         
+        # Duplicates tab - groups of files with identical content
+        duplicates_frame = ttk.Frame(self.notebook)
+        self.notebook.add(duplicates_frame, text="🔁 Duplicates")
+        
+        duplicates_bar = ttk.Frame(duplicates_frame)
+        duplicates_bar.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=(0, 5))
+        self.find_duplicates_button = ttk.Button(duplicates_bar, text="🔍 Find Duplicates",
+                                                 command=self.start_duplicate_search)
+        self.find_duplicates_button.pack(side="left", padx=(0, 5))
+        self.cancel_duplicates_button = ttk.Button(duplicates_bar, text="⏹ Cancel",
+                                                   command=self.cancel_duplicate_search, state="disabled")
+        self.cancel_duplicates_button.pack(side="left", padx=(0, 10))
+        self.duplicate_status_var = tk.StringVar(value="Searches the files currently shown on the Files tab")
+        ttk.Label(duplicates_bar, textvariable=self.duplicate_status_var).pack(side="left")
+        
+        self.duplicates_tree = ttk.Treeview(duplicates_frame, columns=("Size", "Modified", "Path"),
+                                            show="tree headings", height=15)
+        self.duplicates_tree.heading("#0", text="Name", anchor=tk.W)
+        self.duplicates_tree.column("#0", width=220, minwidth=120)
+        self.duplicates_tree.heading("Size", text="Size", anchor=tk.W)
+        self.duplicates_tree.column("Size", width=110, minwidth=60)
+        self.duplicates_tree.heading("Modified", text="Modified", anchor=tk.W)
+        self.duplicates_tree.column("Modified", width=120, minwidth=100)
+        self.duplicates_tree.heading("Path", text="Path", anchor=tk.W)
+        self.duplicates_tree.column("Path", width=300, minwidth=200)
+        duplicates_scroll = ttk.Scrollbar(duplicates_frame, orient="vertical", command=self.duplicates_tree.yview)
+        self.duplicates_tree.configure(yscrollcommand=duplicates_scroll.set)
+        
+        self.duplicates_tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        duplicates_scroll.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        self.duplicates_tree.bind("<Double-1>", self.on_duplicate_double_click)
+        
+        duplicates_frame.columnconfigure(0, weight=1)
+        duplicates_frame.rowconfigure(1, weight=1)
+        
+        # Folder sizes tab - bytes per subtree, rolled up while the scan walks
+        sizes_frame = ttk.Frame(self.notebook)
+        self.notebook.add(sizes_frame, text="📦 Folder Sizes")
+        
+        sizes_bar = ttk.Frame(sizes_frame)
+        sizes_bar.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=(0, 5))
+        self.folder_sizes_mode = tk.StringVar(value="tree")
+        ttk.Radiobutton(sizes_bar, text="🌳 Tree", variable=self.folder_sizes_mode, value="tree",
+                        command=self.refresh_folder_sizes).pack(side="left", padx=(0, 5))
+        ttk.Radiobutton(sizes_bar, text="🏆 Largest Folders", variable=self.folder_sizes_mode, value="largest",
+                        command=self.refresh_folder_sizes).pack(side="left", padx=(0, 10))
+        ttk.Button(sizes_bar, text="🔄 Refresh", command=self.refresh_folder_sizes).pack(side="left", padx=(0, 10))
+        self.folder_sizes_status_var = tk.StringVar(value="Start a scan to see which folders use the space")
+        ttk.Label(sizes_bar, textvariable=self.folder_sizes_status_var).pack(side="left")
+        
+        self.sizes_tree = ttk.Treeview(sizes_frame, columns=("Size", "Files", "Share", "Category"),
+                                       show="tree headings", height=15)
+        self.sizes_tree.heading("#0", text="Folder", anchor=tk.W,
+                                command=lambda: self.sort_folder_sizes('name'))
+        self.sizes_tree.column("#0", width=360, minwidth=150)
+        self.sizes_tree.heading("Size", text="Size ▼", anchor=tk.W,
+                                command=lambda: self.sort_folder_sizes('bytes'))
+        self.sizes_tree.column("Size", width=100, minwidth=60)
+        self.sizes_tree.heading("Files", text="Files", anchor=tk.W,
+                                command=lambda: self.sort_folder_sizes('files'))
+        self.sizes_tree.column("Files", width=90, minwidth=60)
+        self.sizes_tree.heading("Share", text="Share", anchor=tk.W)
+        self.sizes_tree.column("Share", width=70, minwidth=50)
+        self.sizes_tree.heading("Category", text="Mostly", anchor=tk.W)
+        self.sizes_tree.column("Category", width=120, minwidth=80)
+        sizes_scroll = ttk.Scrollbar(sizes_frame, orient="vertical", command=self.sizes_tree.yview)
+        self.sizes_tree.configure(yscrollcommand=sizes_scroll.set)
+        
+        self.sizes_tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        sizes_scroll.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        self.sizes_tree.bind("<<TreeviewOpen>>", self.on_folder_size_open)
+        self.sizes_tree.bind("<Double-1>", self.on_folder_size_double_click)
+        
+        sizes_frame.columnconfigure(0, weight=1)
+        sizes_frame.rowconfigure(1, weight=1)
+        
+        # Telemetry tab - live scan counters, latency histograms and slowest folders
+        telemetry_frame = ttk.Frame(self.notebook)
+        self.notebook.add(telemetry_frame, text="📈 Telemetry")
+        
+        telemetry_buttons = ttk.Frame(telemetry_frame)
+        telemetry_buttons.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=(0, 5))
+        ttk.Button(telemetry_buttons, text="📋 Copy JSON", command=self.copy_telemetry).pack(side="left", padx=(0, 5))
+        ttk.Button(telemetry_buttons, text="💾 Save JSON...", command=self.save_telemetry).pack(side="left")
+        
+        self.telemetry_text = tk.Text(telemetry_frame, wrap="none", height=15, font=("Courier", 9))
+        telemetry_scroll = ttk.Scrollbar(telemetry_frame, orient="vertical", command=self.telemetry_text.yview)
+        self.telemetry_text.configure(yscrollcommand=telemetry_scroll.set)
+        self.telemetry_text.insert("1.0", "Start a scan to see its telemetry.")
+        self.telemetry_text.config(state="disabled")
+        
+        self.telemetry_text.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        telemetry_scroll.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        
+        telemetry_frame.columnconfigure(0, weight=1)
+        telemetry_frame.rowconfigure(1, weight=1)
+        
         # Bind events
         self.tree.bind("<Double-1>", self.open_selected_file)
         self.tree.bind("<Button-3>", self.show_context_menu)
         self.folders_tree.bind("<Double-1>", self.on_folder_double_click)
+        self.folders_tree.bind("<<TreeviewOpen>>", self.on_folder_open)
         self.folders_tree.bind("<Button-3>", self.show_folder_context_menu)
         
         # Status frame
@@ -244,7 +635,13 @@ class NetworkFileExplorer:
         view_menu = Menu(menubar, tearoff=0)
         menubar.add_cascade(label="View", menu=view_menu)
         view_menu.add_command(label="Refresh", command=self.refresh_results)
+        view_menu.add_command(label="Full Rescan (Ignore Index)", command=self.full_rescan)
+        view_menu.add_command(label="Resume Stopped Scan", command=self.resume_scan)
         view_menu.add_command(label="Clear Results", command=self.clear_results)
+        view_menu.add_separator()
+        self.preview_var = tk.BooleanVar(value=True)
+        view_menu.add_checkbutton(label="Show Preview Pane", variable=self.preview_var, command=self.toggle_preview)
+        view_menu.add_command(label="Scan Rules...", command=self.show_scan_rules)
         
         # Tools menu
         tools_menu = Menu(menubar, tearoff=0)
@@ -252,6 +649,8 @@ class NetworkFileExplorer:
         tools_menu.add_command(label="🔄 Refresh Drives", command=self.populate_drives)
         tools_menu.add_command(label="📁 Open File Location", command=self.open_file_location)
         tools_menu.add_command(label="📋 Copy File Path", command=self.copy_file_path)
+        tools_menu.add_command(label="🔁 Find Duplicates", command=self.start_duplicate_search)
+        tools_menu.add_command(label="🚦 Server Limits...", command=self.show_server_limits)
         tools_menu.add_separator()
         tools_menu.add_command(label="🌐 Browse Network", command=self.browse_network)
         
@@ -261,66 +660,37 @@ class NetworkFileExplorer:
         help_menu.add_command(label="About", command=self.show_about)
     
     def populate_drives(self):
-        drives = []
-        
-        try:
-            if platform.system() == "Windows":
-                # Get local drives
-                for letter in string.ascii_uppercase:
-                    drive = f"{letter}:\\"
-                    if os.path.exists(drive):
-                        try:
-                            total, used, free = shutil.disk_usage(drive)
-                            drive_type = self.get_drive_type(drive)
-                            size_info = self.format_file_size(total)
-                            drives.append(f"{drive} ({drive_type} - {size_info})")
-                        except:
-                            drives.append(f"{drive} (Drive)")
-                
-                # Try to get network drives
-                try:
-                    result = subprocess.run(['net', 'use'], capture_output=True, text=True, timeout=5)
-                    if result.returncode == 0:
-                        lines = result.stdout.split('\n')
-                        for line in lines:
-                            if ':' in line and '\\\\' in line:
-                                parts = line.strip().split()
-                                if len(parts) >= 2 and parts[1].startswith('\\\\'):
-                                    drives.append(f"{parts[0]} → {parts[1]} (Network)")
-                except:
-                    pass
-                
-                drives.extend([
-                    "\\\\localhost (Local Network)",
-                    "Browse Network Locations..."
-                ])
-            
-            else:
-                drives.extend([
-                    "/ (Root)",
-                    "/home (Home)",
-                    "/mnt (Mount Points)",
-                    "/media (Media)",
-                    "Browse Folders..."
-                ])
-        
-        except Exception as e:
-            drives = ["Browse Folders..."]
+        """List the drives in the background; Quick Select keeps the last known list meanwhile"""
+        if self.drives_thread is not None and self.drives_thread.is_alive():
+            return
         
-        self.drive_combo['values'] = drives
-        if drives:
-            self.drive_combo.set(drives[0])
+        self.drives_thread = threading.Thread(target=self.list_drives_background)
+        self.drives_thread.daemon = True
+        self.drives_thread.start()
     
-    def get_drive_type(self, drive):
+    def list_drives_background(self):
         try:
-            if platform.system() == "Windows":
-                import ctypes
-                drive_type = ctypes.windll.kernel32.GetDriveTypeW(drive)
-                types = {1: "Unknown", 2: "Removable", 3: "Local", 4: "Network", 5: "CD-ROM", 6: "RAM"}
-                return types.get(drive_type, "Unknown")
-        except:
-            pass
-        return "Local"
+            drives = list_drives()
+        except Exception:
+            # Keep showing the last known drives
+            return
+        self.root.after(0, lambda: self.drives_listed(drives))
+    
+    def drives_listed(self, drives):
+        self.drives = drives
+        self.show_drives(drives)
+    
+    def show_drives(self, drives):
+        if platform.system() == "Windows":
+            entries = drives + ["Browse Network Locations..."]
+        else:
+            entries = drives + ["Browse Folders..."]
+        
+        # Keep the drive already chosen when it is still there
+        chosen = self.drive_path(self.drive_var.get())
+        self.drive_combo['values'] = entries
+        self.drive_combo.set(next((entry for entry in entries if chosen and self.drive_path(entry) == chosen),
+                                  entries[0]))
     
     def on_drive_selected(self, event=None):
         selected = self.drive_var.get()
@@ -332,161 +702,252 @@ class NetworkFileExplorer:
         elif "Network Locations" in selected:
             self.browse_network()
         else:
-            if "→" in selected:
-                drive_path = selected.split("→")[0].strip()
-            else:
-                drive_path = selected.split("(")[0].strip()
-            
-            if os.path.exists(drive_path):
-                self.path_var.set(drive_path)
+            drive_path = self.drive_path(selected)
+            self.probe_paths([drive_path], lambda states: self.drive_checked(selected, drive_path, states[drive_path]))
+    
+    def drive_checked(self, selected, drive_path, state):
+        if self.drive_var.get() != selected:
+            # Another drive was picked while this one was checked
+            return
+        if state == PathProbe.EXISTS:
+            self.path_var.set(drive_path)
+        else:
+            self.status_var.set(self.path_problem(drive_path, state))
+    
+    def drive_path(self, label):
+        """Path of a Quick Select entry such as 'Z: → \\\\nas01\\share (Network)'"""
+        if "→" in label:
+            return label.split("→")[0].strip()
+        return label.split("(")[0].strip()
+    
+    def get_scan_roots(self):
+        """Roots in the path box; several are each in double quotes, separated by ';'"""
+        return parse_roots(self.path_var.get())
     
     def on_path_changed(self, *args):
-        path = self.path_var.get().strip()
+        # Stop any folder load for the previous path right away, and check the new one once typing pauses
+        self.folder_load_id += 1
+        self.path_check_id += 1
+        if self.path_check_after_id:
+            self.root.after_cancel(self.path_check_after_id)
+        self.path_check_after_id = self.root.after(300, self.check_path)
+    
+    def check_path(self):
+        self.path_check_after_id = None
+        roots = self.get_scan_roots()
+        self.scan_folder_button.config(state="normal", text="🔍 Scan Folders" if len(roots) > 1 else "🔍 Scan Folder")
+        self.quick_scan_button.config(state="normal")
+        if not roots:
+            self.status_var.set("Ready - select a folder or enter path manually")
+            return
         
-        if path and os.path.exists(path):
-            self.scan_folder_button.config(state="normal")
-            self.quick_scan_button.config(state="normal")
-            
-            if self.is_network_path(path):
+        check_id = self.path_check_id
+        self.probe_paths(roots, lambda states: self.path_checked(roots, states, check_id))
+    
+    def path_checked(self, roots, states, check_id):
+        if check_id != self.path_check_id:
+            # The path changed while it was checked
+            return
+        
+        path = roots[0]
+        if len(roots) > 1:
+            # Several roots scan together; the folder tree only follows a single path
+            missing = [root for root in roots if states[root] != PathProbe.EXISTS]
+            if missing:
+                self.status_var.set(f"Path may be invalid: {missing[0]} - click scan to verify")
+            else:
+                self.status_var.set(f"{len(roots)} roots selected: {', '.join(roots)}")
+        elif states[path] == PathProbe.EXISTS:
+            if is_network_path(path):
                 self.scan_folder_button.config(text="🌐 Scan Network Folder")
                 self.status_var.set(f"Network path selected: {path}")
             else:
-                self.scan_folder_button.config(text="🔍 Scan Folder")
                 self.status_var.set(f"Local path selected: {path}")
-            
-            # Auto-load folders when path changes
             self.load_folders(path)
+        elif states[path] == PathProbe.NOT_RESPONDING:
+            self.status_var.set(f"{path} is not responding - the share may be disconnected")
         else:
-            self.scan_folder_button.config(state="normal")
-            self.quick_scan_button.config(state="normal")
-            if path:
-                self.status_var.set("Path may be invalid - click scan to verify")
-            else:
-                self.status_var.set("Ready - select a folder or enter path manually")
+            self.status_var.set("Path may be invalid - click scan to verify")
+    
+    def probe_paths(self, paths, callback):
+        """Check on a worker thread whether paths exist, then call callback({path: state}) on the UI thread
+        
+        Recent answers come straight from the cache without starting a thread.
+        """
+        states = self.path_probe.cached_states(paths)
+        if len(states) == len(set(paths)):
+            callback(states)
+            return
+        
+        def probe():
+            states = self.path_probe.check_all(paths)
+            self.root.after(0, lambda: callback(states))
+        
+        probe_thread = threading.Thread(target=probe)
+        probe_thread.daemon = True
+        probe_thread.start()
+    
+    def path_problem(self, path, state):
+        if state == PathProbe.NOT_RESPONDING:
+            return f"The path '{path}' is not responding. The share may be disconnected or the server down."
+        return f"The path '{path}' does not exist or is not accessible."
     
     def load_folders(self, path):
         """Load and display folders in the selected path"""
+        
+        # Any load still running for an earlier path is now stale
+        self.folder_load_id += 1
+        self.folder_items = {}
+        self.folders_expanding = set()
+        
         # Clear existing folders
         for item in self.folders_tree.get_children():
             self.folders_tree.delete(item)
         
-        if not path or not os.path.exists(path):
+        if not path:
             return
         
-        # Start folder loading in background
+        # Start folder loading in background; a path that cannot be listed reports its error from there
         self.status_var.set("Loading folders...")
         self.progress.start()
         
-        folder_thread = threading.Thread(target=self.scan_folders_background, args=(path,))
+        folder_thread = threading.Thread(target=self.scan_folders_background,
+                                         args=(path, "", self.folder_load_id))
         folder_thread.daemon = True
         folder_thread.start()
     
-    def scan_folders_background(self, path):
-        """Background thread to scan folders - optimized for speed"""
-        folders = []
-        folder_count = 0
+    def scan_folders_background(self, path, parent_item="", load_id=0):
+        """Background thread to list the subfolders of one folder, then count their contents"""
+        counters = new_scan_counters()
         
         try:
             # Get immediate subdirectories only (no deep scanning)
-            items = os.listdir(path)
+            folders = list_subfolders(path, counters, lambda: load_id == self.folder_load_id)
+            if folders is None:
+                # The path changed - drop this load
+                return
             
-            for item in items:
-                item_path = os.path.join(path, item)
-                try:
-                    # Quick check if it's a directory
-                    if os.path.isdir(item_path):
-                        # Quick folder info without deep scanning
-                        try:
-                            stat_info = os.stat(item_path)
-                            modified = datetime.fromtimestamp(stat_info.st_mtime)
-                        except (OSError, PermissionError):
-                            modified = datetime.now()
-                        
-                        # Quick count of immediate contents only
-                        subfolders = 0
-                        files = 0
-                        try:
-                            # Use faster os.scandir instead of os.listdir
-                            with os.scandir(item_path) as entries:
-                                for entry in entries:
-                                    if entry.is_dir(follow_symlinks=False):
-                                        subfolders += 1
-                                    else:
-                                        files += 1
-                                    
-                                    # Limit counting to avoid slowdown
-                                    if subfolders + files > 100:
-                                        subfolders = f"{subfolders}+"
-                                        files = f"{files}+"
-                                        break
-                        except (PermissionError, OSError):
-                            subfolders = "?"
-                            files = "?"
-                        
-                        folders.append({
-                            'name': item,
-                            'path': item_path,
-                            'modified': modified,
-                            'subfolders': subfolders,
-                            'files': files
-                        })
-                        folder_count += 1
-                        
-                        # Update UI more frequently for better responsiveness
-                        if folder_count % 5 == 0:
-                            self.root.after(0, lambda c=folder_count: self.status_var.set(f"Loading folders... Found {c}"))
-                
-                except (PermissionError, OSError, FileNotFoundError):
-                    # Skip items we can't access
-                    continue
+        except Exception as e:
+            if not parent_item:
+                error = str(e)
+                self.root.after(0, lambda: self.folders_load_failed(error, load_id))
+            return
+        
+        # Show the names right away; counts are filled in as they arrive
+        self.root.after(0, lambda: self.folders_loaded(folders, len(folders), counters, parent_item, load_id))
+        self.count_folder_contents(folders, load_id)
+    
+    def count_folder_contents(self, folders, load_id):
+        """Count the immediate contents of several folders at once"""
+        def count(folder):
+            if load_id != self.folder_load_id:
+                return
             
-            # Sort folders by name (case-insensitive)
-            folders.sort(key=lambda x: x['name'].lower())
+            # Quick count of immediate contents only
+            subfolders, files = count_folder_entries(folder['path'])
             
-        except Exception as e:
-            self.root.after(0, lambda: self.status_var.set(f"Error loading folders: {str(e)}"))
+            self.root.after(0, lambda: self.folder_counted(folder, subfolders, files, load_id))
+        
+        with ThreadPoolExecutor(max_workers=self.scan_workers) as executor:
+            for folder in folders:
+                executor.submit(count, folder)
+    
+    def folders_load_failed(self, error, load_id):
+        if load_id != self.folder_load_id:
             return
+        self.progress.stop()
+        self.status_var.set(f"Error loading folders: {error}")
+    
+    def format_folder_text(self, name, subfolders, files):
+        # Create display text with folder info
+        folder_text = f"📁 {name}"
+        
+        # Format subfolder/file counts
+        if isinstance(subfolders, str) and isinstance(files, str):
+            if subfolders != "?" and files != "?":
+                folder_text += f" ({subfolders} folders, {files} files)"
+            elif subfolders != "?" or files != "?":
+                folder_text += f" (Access limited)"
+            else:
+                folder_text += f" (Access denied)"
+        else:
+            folder_text += f" ({subfolders} folders, {files} files)"
         
-        # Update UI on main thread
-        self.root.after(0, lambda: self.folders_loaded(folders, folder_count))
+        return folder_text
     
-    def folders_loaded(self, folders, folder_count):
+    def folders_loaded(self, folders, folder_count, counters=None, parent_item="", load_id=0):
         """Handle completion of folder loading"""
-        self.progress.stop()
+        if load_id != self.folder_load_id:
+            return
+        
+        if parent_item:
+            # Replace the "Loading..." placeholder of an expanded folder
+            self.folders_expanding.discard(parent_item)
+            if not self.folders_tree.exists(parent_item):
+                return
+            for child in self.folders_tree.get_children(parent_item):
+                self.folders_tree.delete(child)
+        else:
+            self.progress.stop()
         
-        # Add folders to tree with better performance
         for folder in folders:
-            # Create display text with folder info
-            folder_text = f"📁 {folder['name']}"
-            
-            # Format subfolder/file counts
-            if isinstance(folder['subfolders'], str) and isinstance(folder['files'], str):
-                if folder['subfolders'] != "?" and folder['files'] != "?":
-                    folder_text += f" ({folder['subfolders']} folders, {folder['files']} files)"
-                elif folder['subfolders'] != "?" or folder['files'] != "?":
-                    folder_text += f" (Access limited)"
-                else:
-                    folder_text += f" (Access denied)"
-            else:
-                folder_text += f" ({folder['subfolders']} folders, {folder['files']} files)"
-            
             # Insert folder into tree
-            item_id = self.folders_tree.insert("", "end", text=folder_text, 
+            item_id = self.folders_tree.insert(parent_item, "end", text=f"📁 {folder['name']}", 
                                              values=(folder['path'],), open=False)
+            self.folder_items[folder['path']] = item_id
             
-            # Only add expandable marker if folder has subfolders and we can access them
-            if (isinstance(folder['subfolders'], int) and folder['subfolders'] > 0) or \
-               (isinstance(folder['subfolders'], str) and folder['subfolders'].endswith('+')):
-                # Add lazy loading capability - don't add dummy child for now
-                pass
+            # Placeholder child so the folder can be expanded; replaced on first open
+            self.folders_tree.insert(item_id, "end", text="Loading...")
+        
+        if parent_item:
+            return
         
         # Update status
-        path_type = "Network" if self.is_network_path(self.path_var.get()) else "Local"
-        self.status_var.set(f"{path_type} folders loaded: {folder_count} folders found")
+        path_type = "Network" if is_network_path(self.path_var.get()) else "Local"
+        status = f"{path_type} folders loaded: {folder_count} folders found"
+        if counters:
+            status += f" ({self.format_call_savings(counters)})"
+        self.status_var.set(status)
         
         # Update notebook tab title
         self.notebook.tab(0, text=f"📁 Folders ({folder_count})")
     
+    def folder_counted(self, folder, subfolders, files, load_id):
+        """Fill in the counts of one folder row"""
+        if load_id != self.folder_load_id:
+            return
+        
+        item_id = self.folder_items.get(folder['path'])
+        if not item_id or not self.folders_tree.exists(item_id):
+            return
+        
+        self.folders_tree.item(item_id, text=self.format_folder_text(folder['name'], subfolders, files))
+        
+        # Nothing to expand into
+        if subfolders == 0 and item_id not in self.folders_expanding:
+            for child in self.folders_tree.get_children(item_id):
+                self.folders_tree.delete(child)
+    
+    def on_folder_open(self, event=None):
+        """Load the subfolders of a folder the first time it is expanded"""
+        item = self.folders_tree.focus()
+        if not item or item in self.folders_expanding:
+            return
+        
+        children = self.folders_tree.get_children(item)
+        if len(children) != 1 or self.folders_tree.item(children[0])['text'] != "Loading...":
+            return
+        
+        values = self.folders_tree.item(item)['values']
+        if not values:
+            return
+        
+        self.folders_expanding.add(item)
+        folder_thread = threading.Thread(target=self.scan_folders_background,
+                                         args=(str(values[0]), item, self.folder_load_id))
+        folder_thread.daemon = True
+        folder_thread.start()
+    
     def on_folder_double_click(self, event):
         """Handle double-click on folder to navigate or scan"""
         selection = self.folders_tree.selection()
@@ -604,10 +1065,6 @@ class NetworkFileExplorer:
         self.root.clipboard_append(folder_path)
         self.status_var.set("Folder path copied to clipboard")
     
-    def is_network_path(self, path):
-        return (path.startswith('\\\\') or 
-                (len(path) >= 2 and path[1] == ':' and self.get_drive_type(path[:3]) == "Network"))
-    
     def browse_folder(self):
         folder = filedialog.askdirectory(title="Select Network Drive or Folder")
         if folder:
@@ -623,15 +1080,31 @@ class NetworkFileExplorer:
             self.browse_folder()
     
     def diagnose_and_scan(self):
-        path = self.path_var.get().strip()
-        if not path:
+        if len(self.get_scan_roots()) > 1:
+            # The diagnosis looks at one folder; several roots go straight to the scan
+            self.start_scan()
+            return
+        
+        roots = self.get_scan_roots()
+        if not roots:
             self.browse_folder()
-            path = self.path_var.get().strip()
-            if not path:
+            roots = self.get_scan_roots()
+            if not roots:
                 return
+        path = roots[0]
         
-        if not os.path.exists(path):
-            messagebox.showerror("Error", f"The path '{path}' does not exist or is not accessible.")
+        # The check can hang on a stale mount, so the diagnosis starts once it answers
+        self.scan_folder_button.config(state="disabled")
+        self.quick_scan_button.config(state="disabled")
+        self.status_var.set("Checking the path...")
+        self.probe_paths([path], lambda states: self.diagnosis_path_checked(path, states[path]))
+    
+    def diagnosis_path_checked(self, path, state):
+        if state != PathProbe.EXISTS:
+            self.scan_folder_button.config(state="normal")
+            self.quick_scan_button.config(state="normal")
+            self.status_var.set(self.path_problem(path, state))
+            messagebox.showerror("Error", self.path_problem(path, state))
             return
         
         self.scanning = True
@@ -646,66 +1119,13 @@ class NetworkFileExplorer:
         self.diagnosis_thread.start()
     
     def perform_diagnosis(self, path):
-        diagnosis = {
-            'path': path,
-            'is_network': self.is_network_path(path),
-            'accessible': True,
-            'total_folders': 0,
-            'total_files': 0,
-            'file_types': {},
-            'large_folders': [],
-            'errors': [],
-            'estimated_scan_time': 0
-        }
+        self.root.after(0, lambda: self.status_var.set("Analyzing folder structure..."))
         
-        try:
-            self.root.after(0, lambda: self.status_var.set("Analyzing folder structure..."))
-            
-            folder_count = 0
-            file_count = 0
-            file_types = {}
-            start_time = datetime.now()
-            
-            sample_folders = 0
-            max_sample = 10
-            
-            for root, dirs, files in os.walk(path):
-                if not self.scanning:
-                    break
-                
-                folder_count += 1
-                file_count += len(files)
-                
-                for file in files:
-                    ext = os.path.splitext(file)[1].lower()
-                    if ext in self.all_extensions:
-                        file_types[ext] = file_types.get(ext, 0) + 1
-                
-                if len(files) > 100:
-                    diagnosis['large_folders'].append({
-                        'path': root,
-                        'file_count': len(files)
-                    })
-                
-                sample_folders += 1
-                if sample_folders >= max_sample:
-                    elapsed = (datetime.now() - start_time).total_seconds()
-                    if elapsed > 0:
-                        estimated_total = (folder_count / sample_folders) * elapsed
-                        diagnosis['estimated_scan_time'] = estimated_total
-                    break
-                
-                if folder_count % 50 == 0:
-                    self.root.after(0, lambda: self.status_var.set(f"Analyzed {folder_count} folders, {file_count} files..."))
-            
-            diagnosis['total_folders'] = folder_count
-            diagnosis['total_files'] = file_count
-            diagnosis['file_types'] = file_types
-            
-        except Exception as e:
-            diagnosis['accessible'] = False
-            diagnosis['errors'].append(str(e))
+        def on_progress(folder_count, file_count):
+            self.root.after(0, lambda: self.status_var.set(f"Analyzed {folder_count} folders, {file_count} files..."))
         
+        diagnosis = diagnose_path(path, self.all_extensions, lambda: self.scanning, on_progress,
+                                  self.scan_workers)
         self.root.after(0, lambda: self.diagnosis_complete(diagnosis))
     
     def diagnosis_complete(self, diagnosis):
@@ -715,6 +1135,9 @@ class NetworkFileExplorer:
         self.quick_scan_button.config(state="normal")
         self.progress.stop()
         
+        # The report carries the last scan's telemetry alongside the sample's own
+        if self.scan_telemetry:
+            diagnosis['scan_telemetry'] = self.scan_telemetry.snapshot()
         self.diagnosis_results = diagnosis
         self.show_diagnosis_results(diagnosis)
     
@@ -743,7 +1166,7 @@ class NetworkFileExplorer:
         results_text.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
-        report = self.generate_diagnosis_report(diagnosis)
+        report = diagnosis_report(diagnosis, self.file_categories)
         results_text.insert("1.0", report)
         results_text.config(state="disabled")
         
@@ -762,78 +1185,37 @@ class NetworkFileExplorer:
         
         ttk.Button(button_frame, text="❌ Close", command=dialog.destroy).pack(side="right")
     
-    def generate_diagnosis_report(self, diagnosis):
-        report = f"""🔍 FOLDER DIAGNOSIS REPORT
-{'='*50}
-
-📁 Path: {diagnosis['path']}
-🌐 Network Location: {'Yes' if diagnosis['is_network'] else 'No'}
-✅ Accessible: {'Yes' if diagnosis['accessible'] else 'No'}
-
-📊 SUMMARY STATISTICS
-{'='*25}
-📂 Total Folders: {diagnosis['total_folders']:,}
-📄 Total Files: {diagnosis['total_files']:,}
-⏱️ Estimated Scan Time: {diagnosis['estimated_scan_time']:.1f} seconds
-
-🎯 FILE TYPES FOUND
-{'='*20}"""
-        
-        if diagnosis['file_types']:
-            for ext, count in sorted(diagnosis['file_types'].items(), key=lambda x: x[1], reverse=True):
-                category = self.get_file_category(ext)
-                report += f"\n{ext.upper():>6} files: {count:>6,} ({category})"
-        else:
-            report += "\nNo matching file types found in sample."
-        
-        if diagnosis['large_folders']:
-            report += f"\n\n📁 LARGE FOLDERS (>100 files)\n{'='*30}"
-            for folder in diagnosis['large_folders'][:10]:
-                report += f"\n{folder['file_count']:>4} files: {folder['path']}"
-            if len(diagnosis['large_folders']) > 10:
-                report += f"\n... and {len(diagnosis['large_folders']) - 10} more folders"
-        
-        if diagnosis['errors']:
-            report += f"\n\n⚠️ ERRORS ENCOUNTERED\n{'='*20}"
-            for error in diagnosis['errors']:
-                report += f"\n• {error}"
-        
-        report += f"\n\n💡 RECOMMENDATIONS\n{'='*18}"
-        
-        if diagnosis['estimated_scan_time'] > 60:
-            report += f"\n• ⏰ Large folder detected - scan may take {diagnosis['estimated_scan_time']/60:.1f} minutes"
-            report += "\n• 💡 Consider using Quick Scan with specific file type filters"
-        
-        if diagnosis['is_network']:
-            report += "\n• 🌐 Network location - ensure stable connection during scan"
-            report += "\n• 🔄 Network scan may be slower than local scan"
-        
-        if len(diagnosis['large_folders']) > 5:
-            report += "\n• 📁 Many large folders detected - consider scanning subfolders individually"
-        
-        if not diagnosis['file_types']:
-            report += "\n• ❓ No matching file types found in sample - check your file filters"
-        
-        report += f"\n\n📅 Diagnosis completed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        
-        return report
-    
     def copy_diagnosis_report(self, report):
         self.root.clipboard_clear()
         self.root.clipboard_append(report)
         messagebox.showinfo("Copied", "Diagnosis report copied to clipboard!")
     
-    def start_scan(self):
-        path = self.path_var.get().strip()
-        if not path:
+    def start_scan(self, use_index=True, resume=False):
+        roots = self.get_scan_roots()
+        if not roots:
             self.browse_folder()
-            path = self.path_var.get().strip()
-            if not path:
+            roots = self.get_scan_roots()
+            if not roots:
                 return
         
-        if not os.path.exists(path):
-            messagebox.showerror("Error", f"The path '{path}' does not exist or is not accessible.")
-            return
+        # The check can hang on a stale mount, so the scan starts once it answers
+        self.scan_folder_button.config(state="disabled")
+        self.quick_scan_button.config(state="disabled")
+        self.status_var.set("Checking the path...")
+        self.probe_paths(roots, lambda states: self.scan_roots_checked(roots, states, use_index, resume))
+    
+    def scan_roots_checked(self, roots, states, use_index=True, resume=False):
+        for path in roots:
+            if states[path] != PathProbe.EXISTS:
+                self.scan_folder_button.config(state="normal")
+                self.quick_scan_button.config(state="normal")
+                self.status_var.set(self.path_problem(path, states[path]))
+                messagebox.showerror("Error", self.path_problem(path, states[path]))
+                return
+        
+        # A root inside another root (or listed twice) would find the same files again
+        roots = unique_roots(roots)
+        path = roots[0] if len(roots) == 1 else roots
         
         self.scanning = True
         self.stop_button.config(state="normal")
@@ -842,10 +1224,24 @@ class NetworkFileExplorer:
         self.progress.start()
         self.status_var.set("Scanning files...")
         self.clear_results()
-        
-        self.scan_thread = threading.Thread(target=self.scan_files, args=(path,))
+        self.get_scan_workers()
+        
+        # Results of an earlier scan that is still winding down are ignored
+        self.scan_id += 1
+        self.scan_telemetry = ScanTelemetry()
+        self.folder_sizes = FolderSizes(path, self.file_categories)
+        self.active_scanner = None
+        self.resume_folders = 0
+        self.scan_thread = threading.Thread(target=self.scan_files,
+                                            args=(path, use_index, self.scan_id, self.file_store,
+                                                  self.scan_telemetry, self.folder_sizes, resume))
         self.scan_thread.daemon = True
         self.scan_thread.start()
+        
+        self.root.after(100, self.drain_scan_results)
+        self.root.after(500, self.refresh_telemetry)
+        if len(roots) > 1:
+            self.show_root_progress()
     
     def stop_scan(self):
         self.scanning = False
@@ -855,119 +1251,969 @@ class NetworkFileExplorer:
         self.progress.stop()
         self.status_var.set("Scan stopped by user")
     
-    def scan_files(self, root_path):
-        found_files = []
+    def show_scan_several(self):
+        """Dialog to pick several drives or shares to scan together"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Scan Several Roots")
+        dialog.transient(self.root)
+        dialog.geometry("450x380")
+        dialog.grab_set()
+        
+        main_frame = ttk.Frame(dialog, padding="10")
+        main_frame.pack(fill="both", expand=True)
+        
+        ttk.Label(main_frame, text="Select the drives and folders to scan together. They share the\n"
+                                   "workers and their results are merged into one list.",
+                  foreground="gray").pack(anchor="w", pady=(0, 5))
+        
+        roots_list = tk.Listbox(main_frame, selectmode=tk.MULTIPLE, height=12)
+        roots_list.pack(fill="both", expand=True, pady=(0, 10))
+        
+        current = self.get_scan_roots()
+        paths = [self.drive_path(label) for label in self.drive_combo['values'] if "Browse" not in label]
+        for path in current + [path for path in paths if path not in current]:
+            roots_list.insert(tk.END, path)
+        for index in range(len(current)):
+            roots_list.selection_set(index)
+        
+        def add_folder():
+            folder = filedialog.askdirectory(title="Add Folder to Scan", parent=dialog)
+            if folder:
+                roots_list.insert(tk.END, folder)
+                roots_list.selection_set(tk.END)
+        
+        def scan_selected():
+            selected = [roots_list.get(index) for index in roots_list.curselection()]
+            if not selected:
+                messagebox.showinfo("Scan Several Roots", "Select at least one root.", parent=dialog)
+                return
+            dialog.destroy()
+            self.path_var.set(format_roots(selected))
+            self.start_scan()
+        
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(fill="x")
+        ttk.Button(button_frame, text="➕ Add Folder...", command=add_folder).pack(side="left")
+        ttk.Button(button_frame, text="❌ Cancel", command=dialog.destroy).pack(side="right")
+        ttk.Button(button_frame, text="🔍 Scan Selected", command=scan_selected).pack(side="right", padx=(0, 5))
+    
+    def show_root_progress(self):
+        """Window with each root's progress in a multi-root scan and a stop button per root"""
+        if self.root_progress_dialog is not None and self.root_progress_dialog.winfo_exists():
+            self.root_progress_dialog.destroy()
+        
+        dialog = self.root_progress_dialog = tk.Toplevel(self.root)
+        dialog.title("Scan Progress by Root")
+        dialog.transient(self.root)
+        dialog.geometry("600x260")
+        
+        main_frame = ttk.Frame(dialog, padding="10")
+        main_frame.pack(fill="both", expand=True)
+        
+        tree = ttk.Treeview(main_frame, columns=("Folders", "Files", "State"), height=8)
+        tree.heading("#0", text="Root")
+        tree.heading("Folders", text="Folders")
+        tree.heading("Files", text="Files")
+        tree.heading("State", text="State")
+        tree.column("#0", width=300)
+        tree.column("Folders", width=80, anchor="e")
+        tree.column("Files", width=80, anchor="e")
+        tree.column("State", width=90)
+        tree.pack(fill="both", expand=True, pady=(0, 10))
+        
+        def stop_selected():
+            scanner = self.active_scanner
+            if scanner is not None and isinstance(scanner, MultiRootScanner):
+                for item in tree.selection():
+                    scanner.stop_root(item)
+                self.refresh_root_progress(tree, self.scan_id, reschedule=False)
+        
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(fill="x")
+        ttk.Button(button_frame, text="⏹ Stop Selected Root", command=stop_selected).pack(side="left")
+        ttk.Button(button_frame, text="❌ Close", command=dialog.destroy).pack(side="right")
+        
+        self.root.after(250, lambda: self.refresh_root_progress(tree, self.scan_id))
+    
+    def refresh_root_progress(self, tree, scan_id, reschedule=True):
+        if scan_id != self.scan_id or not tree.winfo_exists():
+            return
+        
+        scanner = self.active_scanner
+        if isinstance(scanner, MultiRootScanner):
+            states = {'scanning': "⏳ Scanning", 'stopped': "⏹ Stopped", 'done': "✅ Done"}
+            for row in scanner.progress():
+                values = (f"{row['directories']:,}", f"{row['files']:,}", states[row['state']])
+                # Items are keyed by root so the selection survives each refresh
+                if tree.exists(row['root']):
+                    tree.item(row['root'], values=values)
+                else:
+                    tree.insert("", "end", iid=row['root'], text=row['root'], values=values)
         
+        # One more pass after the scan ends so the final counts show
+        if reschedule and (self.scanning or scanner is None):
+            self.root.after(500, lambda: self.refresh_root_progress(tree, scan_id, self.scanning))
+    
+    def get_scan_workers(self):
         try:
-            for root, dirs, files in os.walk(root_path):
-                if not self.scanning:
-                    break
-                
-                self.root.after(0, lambda: self.status_var.set(f"Scanning: {root}"))
-                
-                for file in files:
-                    if not self.scanning:
-                        break
-                    
-                    file_path = os.path.join(root, file)
-                    file_ext = os.path.splitext(file)[1].lower()
-                    
-                    if file_ext in self.all_extensions:
-                        try:
-                            stat = os.stat(file_path)
-                            file_info = {
-                                'name': file,
-                                'path': file_path,
-                                'ext': file_ext,
-                                'size': stat.st_size,
-                                'modified': datetime.fromtimestamp(stat.st_mtime),
-                                'category': self.get_file_category(file_ext)
-                            }
-                            found_files.append(file_info)
-                        except (OSError, IOError):
-                            continue
+            workers = int(self.workers_var.get())
+        except (tk.TclError, ValueError):
+            workers = self.scan_workers
+        self.scan_workers = max(1, min(64, workers))
+        if self.server_limits.default_cap != self.scan_workers:
+            # A server's limit never needs to exceed the workers that can call it
+            self.server_limits = ServerLimits(self.server_caps, default_cap=self.scan_workers)
+        return self.scan_workers
+    
+    def show_scan_rules(self):
+        """Dialog for the rules the scanner applies while walking"""
+        rules = self.scan_rules
+        
+        def date_text(timestamp):
+            if timestamp is None:
+                return ""
+            # Keep a time of day, so the text parses back to the same rule
+            moment = datetime.fromtimestamp(timestamp)
+            return moment.strftime('%Y-%m-%dT%H:%M' if moment.time() != datetime.min.time() else '%Y-%m-%d')
+        
+        fields = [
+            ('include', "Only file names matching (e.g. report*, *_final.*):", ", ".join(rules.include)),
+            ('exclude', "Skip file names matching:", ", ".join(rules.exclude)),
+            ('regex', "Only file names matching regular expression:", rules.regex or ""),
+            ('min_size', "Minimum size (e.g. 100KB):",
+             format_size_exact(rules.min_size) if rules.min_size is not None else ""),
+            ('max_size', "Maximum size (e.g. 2GB):",
+             format_size_exact(rules.max_size) if rules.max_size is not None else ""),
+            ('modified_after', "Modified on or after (YYYY-MM-DD):", date_text(rules.modified_after)),
+            ('modified_before', "Modified before (YYYY-MM-DD):", date_text(rules.modified_before)),
+            ('exclude_dirs', "Never enter folders matching (names or paths):", ", ".join(rules.exclude_dirs))
+        ]
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Scan Rules")
+        dialog.transient(self.root)
+        dialog.resizable(False, False)
+        dialog.grab_set()
+        
+        main_frame = ttk.Frame(dialog, padding="10")
+        main_frame.pack(fill="both", expand=True)
+        
+        ttk.Label(main_frame, text="Files and folders left out here are never read from the drive. "
+                                   "Category and search filters still apply to the results.",
+                  wraplength=420, foreground="gray").grid(row=0, column=0, columnspan=2, sticky="w", pady=(0, 10))
+        
+        variables = {}
+        for row, (key, label, value) in enumerate(fields, start=1):
+            ttk.Label(main_frame, text=label).grid(row=row, column=0, sticky="w", padx=(0, 10), pady=2)
+            variables[key] = tk.StringVar(value=value)
+            ttk.Entry(main_frame, textvariable=variables[key], width=40).grid(row=row, column=1, sticky="ew", pady=2)
+        
+        def reset_folders():
+            variables['exclude_dirs'].set(", ".join(DEFAULT_EXCLUDED_DIRS))
+        
+        button_frame = ttk.Frame(main_frame)
+        button_frame.grid(row=len(fields) + 1, column=0, columnspan=2, sticky="ew", pady=(10, 0))
+        ttk.Button(button_frame, text="↺ Default Folders", command=reset_folders).pack(side="left")
+        ttk.Button(button_frame, text="❌ Cancel", command=dialog.destroy).pack(side="right")
+        shown = {key: value for key, label, value in fields}
+        ttk.Button(button_frame, text="✅ Save",
+                   command=lambda: self.save_scan_rules(dialog, variables, shown)).pack(side="right", padx=(0, 5))
+    
+    def save_scan_rules(self, dialog, variables, shown=None):
+        values = {key: variable.get().strip() for key, variable in variables.items()}
+        if shown is not None and values == {key: value.strip() for key, value in shown.items()}:
+            # Nothing edited; new rules would change the signature and clear the folder index
+            dialog.destroy()
+            return
+        
+        def split(text):
+            return [part.strip() for part in text.split(",") if part.strip()]
+        
+        try:
+            rules = ScanRules(self.all_extensions,
+                              include=split(values['include']),
+                              exclude=split(values['exclude']),
+                              regex=values['regex'],
+                              min_size=parse_size(values['min_size']),
+                              max_size=parse_size(values['max_size']),
+                              modified_after=parse_date(values['modified_after']),
+                              modified_before=parse_date(values['modified_before']),
+                              exclude_dirs=split(values['exclude_dirs']))
+        except (ValueError, re.error) as e:
+            messagebox.showerror("Invalid Rule", f"Could not use these rules: {e}", parent=dialog)
+            return
         
+        if rules.signature() != self.scan_rules.signature():
+            self.scan_rules = rules
+        self.save_settings()
+        dialog.destroy()
+        self.status_var.set("Scan rules saved - they apply from the next scan")
+    
+    def show_server_limits(self):
+        """Dialog for per-server caps on calls in flight during a scan"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Server Limits")
+        dialog.transient(self.root)
+        dialog.resizable(False, False)
+        dialog.grab_set()
+        
+        main_frame = ttk.Frame(dialog, padding="10")
+        main_frame.pack(fill="both", expand=True)
+        
+        adaptive_var = tk.BooleanVar(value=self.adaptive_workers)
+        ttk.Checkbutton(main_frame, text="Adapt the number of parallel calls to each server's response time",
+                        variable=adaptive_var).pack(anchor="w", pady=(0, 10))
+        
+        ttk.Label(main_frame, text="Hard limits, one per line as 'server = calls'. A server is a UNC\n"
+                                   "name (nas01), an NFS server or a mount point (/mnt/projects).",
+                  foreground="gray").pack(anchor="w", pady=(0, 5))
+        caps_text = tk.Text(main_frame, width=50, height=8)
+        caps_text.pack(fill="both", expand=True, pady=(0, 10))
+        caps_text.insert("1.0", "\n".join(f"{server} = {cap}" for server, cap in self.server_caps.items()))
+        
+        learned = [limiter.snapshot() for limiter in self.server_limits.limiters.values()]
+        if learned:
+            ttk.Label(main_frame, text="Learned this session: " + ", ".join(
+                f"{info['server']} {info['limit']}" for info in learned)).pack(anchor="w", pady=(0, 10))
+        
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(fill="x")
+        ttk.Button(button_frame, text="❌ Cancel", command=dialog.destroy).pack(side="right")
+        ttk.Button(button_frame, text="✅ Save",
+                   command=lambda: self.save_server_limits(dialog, adaptive_var.get(),
+                                                           caps_text.get("1.0", "end"))).pack(side="right", padx=(0, 5))
+    
+    def save_server_limits(self, dialog, adaptive, caps_text):
+        try:
+            caps = parse_server_caps(caps_text.splitlines())
+        except ValueError as e:
+            messagebox.showerror("Invalid Limit", str(e), parent=dialog)
+            return
+        
+        self.adaptive_workers = bool(adaptive)
+        self.server_caps = caps
+        # New caps start every server over; limits learned so far would ignore them
+        self.server_limits = ServerLimits(caps, default_cap=self.get_scan_workers())
+        self.save_settings()
+        dialog.destroy()
+        self.status_var.set("Server limits saved - they apply from the next scan")
+    
+    def load_scan_index(self, root_path, scan_id):
+        """Load cached folders for root_path (or a list of roots) and show their files right away"""
+        cache = {}
+        for root in [root_path] if isinstance(root_path, str) else root_path:
+            try:
+                cache.update(self.scan_index.load_tree(root, self.scan_rules))
+            except (sqlite3.Error, OSError, ValueError):
+                pass
+        
+        if cache:
+            cached_store = FileStore(self.file_categories)
+            for directory, (_, _, files) in cache.items():
+                if files:
+                    cached_store.add_files(directory, files)
+            self.root.after(0, lambda: self.show_cached_results(cached_store, scan_id))
+        
+        return cache
+    
+    def show_cached_results(self, store, scan_id):
+        if not self.scanning or scan_id != self.scan_id:
+            return
+        
+        self.file_store = store
+        self.shown_rows = len(store)
+        self.apply_filters()
+        self.notebook.tab(1, text=f"📄 Files ({len(store)})")
+        self.notebook.select(1)
+        self.status_var.set(f"Showing {len(store)} indexed files - checking for changes...")
+    
+    def resume_scan(self):
+        """Continue the selected folder's stopped scan from its last checkpoint"""
+        if self.scanning:
+            return
+        
+        roots = self.get_scan_roots()
+        if len(roots) != 1:
+            messagebox.showinfo("Resume Scan", "Select the one folder whose stopped scan should continue.")
+            return
+        
+        try:
+            info = self.scan_checkpoint.info(roots[0], self.scan_rules)
+        except (sqlite3.Error, OSError):
+            info = None
+        if info is None:
+            messagebox.showinfo("Resume Scan", f"There is no stopped scan of '{roots[0]}' to resume.")
+            return
+        self.start_scan(resume=True)
+    
+    def save_checkpoint(self, scanner):
+        try:
+            self.scan_checkpoint.save(self.scan_index, scanner)
+        except (sqlite3.Error, OSError):
+            pass
+    
+    def finish_checkpoint(self, scanner):
+        """Forget the checkpoint of a scan that read every folder, else save where it stopped"""
+        # Folders that failed to list for a passing reason (e.g. the VPN dropped) stay on the
+        # frontier for a resume; denied or vanished ones were taken off it
+        self.resume_folders = len(scanner.frontier)
+        try:
+            if self.scanning and not scanner.frontier:
+                self.scan_checkpoint.discard(scanner.root_path)
+            else:
+                self.scan_checkpoint.save(self.scan_index, scanner)
+        except (sqlite3.Error, OSError):
+            pass
+    
+    def save_scan_index(self, scanner):
+        try:
+            # Deleted folders can only be detected when the whole tree was visited
+            removed = scanner.removed_directories() if self.scanning else ()
+            self.scan_index.save_tree(scanner.index_updates, removed)
+        except (sqlite3.Error, OSError):
+            pass
+    
+    def scan_files(self, root_path, use_index=True, scan_id=0, store=None, telemetry=None, sizes=None,
+                   resume=False):
+        """Scan root_path, or a list of roots together, into store on this worker thread"""
+        counters = new_scan_counters()
+        streamed = False
+        watchers = []
+        last_status = [0.0]
+        
+        def on_directory(directory):
+            # Workers list many folders per second - only refresh the status a few times a second
+            now = time.monotonic()
+            if now - last_status[0] >= 0.1:
+                last_status[0] = now
+                self.root.after(0, lambda: self.status_var.set(f"Scanning: {directory}"))
+        
+        try:
+            resume_state = None
+            if resume:
+                try:
+                    resume_state = self.scan_checkpoint.load(root_path, self.scan_rules)
+                except (sqlite3.Error, OSError):
+                    pass
+            # Folders a resumed scan already did are only kept in the index
+            cache = self.load_scan_index(root_path, scan_id) if use_index or resume_state else {}
+            
+            # Indexed results are already on screen - only stream into the visible
+            # store when starting from nothing, otherwise swap the new store in at the end
+            streamed = not cache
+            if not streamed:
+                store = FileStore(self.file_categories)
+            
+            options = dict(workers=self.scan_workers,
+                           should_continue=lambda: self.scanning,
+                           on_directory=on_directory,
+                           cache=cache,
+                           telemetry=telemetry,
+                           rules=self.scan_rules,
+                           on_files=sizes.add_files if sizes is not None else None)
+            if isinstance(root_path, str):
+                limiter = self.server_limits.for_path(root_path) if self.adaptive_workers else None
+                if resume_state is None:
+                    try:
+                        self.scan_checkpoint.start(self.scan_index, root_path, self.scan_rules)
+                    except (sqlite3.Error, OSError):
+                        pass
+                scanner = ParallelScanner(root_path, self.all_extensions, store, limiter=limiter,
+                                          resume=resume_state, on_checkpoint=self.save_checkpoint,
+                                          checkpoint_interval=CHECKPOINT_SECONDS, **options)
+                roots = [root_path]
+            else:
+                limits = self.server_limits if self.adaptive_workers else None
+                scanner = MultiRootScanner(root_path, self.all_extensions, store, limits=limits, **options)
+                roots = scanner.roots
+            self.active_scanner = scanner
+            scanner.run()
+            counters = scanner.counters
+            self.save_scan_index(scanner)
+            if not isinstance(scanner, MultiRootScanner):
+                self.finish_checkpoint(scanner)
+            
+            # Only a root scanned to the end knows every folder it has to watch
+            if self.watch_changes and self.scanning:
+                if isinstance(scanner, MultiRootScanner):
+                    roots = [row['root'] for row in scanner.progress() if row['state'] == 'done']
+                for root in roots:
+                    tree = scanner.directory_tree(root) if len(roots) > 1 else scanner.directory_tree()
+                    watchers.append(self.create_watcher(root, store, tree))
+            
         except Exception as e:
-            self.root.after(0, lambda: messagebox.showerror("Error", f"Error during scan: {str(e)}"))
+            error = str(e)
+            self.root.after(0, lambda: messagebox.showerror("Error", f"Error during scan: {error}"))
+        
+        self.root.after(0, lambda: self.scan_complete(store, counters, scan_id, streamed, watchers))
+    
+    def create_watcher(self, root_path, store, directories):
+        watcher = TreeWatcher(root_path, store, directories, self.scan_rules)
+        watcher.on_change = lambda added, removed: self.root.after(
+            0, lambda: self.watch_changed(watcher, added, removed))
+        return watcher
+    
+    def format_call_savings(self, counters):
+        summary = (f"{counters['directories_listed']:,} listings, {counters['stat_calls']:,} stat calls, "
+                   f"{counters['calls_saved']:,} remote calls saved")
+        if counters.get('directories_cached'):
+            summary += f", {counters['directories_cached']:,} folders unchanged"
+        if counters.get('directories_pruned'):
+            summary += f", {counters['directories_pruned']:,} folders excluded"
+        if counters.get('directories_resumed'):
+            summary += f", {counters['directories_resumed']:,} folders done before resuming"
+        if counters.get('directories_unreadable'):
+            summary += f", {counters['directories_unreadable']:,} folders unreadable"
+        if counters.get('directories_failed'):
+            summary += f", {counters['directories_failed']:,} folders failed with an internal error"
+        return summary
+    
+    def drain_scan_results(self, reschedule=True):
+        """Show the rows the scan workers have added to the store since the last pass"""
+        store = self.file_store
+        # Rows of an earlier scan live in its own store, so only this scan's rows appear here
+        if len(store) > self.shown_rows:
+            started = time.perf_counter()
+            self.add_scan_results(self.shown_rows, len(store))
+            if self.scan_telemetry:
+                self.scan_telemetry.record_ui(time.perf_counter() - started)
+        
+        if reschedule and self.scanning:
+            self.root.after(100, self.drain_scan_results)
+    
+    def add_scan_results(self, start, end):
+        first_results = start == 0
+        self.shown_rows = end
+        self.update_search_index()
         
-        self.root.after(0, lambda: self.scan_complete(found_files))
+        selected_categories = self.get_selected_categories()
+        search_term = self.search_var.get().lower()
+        # Content results only cover the rows there were when that search started
+        if not (search_term and self.content_search_var.get()):
+            self.displayed_files.extend(filter_rows(self.file_store, range(start, end),
+                                                    selected_categories, search_term))
+        if not self.scanning:
+            # While a scan streams in, new rows go to the end; the last pass puts them in order
+            self.displayed_files = self.sorted_rows(self.displayed_files)
+        self.file_list.set_rows(self.displayed_files, keep_position=True)
+        
+        self.count_var.set(f"Files: {len(self.displayed_files)}")
+        self.notebook.tab(1, text=f"📄 Files ({end})")
+        if first_results:
+            self.notebook.select(1)
     
-    def scan_complete(self, files):
+    def scan_complete(self, store, counters=None, scan_id=None, streamed=False, watchers=()):
+        if scan_id is not None and scan_id != self.scan_id:
+            return
+        
         self.scanning = False
         self.stop_button.config(state="disabled")
         self.scan_folder_button.config(state="normal")
         self.quick_scan_button.config(state="normal")
         self.progress.stop()
         
-        self.filtered_files = files
-        self.apply_filters()
-        
-        scan_type = "Network" if self.is_network_path(self.path_var.get()) else "Local"
-        self.status_var.set(f"{scan_type} scan complete. Found {len(files)} matching files.")
+        if streamed:
+            # The workers have finished, so every row is in the store
+            self.drain_scan_results(reschedule=False)
+            if self.sort_column is not None:
+                # Rows streamed in during the scan were added unsorted
+                self.displayed_files = self.sorted_rows(self.displayed_files)
+                self.file_list.set_rows(self.displayed_files, keep_position=True)
+        elif store is not None:
+            self.file_store = store
+            self.shown_rows = len(store)
+            self.apply_filters()
+        
+        file_count = len(self.file_store)
+        scan_type = "Network" if any(is_network_path(root) for root in self.get_scan_roots()) else "Local"
+        status = f"{scan_type} scan complete. Found {file_count} matching files."
+        if counters:
+            status += f" ({self.format_call_savings(counters)})"
+        if self.resume_folders:
+            status += (f" {self.resume_folders:,} folders not read yet - "
+                       f"View > Resume Stopped Scan continues from there.")
+        if watchers and self.watch_changes:
+            self.stop_watching()
+            self.watchers = list(watchers)
+            for watcher in self.watchers:
+                watcher.start()
+            methods = sorted(set(watcher.method for watcher in self.watchers))
+            status += f" Watching for changes ({', '.join(methods)})."
+        self.status_var.set(status)
         
         # Update files tab title with count
-        self.notebook.tab(1, text=f"📄 Files ({len(files)})")
+        self.notebook.tab(1, text=f"📄 Files ({file_count})")
         
         # Switch to files tab to show results
         self.notebook.select(1)
+        self.refresh_folder_sizes()
+        self.refresh_telemetry(reschedule=False)
     
-    def get_file_category(self, extension):
-        for category, extensions in self.file_categories.items():
-            if extension in extensions:
-                return category
-        return "Other"
+    def toggle_watch(self):
+        self.watch_changes = bool(self.watch_var.get())
+        if not self.watch_changes and self.watchers:
+            self.stop_watching()
+            self.status_var.set("Stopped watching for changes")
+        elif self.watch_changes and not self.watchers:
+            self.status_var.set("Watching for changes starts with the next scan")
     
-    def apply_filters(self):
-        selected_categories = [cat for cat, var in self.filter_vars.items() if var.get()]
+    def stop_watching(self):
+        for watcher in self.watchers:
+            watcher.stop()
+        self.watchers = []
+    
+    def watch_changed(self, watcher, added, removed):
+        """Apply files a TreeWatcher saw added, changed or removed to the Files tab"""
+        if watcher not in self.watchers or self.file_store is not watcher.store:
+            return
+        
+        store = self.file_store
+        sizes = self.folder_sizes
+        if removed:
+            removed_rows = set(removed)
+            self.displayed_files = array('I', (row_id for row_id in self.displayed_files
+                                               if row_id not in removed_rows))
+            self.file_list.set_rows(self.displayed_files, keep_position=True)
+            self.count_var.set(f"Files: {len(self.displayed_files)}")
+            if sizes is not None:
+                self.update_folder_sizes(sizes.remove_files, store, removed)
+        
+        if added:
+            if sizes is not None:
+                self.update_folder_sizes(sizes.add_files, store, added)
+            # New rows sit above the shown watermark, exactly like streamed scan results
+            self.add_scan_results(self.shown_rows, len(store))
+        
+        self.notebook.tab(1, text=f"📄 Files ({store.live_count()})")
+        self.status_var.set(f"👁 {time.strftime('%H:%M:%S')}: {len(added)} files added or changed, "
+                            f"{len(removed)} removed or replaced ({watcher.method})")
+    
+    def update_folder_sizes(self, update, store, row_ids):
+        by_directory = {}
+        for row_id in row_ids:
+            by_directory.setdefault(store.dir_col[row_id], []).append(
+                (store.names[row_id], store.sizes[row_id], store.mtimes[row_id]))
+        for dir_id, files in by_directory.items():
+            update(store.directories[dir_id], files)
+    
+    def refresh_folder_sizes(self):
+        """Redraw the folder sizes tab from the current scan's rollup"""
+        for item in self.sizes_tree.get_children():
+            self.sizes_tree.delete(item)
+        self.folder_size_items = {}
+        
+        sizes = self.folder_sizes
+        roots = [(path, sizes.totals(path)) for path in sizes.roots] if sizes is not None else []
+        roots = [(path, totals) for path, totals in roots if totals is not None]
+        if not roots:
+            self.folder_sizes_status_var.set("Start a scan to see which folders use the space")
+            self.notebook.tab(3, text="📦 Folder Sizes")
+            return
+        
+        if self.folder_sizes_mode.get() == "largest":
+            rows = self.sort_folder_size_rows(sizes.largest(MAX_SIZE_FOLDERS))
+            for path, size, files in rows:
+                self.insert_folder_size_row("", path, size, files, label=path)
+        else:
+            # Each root of a multi-root scan is a top-level folder
+            for path, totals in roots:
+                item = self.insert_folder_size_row("", path, totals['bytes'], totals['files'], label=path)
+                self.sizes_tree.item(item, open=True)
+                self.fill_folder_size_children(item)
+        
+        total_bytes = sum(totals['bytes'] for _, totals in roots)
+        total_files = sum(totals['files'] for _, totals in roots)
+        status = (f"{format_file_size(total_bytes)} in {total_files:,} files "
+                  f"across {len(sizes):,} folders")
+        if self.scanning:
+            status += " (scan still running - refresh for newer totals)"
+        self.folder_sizes_status_var.set(status)
+        self.notebook.tab(3, text=f"📦 Folder Sizes ({format_file_size(total_bytes)})")
+    
+    def sort_folder_size_rows(self, rows):
+        key = self.folder_sizes_key
+        if key == 'name':
+            return sorted(rows, key=lambda row: row[0].lower())
+        column = 2 if key == 'files' else 1
+        return sorted(rows, key=lambda row: row[column], reverse=True)
+    
+    def sort_folder_sizes(self, key):
+        self.folder_sizes_key = key
+        for column, heading, column_key in (("#0", "Folder", 'name'), ("Size", "Size", 'bytes'),
+                                            ("Files", "Files", 'files')):
+            self.sizes_tree.heading(column, text=heading + (" ▼" if key == column_key else ""))
+        self.refresh_folder_sizes()
+    
+    def insert_folder_size_row(self, parent_item, path, size, files, label=None):
+        root_bytes = self.folder_size_root_bytes()
+        share = f"{100.0 * size / root_bytes:.1f}%" if root_bytes else ""
+        item = self.sizes_tree.insert(parent_item, "end",
+                                      text=f"📁 {label or os.path.basename(path) or path}",
+                                      values=(format_file_size(size), f"{files:,}", share,
+                                              self.folder_sizes.top_category(path)))
+        self.folder_size_items[item] = path
+        
+        # Placeholder so folders with subfolders can be expanded; filled in on first open
+        if self.folder_sizes.children.get(path):
+            self.sizes_tree.insert(item, "end", text="Loading...")
+        return item
+    
+    def folder_size_root_bytes(self):
+        return self.folder_sizes.root_bytes()
+    
+    def fill_folder_size_children(self, item):
+        for child in self.sizes_tree.get_children(item):
+            self.sizes_tree.delete(child)
+        
+        path = self.folder_size_items.get(item)
+        rows = self.sort_folder_size_rows(self.folder_sizes.largest(0, parent=path))
+        for child_path, size, files in rows[:MAX_SIZE_FOLDERS]:
+            self.insert_folder_size_row(item, child_path, size, files)
+        
+        totals = self.folder_sizes.totals(path)
+        if totals and totals['own_files']:
+            self.sizes_tree.insert(item, "end", text="📄 (files in this folder)",
+                                   values=(format_file_size(totals['own_bytes']),
+                                           f"{totals['own_files']:,}", "", ""))
+        if len(rows) > MAX_SIZE_FOLDERS:
+            self.sizes_tree.insert(item, "end", text=f"... {len(rows) - MAX_SIZE_FOLDERS:,} smaller folders")
+    
+    def on_folder_size_open(self, event=None):
+        """Fill in a folder's subfolders the first time it is expanded"""
+        item = self.sizes_tree.focus()
+        children = self.sizes_tree.get_children(item) if item else ()
+        if len(children) == 1 and self.sizes_tree.item(children[0])['text'] == "Loading...":
+            self.fill_folder_size_children(item)
+    
+    def on_folder_size_double_click(self, event):
+        selection = self.sizes_tree.selection()
+        if not selection:
+            return
+        
+        # Folders with subfolders expand; the others open in the file manager
+        path = self.folder_size_items.get(selection[0])
+        if path and not self.folder_sizes.children.get(path):
+            self.open_folder_in_explorer(path)
+    
+    def refresh_telemetry(self, reschedule=True):
+        """Redraw the telemetry tab from the running scan's counters"""
+        if not self.scan_telemetry:
+            return
         
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        # Keep the scroll position so a reader isn't pulled back to the top every refresh
+        top = self.telemetry_text.yview()[0]
+        self.telemetry_text.config(state="normal")
+        self.telemetry_text.delete("1.0", tk.END)
+        self.telemetry_text.insert("1.0", format_telemetry(self.scan_telemetry.snapshot()))
+        self.telemetry_text.config(state="disabled")
+        self.telemetry_text.yview_moveto(top)
+        
+        if reschedule and self.scanning:
+            self.root.after(500, self.refresh_telemetry)
+    
+    def telemetry_json(self):
+        return json.dumps(self.scan_telemetry.snapshot(), indent=2)
+    
+    def copy_telemetry(self):
+        if not self.scan_telemetry:
+            messagebox.showwarning("Warning", "No scan telemetry yet.")
+            return
+        self.root.clipboard_clear()
+        self.root.clipboard_append(self.telemetry_json())
+        self.status_var.set("Scan telemetry copied to clipboard")
+    
+    def save_telemetry(self):
+        if not self.scan_telemetry:
+            messagebox.showwarning("Warning", "No scan telemetry yet.")
+            return
         
-        displayed_files = []
+        file_path = filedialog.asksaveasfilename(
+            title="Save Scan Telemetry",
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        
+        if file_path:
+            try:
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    f.write(self.telemetry_json())
+                self.status_var.set(f"Scan telemetry saved to {file_path}")
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not save telemetry: {str(e)}")
+    
+    def get_selected_categories(self):
+        """Store category codes of the ticked filter boxes"""
+        return set(self.file_store.category_code(cat) for cat, var in self.filter_vars.items() if var.get())
+    
+    def apply_filters(self):
+        if self.content_search_var.get() and self.search_var.get():
+            # New filters or results mean a new content search over them
+            self.start_content_search()
+            return
+        
+        store = self.file_store
+        rows = range(self.shown_rows)
+        selected_categories = self.get_selected_categories()
         search_term = self.search_var.get().lower()
         
-        for file_info in self.filtered_files:
-            if file_info['category'] not in selected_categories:
-                continue
-            
-            if search_term and search_term not in file_info['name'].lower():
-                continue
-            
-            displayed_files.append(file_info)
-            self.add_file_to_tree(file_info)
+        if search_term and not self.search_index.covers(store):
+            # Index still being built - filter_rows scans the names directly meanwhile
+            self.update_search_index()
         
+        # Rows still waiting in the streaming watermark are added by add_scan_results
+        displayed_files = filter_rows(store, rows, selected_categories, search_term, self.search_index)
+        displayed_files = self.sorted_rows(displayed_files)
+        
+        self.displayed_files = displayed_files
+        self.file_list.set_rows(displayed_files)
         self.count_var.set(f"Files: {len(displayed_files)}")
     
-    def add_file_to_tree(self, file_info):
-        size_str = self.format_file_size(file_info['size'])
-        mod_str = file_info['modified'].strftime("%Y-%m-%d %H:%M")
+    def sorted_rows(self, row_ids):
+        """row_ids in the order of the sorted column, or unchanged when nothing is sorted"""
+        if self.sort_column is None:
+            return row_ids
+        return self.sort_index.sort(self.file_store, row_ids, self.sort_column, self.sort_descending)
+    
+    def sort_files(self, column):
+        """Sort the Files list by a column heading; clicking it again reverses the order"""
+        if column == self.sort_column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column = column
+            # Biggest and newest first is what people look for
+            self.sort_descending = column in ("Size", "Modified")
+        self.update_sort_headings()
+        
+        started = time.perf_counter()
+        self.displayed_files = self.sorted_rows(self.displayed_files)
+        self.file_list.set_rows(self.displayed_files)
+        self.status_var.set(f"Sorted {len(self.displayed_files):,} files by {column} "
+                            f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+    
+    def update_sort_headings(self):
+        for column in SortIndex.COLUMNS:
+            arrow = ""
+            if column == self.sort_column:
+                arrow = " ▼" if self.sort_descending else " ▲"
+            self.tree.heading(column, text=column + arrow)
+    
+    def update_search_index(self):
+        """Index new results on a background thread so the UI never waits for it"""
+        if self.search_index.covers(self.file_store):
+            return
+        
+        thread = self.search_index_thread
+        if thread and thread.is_alive() and self.search_index.rows is self.file_store:
+            # The running thread keeps going until it has caught up with the store
+            return
         
-        self.tree.insert("", "end", values=(
-            file_info['name'],
-            file_info['category'],
+        self.search_index_thread = threading.Thread(target=self.search_index.sync,
+                                                    args=(self.file_store,))
+        self.search_index_thread.daemon = True
+        self.search_index_thread.start()
+    
+    def format_file_row(self, row_id):
+        store = self.file_store
+        size_str = format_file_size(store.sizes[row_id])
+        mod_str = store.modified(row_id).strftime("%Y-%m-%d %H:%M")
+        
+        return (
+            store.names[row_id],
+            store.category(row_id),
             size_str,
             mod_str,
-            file_info['path']
-        ))
+            store.path(row_id)
+        )
     
-    def format_file_size(self, size_bytes):
-        if size_bytes == 0:
-            return "0 B"
-        
-        size_names = ["B", "KB", "MB", "GB", "TB"]
-        i = 0
-        while size_bytes >= 1024 and i < len(size_names) - 1:
-            size_bytes /= 1024.0
-            i += 1
+    def filter_by_search(self, *args):
+        if self.content_search_var.get():
+            # Content searches read files, so they start on Enter rather than while typing
+            if not self.search_var.get():
+                self.stop_content_search()
+                self.apply_filters()
+            return
         
-        return f"{size_bytes:.1f} {size_names[i]}"
+        # Wait for a pause in typing instead of filtering on every keystroke
+        if self.search_after_id:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(200, self.run_search)
     
-    def filter_by_search(self, *args):
+    def run_search(self):
+        self.search_after_id = None
         self.apply_filters()
     
     def clear_search(self):
         self.search_var.set("")
     
+    def toggle_content_search(self):
+        self.stop_content_search()
+        if self.content_search_var.get() and not self.search_var.get():
+            self.status_var.set("Type the text to find inside the files and press Enter")
+        else:
+            self.apply_filters()
+    
+    def start_content_search(self, event=None):
+        """Search inside the text files among the filtered results; matches stream into the list"""
+        query = self.search_var.get()
+        if not self.content_search_var.get() or not query:
+            return
+        try:
+            pattern = compile_content_query(query, regex=self.content_regex_var.get())
+        except re.error as e:
+            messagebox.showerror("Invalid Search", f"Invalid regular expression: {e}")
+            return
+        
+        self.stop_content_search()
+        search_id = self.content_search_id
+        store = self.file_store
+        rows = filter_rows(store, range(self.shown_rows), self.get_selected_categories())
+        candidates = content_search_candidates(store, rows)
+        
+        self.content_matches = []
+        self.content_shown = 0
+        self.displayed_files = array('I')
+        self.file_list.set_rows(self.displayed_files)
+        self.count_var.set("Files: 0")
+        self.content_stop_button.config(state="normal")
+        self.status_var.set(f"Searching inside {len(candidates):,} text files...")
+        
+        self.content_thread = threading.Thread(target=self.content_search_background,
+                                               args=(store, candidates, pattern, search_id, len(rows)))
+        self.content_thread.daemon = True
+        self.content_thread.start()
+        self.root.after(200, lambda: self.drain_content_matches(search_id))
+    
+    def content_search_background(self, store, candidates, pattern, search_id, total_rows):
+        matches = self.content_matches
+        last_status = [0.0]
+        
+        def on_progress(done, total):
+            now = time.monotonic()
+            if now - last_status[0] >= 0.2:
+                last_status[0] = now
+                self.root.after(0, lambda: search_id == self.content_search_id and self.status_var.set(
+                    f"Searching inside text files: {done:,} of {total:,} read, {len(matches):,} matches..."))
+        
+        try:
+            found = search_contents(store, candidates, pattern, min(self.scan_workers, 8),
+                                    lambda: search_id == self.content_search_id,
+                                    matches.append, on_progress)
+        except Exception as e:
+            error = str(e)
+            self.root.after(0, lambda: messagebox.showerror("Error", f"Content search failed: {error}"))
+            found = None
+        self.root.after(0, lambda: self.content_search_complete(search_id, found, len(candidates), total_rows))
+    
+    def drain_content_matches(self, search_id, reschedule=True):
+        """Add the matches found since the last pass to the Files list"""
+        if search_id != self.content_search_id:
+            return
+        
+        matches = self.content_matches
+        if len(matches) > self.content_shown:
+            self.displayed_files.extend(matches[self.content_shown:])
+            self.content_shown = len(self.displayed_files)
+            self.displayed_files = self.sorted_rows(self.displayed_files)
+            self.file_list.set_rows(self.displayed_files, keep_position=True)
+            self.count_var.set(f"Files: {len(self.displayed_files)}")
+        
+        if reschedule:
+            self.root.after(200, lambda: self.drain_content_matches(search_id))
+    
+    def content_search_complete(self, search_id, matches, searched, total_rows):
+        if search_id != self.content_search_id:
+            return
+        
+        self.content_stop_button.config(state="disabled")
+        self.displayed_files = self.sorted_rows(array('I', matches or ()))
+        self.content_shown = len(self.displayed_files)
+        # Stops the drain loop; a new search gets a new id anyway
+        self.content_search_id += 1
+        self.file_list.set_rows(self.displayed_files, keep_position=True)
+        self.count_var.set(f"Files: {len(self.displayed_files)}")
+        self.status_var.set(f"{len(self.displayed_files):,} files contain '{self.search_var.get()}' "
+                            f"({searched:,} text files read, {total_rows - searched:,} skipped as not text "
+                            f"or over {format_file_size(CONTENT_MAX_SIZE)})")
+    
+    def stop_content_search(self):
+        """Stop a running content search; the matches found so far stay in the list"""
+        running = self.content_thread is not None and self.content_thread.is_alive()
+        self.drain_content_matches(self.content_search_id, reschedule=False)
+        self.content_search_id += 1
+        self.content_stop_button.config(state="disabled")
+        if running:
+            self.status_var.set(f"Content search stopped - {len(self.displayed_files):,} matching files so far")
+    
+    def toggle_preview(self):
+        if self.preview_var.get():
+            self.preview_frame.grid()
+            self.schedule_previews()
+        else:
+            self.preview_frame.grid_remove()
+            self.thumbnail_loader.want([])
+    
+    def schedule_previews(self):
+        """Update the preview once scrolling or the selection settles"""
+        if self.preview_after_id is not None:
+            self.root.after_cancel(self.preview_after_id)
+        self.preview_after_id = self.root.after(100, self.update_previews)
+    
+    def update_previews(self):
+        """Ask for thumbnails of the selected row first, then the visible rows and the next page"""
+        self.preview_after_id = None
+        if not self.preview_var.get():
+            return
+        
+        file_list = self.file_list
+        selected = file_list.selected_row()
+        count = file_list.page_size()
+        rows = [row_id for row_id in file_list.rows[file_list.offset:file_list.offset + 2 * count]
+                if row_id != selected]
+        if selected is not None:
+            rows.insert(0, selected)
+        
+        requests = [request for request in thumbnail_requests(self.file_store, rows)
+                    if request not in self.thumbnails]
+        self.thumbnail_loader.want(requests)
+        self.show_preview()
+    
+    def remember_thumbnail(self, request, image):
+        self.thumbnails[request] = image
+        if len(self.thumbnails) > MAX_PREVIEW_THUMBNAILS:
+            del self.thumbnails[next(iter(self.thumbnails))]
+    
+    def thumbnail_ready(self, request, image):
+        self.remember_thumbnail(request, image)
+        if request == self.preview_request:
+            self.show_preview()
+    
+    def show_preview(self):
+        row_id = self.file_list.selected_row()
+        self.preview_request = None
+        self.preview_image = None
+        
+        if row_id is None:
+            text = "Select an image or drawing to preview"
+        else:
+            name = self.file_store.names[row_id]
+            requests = thumbnail_requests(self.file_store, [row_id])
+            if not requests:
+                text = f"{name}\n\nNo preview for this file"
+            else:
+                self.preview_request = requests[0]
+                image = self.thumbnails.get(self.preview_request)
+                if image:
+                    self.preview_image = tk.PhotoImage(data=base64.b64encode(image))
+                    text = name
+                elif image is not None:
+                    text = f"{name}\n\nNo picture in this file"
+                elif can_make_thumbnails():
+                    text = f"{name}\n\nLoading preview..."
+                else:
+                    text = f"{name}\n\nInstall Pillow to see previews"
+        
+        self.preview_label.config(image=self.preview_image or "", text=text)
+    
     def select_all_filters(self):
         for var in self.filter_vars.values():
             var.set(True)
@@ -1001,7 +2247,7 @@ class NetworkFileExplorer:
             return
         
         item = selection[0]
-        file_path = self.tree.item(item)['values'][4]
+        file_path = self.file_store.path(self.file_list.row_for_item(item))
         
         try:
             if platform.system() == "Windows":
@@ -1020,7 +2266,7 @@ class NetworkFileExplorer:
             return
         
         item = selection[0]
-        file_path = self.tree.item(item)['values'][4]
+        file_path = self.file_store.path(self.file_list.row_for_item(item))
         folder_path = os.path.dirname(file_path)
         
         try:
@@ -1040,7 +2286,7 @@ class NetworkFileExplorer:
             return
         
         item = selection[0]
-        file_path = self.tree.item(item)['values'][4]
+        file_path = self.file_store.path(self.file_list.row_for_item(item))
         self.root.clipboard_clear()
         self.root.clipboard_append(file_path)
         self.status_var.set("File path copied to clipboard")
@@ -1052,56 +2298,218 @@ class NetworkFileExplorer:
             return
         
         item = selection[0]
-        file_name = self.tree.item(item)['values'][0]
+        file_name = self.file_store.names[self.file_list.row_for_item(item)]
         self.root.clipboard_clear()
         self.root.clipboard_append(file_name)
         self.status_var.set("File name copied to clipboard")
     
     def export_results(self):
-        if not self.tree.get_children():
+        if not self.displayed_files:
             messagebox.showwarning("Warning", "No results to export.")
             return
         
+        if self.export_thread and self.export_thread.is_alive():
+            messagebox.showwarning("Warning", "An export is already running.")
+            return
+        
         file_path = filedialog.asksaveasfilename(
             title="Export Results",
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("Text files", "*.txt"), ("All files", "*.*")]
+            filetypes=[("CSV files", "*.csv"), ("Compressed CSV files", "*.csv.gz"),
+                       ("JSON Lines files", "*.jsonl"), ("Compressed JSON Lines files", "*.jsonl.gz"),
+                       ("Text files", "*.txt"), ("All files", "*.*")]
         )
         
-        if file_path:
-            try:
-                with open(file_path, 'w', newline='', encoding='utf-8') as f:
-                    if file_path.endswith('.csv'):
-                        import csv
-                        writer = csv.writer(f)
-                        writer.writerow(["Name", "Type", "Size", "Modified", "Path"])
-                        
-                        for item in self.tree.get_children():
-                            values = self.tree.item(item)['values']
-                            writer.writerow(values)
-                    else:
-                        f.write("Name\tType\tSize\tModified\tPath\n")
-                        for item in self.tree.get_children():
-                            values = self.tree.item(item)['values']
-                            f.write("\t".join(str(v) for v in values) + "\n")
-                
-                messagebox.showinfo("Success", f"Results exported to {file_path}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Could not export results: {str(e)}")
+        if not file_path:
+            return
+        
+        # Export a snapshot so filtering or scanning meanwhile doesn't change the output
+        row_ids = array('I', self.displayed_files)
+        self.export_cancelled = False
+        self.show_export_progress(len(row_ids))
+        
+        self.export_thread = threading.Thread(target=self.export_background,
+                                              args=(self.file_store, row_ids, file_path))
+        self.export_thread.daemon = True
+        self.export_thread.start()
+    
+    def show_export_progress(self, total):
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Exporting Results")
+        dialog.transient(self.root)
+        dialog.resizable(False, False)
+        dialog.protocol("WM_DELETE_WINDOW", self.cancel_export)
+        
+        main_frame = ttk.Frame(dialog, padding="10")
+        main_frame.pack(fill="both", expand=True)
+        
+        self.export_label_var = tk.StringVar(value=f"Exporting {total:,} files...")
+        ttk.Label(main_frame, textvariable=self.export_label_var).pack(anchor="w", pady=(0, 5))
+        
+        self.export_progress = ttk.Progressbar(main_frame, mode='determinate', length=320,
+                                               maximum=max(total, 1))
+        self.export_progress.pack(fill="x", pady=(0, 10))
+        
+        ttk.Button(main_frame, text="❌ Cancel", command=self.cancel_export).pack(side="right")
+        self.export_dialog = dialog
+    
+    def export_background(self, store, row_ids, file_path):
+        def on_progress(done, total):
+            self.root.after(0, lambda: self.export_progressed(done, total))
+        
+        try:
+            count = export_rows(store, row_ids, file_path, on_progress,
+                                lambda: not self.export_cancelled)
+        except Exception as e:
+            error = str(e)
+            self.root.after(0, lambda: self.export_finished(None, file_path, error))
+            return
+        
+        self.root.after(0, lambda: self.export_finished(count, file_path))
+    
+    def export_progressed(self, done, total):
+        if self.export_dialog is None:
+            return
+        self.export_progress['value'] = done
+        self.export_label_var.set(f"Exported {done:,} of {total:,} files...")
+    
+    def cancel_export(self):
+        self.export_cancelled = True
+        if self.export_label_var is not None:
+            self.export_label_var.set("Cancelling...")
+    
+    def export_finished(self, count, file_path, error=None):
+        if self.export_dialog is not None:
+            self.export_dialog.destroy()
+        self.export_dialog = None
+        self.export_label_var = None
+        
+        if error:
+            messagebox.showerror("Error", f"Could not export results: {error}")
+        elif count is None:
+            self.status_var.set("Export cancelled")
+        else:
+            self.status_var.set(f"Exported {count:,} files to {file_path}")
+            messagebox.showinfo("Success", f"{count:,} results exported to {file_path}")
+    
+    
+    def start_duplicate_search(self):
+        if not self.displayed_files:
+            messagebox.showwarning("Warning", "No results to search. Run a scan first.")
+            return
+        
+        if self.duplicate_thread and self.duplicate_thread.is_alive():
+            return
+        
+        self.duplicates_cancelled = False
+        self.find_duplicates_button.config(state="disabled")
+        self.cancel_duplicates_button.config(state="normal")
+        self.duplicate_status_var.set(f"Grouping {len(self.displayed_files):,} files by size...")
+        self.notebook.select(2)
+        
+        # Search a snapshot of the filtered results, so filters narrow the search
+        row_ids = array('I', self.displayed_files)
+        self.duplicate_thread = threading.Thread(target=self.duplicate_search_background,
+                                                 args=(self.file_store, row_ids))
+        self.duplicate_thread.daemon = True
+        self.duplicate_thread.start()
+    
+    def duplicate_search_background(self, store, row_ids):
+        stages = ("Comparing first and last KB", "Hashing matching files")
+        last_status = [0.0]
+        
+        def on_progress(stage, done, total):
+            now = time.monotonic()
+            if now - last_status[0] >= 0.1 or done == total:
+                last_status[0] = now
+                self.root.after(0, lambda: self.duplicate_status_var.set(
+                    f"{stages[stage]}: {done:,} of {total:,} files..."))
+        
+        try:
+            groups = find_duplicates(store, row_ids, min(self.scan_workers, 8), self.hash_cache,
+                                     lambda: not self.duplicates_cancelled, on_progress)
+        except Exception as e:
+            error = str(e)
+            self.root.after(0, lambda: self.duplicates_found(store, None, error))
+            return
+        
+        self.root.after(0, lambda: self.duplicates_found(store, groups))
+    
+    def cancel_duplicate_search(self):
+        self.duplicates_cancelled = True
+        self.duplicate_status_var.set("Cancelling...")
+    
+    def duplicates_found(self, store, groups, error=None):
+        self.find_duplicates_button.config(state="normal")
+        self.cancel_duplicates_button.config(state="disabled")
+        
+        if error:
+            self.duplicate_status_var.set("Duplicate search failed")
+            messagebox.showerror("Error", f"Could not search for duplicates: {error}")
+            return
+        if groups is None:
+            self.duplicate_status_var.set("Duplicate search cancelled")
+            return
+        
+        for item in self.duplicates_tree.get_children():
+            self.duplicates_tree.delete(item)
+        
+        for size, digest, rows in groups[:MAX_DUPLICATE_GROUPS]:
+            group_item = self.duplicates_tree.insert(
+                "", "end", text=f"{len(rows)} copies of {format_file_size(size)}",
+                values=(f"{format_file_size(size * (len(rows) - 1))} wasted", "", digest))
+            for row_id in rows:
+                self.duplicates_tree.insert(group_item, "end", text=store.names[row_id],
+                                            values=(format_file_size(size),
+                                                    store.modified(row_id).strftime("%Y-%m-%d %H:%M"),
+                                                    store.path(row_id)))
+        
+        wasted = sum(size * (len(rows) - 1) for size, _, rows in groups)
+        status = f"{len(groups):,} groups of duplicates, {format_file_size(wasted)} wasted"
+        if len(groups) > MAX_DUPLICATE_GROUPS:
+            status += f" (showing the {MAX_DUPLICATE_GROUPS:,} largest)"
+        self.duplicate_status_var.set(status)
+        self.notebook.tab(2, text=f"🔁 Duplicates ({len(groups)})")
+    
+    def on_duplicate_double_click(self, event):
+        selection = self.duplicates_tree.selection()
+        if not selection:
+            return
+        
+        # Only file rows carry a path; group rows just expand
+        values = self.duplicates_tree.item(selection[0])['values']
+        if self.duplicates_tree.parent(selection[0]) and values:
+            self.open_folder_in_explorer(os.path.dirname(str(values[2])))
     
     def refresh_results(self):
         if self.path_var.get():
             self.start_scan()
     
+    def full_rescan(self):
+        if self.path_var.get():
+            self.start_scan(use_index=False)
+    
     def clear_results(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self.stop_watching()
+        self.folder_load_id += 1
+        self.folder_items = {}
+        self.folders_expanding = set()
         for item in self.folders_tree.get_children():
             self.folders_tree.delete(item)
-        self.filtered_files = []
+        self.file_store = FileStore(self.file_categories)
+        self.displayed_files = array('I')
+        self.shown_rows = 0
+        self.file_list.set_rows(self.displayed_files)
         self.count_var.set("Files: 0")
         self.notebook.tab(0, text="📁 Folders")
         self.notebook.tab(1, text="📄 Files")
+        self.duplicates_cancelled = True
+        self.stop_content_search()
+        for item in self.duplicates_tree.get_children():
+            self.duplicates_tree.delete(item)
+        self.notebook.tab(2, text="🔁 Duplicates")
+        self.folder_sizes = None
+        self.refresh_folder_sizes()
     
     def load_settings(self):
         settings_file = "file_explorer_settings.json"
@@ -1111,13 +2519,46 @@ class NetworkFileExplorer:
                     settings = json.load(f)
                     if 'last_path' in settings:
                         self.path_var.set(settings['last_path'])
+                    if 'scan_workers' in settings:
+                        self.scan_workers = int(settings['scan_workers'])
+                        self.workers_var.set(self.scan_workers)
+                    if 'server_caps' in settings:
+                        self.server_caps = {str(server): int(cap) for server, cap in settings['server_caps'].items()}
+                        self.server_limits = ServerLimits(self.server_caps, default_cap=self.scan_workers)
+                    if 'adaptive_workers' in settings:
+                        self.adaptive_workers = bool(settings['adaptive_workers'])
+                    if 'watch_changes' in settings:
+                        self.watch_changes = bool(settings['watch_changes'])
+                        self.watch_var.set(self.watch_changes)
+                    if 'scan_rules' in settings:
+                        self.scan_rules = ScanRules.from_dict(self.all_extensions, settings['scan_rules'])
+                    if settings.get('sort_column') in SortIndex.COLUMNS:
+                        self.sort_column = settings['sort_column']
+                        self.sort_descending = bool(settings.get('sort_descending'))
+                        self.update_sort_headings()
+                    if 'drives' in settings:
+                        self.drives = [str(drive) for drive in settings['drives']]
+                    if 'show_preview' in settings:
+                        self.preview_var.set(bool(settings['show_preview']))
+                        self.toggle_preview()
         except:
             pass
     
     def save_settings(self):
         settings_file = "file_explorer_settings.json"
         try:
-            settings = {'last_path': self.path_var.get()}
+            settings = {
+                'last_path': self.path_var.get(),
+                'scan_workers': self.get_scan_workers(),
+                'scan_rules': self.scan_rules.to_dict(),
+                'watch_changes': self.watch_changes,
+                'server_caps': self.server_caps,
+                'adaptive_workers': self.adaptive_workers,
+                'sort_column': self.sort_column,
+                'sort_descending': self.sort_descending,
+                'show_preview': self.preview_var.get(),
+                'drives': self.drives
+            }
             with open(settings_file, 'w') as f:
                 json.dump(settings, f)
         except:
@@ -1151,7 +2592,23 @@ Created with Python and Tkinter"""
         messagebox.showinfo("About", about_text)
     
     def on_closing(self):
+        if self.closing:
+            return
+        self.closing = True
         self.scanning = False
+        self.stop_watching()
+        self.close_when_scan_stopped(time.monotonic() + 5)
+    
+    def close_when_scan_stopped(self, deadline):
+        """Give a running scan up to the deadline to save its checkpoint, then close the window"""
+        # The scan thread still calls root.after while winding down, which needs the main
+        # loop running - so poll for it to end rather than blocking in join()
+        if self.scan_thread is not None and self.scan_thread.is_alive() and time.monotonic() < deadline:
+            self.root.after(100, lambda: self.close_when_scan_stopped(deadline))
+            return
+        
+        self.thumbnail_loader.stop()
+        self.thumbnail_cache.close()
         self.save_settings()
         self.root.destroy()
 
@@ -0,0 +1,3513 @@
+import os
+import sys
+import io
+import csv
+import errno
+import gzip
+import json
+import fnmatch
+import math
+import mmap
+import time
+import queue
+import select
+import struct
+import ctypes
+import ctypes.util
+import random
+import re
+import shutil
+import string
+import subprocess
+import bisect
+import heapq
+import hashlib
+import sqlite3
+import argparse
+import platform
+import statistics
+import threading
+from datetime import datetime
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Pillow is optional; without it cached thumbnails still show but no new ones are made
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Scanning, filtering, diagnosis and export shared by the GUI and the command line.
+# Nothing in here may import tkinter, so scans can run on servers without a display.
+
+FILE_CATEGORIES = {
+    'Documents': ['.doc', '.docx', '.pdf', '.txt', '.rtf', '.odt'],
+    'Presentations': ['.ppt', '.pptx', '.odp'],
+    'Spreadsheets': ['.xls', '.xlsx', '.csv', '.ods'],
+    'Images': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif', '.svg', '.webp'],
+    'CAD Files': ['.dwg', '.dxf', '.dwf', '.dgn'],
+    'Archives': ['.zip', '.rar', '.7z', '.tar', '.gz'],
+    'Videos': ['.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv'],
+    'Audio': ['.mp3', '.wav', '.flac', '.aac', '.ogg'],
+    'Code': ['.py', '.js', '.html', '.css', '.cpp', '.java', '.c']
+}
+
+def all_extensions(file_categories):
+    """Flatten category extensions for quick lookup"""
+    extensions = set()
+    for exts in file_categories.values():
+        extensions.update(exts)
+    return extensions
+
+def select_extensions(file_categories, categories=None, extensions=None):
+    """Extensions of the named categories plus any extra ones, or every known extension"""
+    if not categories and not extensions:
+        return all_extensions(file_categories)
+    
+    selected = set()
+    for category in categories or ():
+        selected.update(file_categories[category])
+    for ext in extensions or ():
+        ext = ext.lower()
+        selected.add(ext if ext.startswith('.') else '.' + ext)
+    return selected
+
+def get_file_category(extension, file_categories=FILE_CATEGORIES):
+    for category, extensions in file_categories.items():
+        if extension in extensions:
+            return category
+    return "Other"
+
+def format_file_size(size_bytes):
+    if size_bytes == 0:
+        return "0 B"
+    
+    size_names = ["B", "KB", "MB", "GB", "TB"]
+    i = 0
+    while size_bytes >= 1024 and i < len(size_names) - 1:
+        size_bytes /= 1024.0
+        i += 1
+    
+    return f"{size_bytes:.1f} {size_names[i]}"
+
+def get_drive_type(drive):
+    try:
+        if platform.system() == "Windows":
+            import ctypes
+            drive_type = ctypes.windll.kernel32.GetDriveTypeW(drive)
+            types = {1: "Unknown", 2: "Removable", 3: "Local", 4: "Network", 5: "CD-ROM", 6: "RAM"}
+            return types.get(drive_type, "Unknown")
+    except:
+        pass
+    return "Local"
+
+def is_network_path(path):
+    return (path.startswith('\\\\') or 
+            (len(path) >= 2 and path[1] == ':' and get_drive_type(path[:3]) == "Network"))
+
+
+# On Windows os.scandir returns size and times with the listing, so DirEntry.stat()
+# needs no extra round trip for regular entries. Elsewhere only the entry type is free.
+SCANDIR_HAS_STAT = os.name == 'nt'
+
+def entry_stat(entry, counters):
+    """Stat a DirEntry, counting whether the data came from the listing or a stat call"""
+    if SCANDIR_HAS_STAT and not entry.is_symlink():
+        counters['calls_saved'] += 1
+    else:
+        counters['stat_calls'] += 1
+    return entry.stat()
+
+def new_scan_counters():
+    return {'directories_listed': 0, 'directories_cached': 0, 'stat_calls': 0, 'calls_saved': 0,
+            'directories_pruned': 0, 'directories_resumed': 0, 'directories_failed': 0,
+            'directories_unreadable': 0}
+
+def list_subfolders(path, counters=None, should_continue=None):
+    """Immediate subfolders of path as [{'name', 'path'}] sorted by name, or None once stopped"""
+    counters = counters if counters is not None else new_scan_counters()
+    should_continue = should_continue or (lambda: True)
+    folders = []
+    
+    with os.scandir(path) as dir_entries:
+        counters['directories_listed'] += 1
+        for item_entry in dir_entries:
+            if not should_continue():
+                return None
+            
+            try:
+                # Entry type comes with the listing - no isdir round trip
+                if item_entry.is_dir():
+                    counters['calls_saved'] += 1
+                    folders.append({
+                        'name': item_entry.name,
+                        'path': item_entry.path
+                    })
+            except OSError:
+                # Skip items we can't access
+                continue
+    
+    # Sort folders by name (case-insensitive)
+    folders.sort(key=lambda x: x['name'].lower())
+    return folders
+
+def count_folder_entries(path, limit=100):
+    """Count the immediate subfolders and files of path, giving up after limit entries
+    
+    Cut-off counts come back as strings like "12+", and "?" when the folder can't be read.
+    """
+    subfolders = 0
+    files = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subfolders += 1
+                else:
+                    files += 1
+                
+                # Limit counting to avoid slowdown
+                if subfolders + files > limit:
+                    subfolders = f"{subfolders}+"
+                    files = f"{files}+"
+                    break
+    except (PermissionError, OSError):
+        subfolders = "?"
+        files = "?"
+    
+    return subfolders, files
+
+DEFAULT_EXCLUDED_DIRS = ['.git', 'node_modules', '.snapshot', '~snapshot', '$RECYCLE.BIN',
+                         'System Volume Information']
+
+def compile_globs(patterns):
+    """One case-insensitive matcher for several fnmatch patterns, or None when there are none"""
+    patterns = [pattern for pattern in patterns if pattern]
+    if not patterns:
+        return None
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns), re.IGNORECASE).match
+
+class ScanRules:
+    """File and folder rules a scan applies while it walks
+    
+    Name rules (extensions, include/exclude globs, regex) are checked straight from
+    the listing, before any stat call; size and modification time limits after it.
+    Folders matching an excluded pattern are never listed, so their whole subtree
+    costs nothing. Patterns without a path separator match the folder name, the
+    others the full path with '/' separators (relative ones its trailing folders).
+    Everything is compiled once, so the scanner only calls wants_name, wants_stat
+    and wants_directory per entry.
+    """
+    
+    def __init__(self, extensions=None, include=(), exclude=(), regex=None, min_size=None,
+                 max_size=None, modified_after=None, modified_before=None, exclude_dirs=()):
+        self.extensions = None if extensions is None else frozenset(ext.lower() for ext in extensions)
+        self.include = list(include)
+        self.exclude = list(exclude)
+        self.regex = regex or None
+        self.min_size = min_size
+        self.max_size = max_size
+        self.modified_after = modified_after
+        self.modified_before = modified_before
+        self.exclude_dirs = list(exclude_dirs)
+        
+        self.wants_name = self._compile_name_rules()
+        self.wants_stat = self._compile_stat_rules()
+        self.wants_directory = self._compile_directory_rules()
+    
+    def _compile_name_rules(self):
+        checks = []
+        if self.extensions is not None:
+            extensions = self.extensions
+            splitext = os.path.splitext
+            checks.append(lambda name: splitext(name)[1].lower() in extensions)
+        
+        include = compile_globs(self.include)
+        if include:
+            checks.append(lambda name: include(name) is not None)
+        
+        exclude = compile_globs(self.exclude)
+        if exclude:
+            checks.append(lambda name: exclude(name) is None)
+        
+        if self.regex:
+            search = re.compile(self.regex, re.IGNORECASE).search
+            checks.append(lambda name: search(name) is not None)
+        
+        return self._combine(checks)
+    
+    def _compile_stat_rules(self):
+        checks = []
+        if self.min_size is not None:
+            min_size = self.min_size
+            checks.append(lambda size, mtime: size >= min_size)
+        if self.max_size is not None:
+            max_size = self.max_size
+            checks.append(lambda size, mtime: size <= max_size)
+        if self.modified_after is not None:
+            after = self.modified_after
+            checks.append(lambda size, mtime: mtime >= after)
+        if self.modified_before is not None:
+            before = self.modified_before
+            checks.append(lambda size, mtime: mtime < before)
+        
+        if not checks:
+            return lambda size, mtime: True
+        if len(checks) == 1:
+            return checks[0]
+        return lambda size, mtime: all(check(size, mtime) for check in checks)
+    
+    def _compile_directory_rules(self):
+        name_match = compile_globs(p for p in self.exclude_dirs if '/' not in p and '\\' not in p)
+        # Relative path patterns such as 'projects/archive' match at the end of the path
+        path_patterns = [p.replace('\\', '/') for p in self.exclude_dirs if '/' in p or '\\' in p]
+        path_match = compile_globs(p if p.startswith(('/', '*')) else '*/' + p for p in path_patterns)
+        
+        if name_match and path_match:
+            return lambda name, path: (name_match(name) is None and
+                                       path_match(path.replace('\\', '/')) is None)
+        if name_match:
+            return lambda name, path: name_match(name) is None
+        if path_match:
+            return lambda name, path: path_match(path.replace('\\', '/')) is None
+        return lambda name, path: True
+    
+    def _combine(self, checks):
+        if not checks:
+            return lambda name: True
+        if len(checks) == 1:
+            return checks[0]
+        return lambda name: all(check(name) for check in checks)
+    
+    def signature(self):
+        """Text that changes whenever the files a scan collects would change; used by ScanIndex"""
+        signature = ",".join(sorted(self.extensions or ()))
+        rules = self.to_dict()
+        if any(rules.values()):
+            signature += json.dumps(rules, sort_keys=True)
+        return signature
+    
+    def to_dict(self):
+        """The rules other than extensions, as saved in the settings file"""
+        return {
+            'include': self.include,
+            'exclude': self.exclude,
+            'regex': self.regex,
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'modified_after': self.modified_after,
+            'modified_before': self.modified_before,
+            'exclude_dirs': self.exclude_dirs
+        }
+    
+    @classmethod
+    def from_dict(cls, extensions, rules):
+        known = cls(extensions).to_dict()
+        return cls(extensions, **{key: value for key, value in (rules or {}).items() if key in known})
+
+def parse_size(text):
+    """Bytes from text like '500', '20KB', '1.5 MB' or '2G'; None for empty text"""
+    text = str(text).strip().upper().replace(" ", "")
+    if not text:
+        return None
+    units = {'TB': 1024 ** 4, 'GB': 1024 ** 3, 'MB': 1024 ** 2, 'KB': 1024, 'T': 1024 ** 4,
+             'G': 1024 ** 3, 'M': 1024 ** 2, 'K': 1024, 'B': 1}
+    for unit, factor in units.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(float(text))
+
+def format_size_exact(size_bytes):
+    """Text parse_size turns back into exactly size_bytes, in the largest unit that divides it"""
+    for unit, factor in (('TB', 1024 ** 4), ('GB', 1024 ** 3), ('MB', 1024 ** 2), ('KB', 1024)):
+        if size_bytes and size_bytes % factor == 0:
+            return f"{size_bytes // factor}{unit}"
+    return str(size_bytes)
+
+def parse_date(text):
+    """Local timestamp from an ISO date such as '2024-01-31' or '2024-01-31T08:00'; None for empty text"""
+    text = str(text).strip()
+    if not text:
+        return None
+    return datetime.fromisoformat(text).timestamp()
+
+class ScanIndex:
+    """SQLite index of scanned folders, used to skip folders whose mtime has not changed
+    
+    A folder's mtime only changes when entries are added, removed or renamed, so files
+    edited in place keep their cached size and date until a full rescan.
+    """
+    
+    def __init__(self, db_path="file_explorer_index.db"):
+        self.db_path = db_path
+    
+    def connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("CREATE TABLE IF NOT EXISTS directories "
+                     "(path TEXT PRIMARY KEY, mtime REAL, subdirs TEXT)")
+        conn.execute("CREATE TABLE IF NOT EXISTS files "
+                     "(directory TEXT, name TEXT, size INTEGER, mtime REAL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS files_directory ON files (directory)")
+        return conn
+    
+    def check_extensions(self, conn, extensions):
+        """Drop the index when the set of scanned extensions (or ScanRules) has changed"""
+        if isinstance(extensions, ScanRules):
+            signature = extensions.signature()
+        else:
+            signature = ",".join(sorted(extensions))
+        row = conn.execute("SELECT value FROM meta WHERE key = 'extensions'").fetchone()
+        if row is None or row[0] != signature:
+            conn.execute("DELETE FROM directories")
+            conn.execute("DELETE FROM files")
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('extensions', ?)", (signature,))
+    
+    def _subtree_clause(self, root_path):
+        # Range query on the primary key instead of LIKE, so '%' and '_' in names are safe
+        prefix = root_path if root_path.endswith(os.sep) else root_path + os.sep
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return "(path = ? OR (path >= ? AND path < ?))", (root_path, prefix, upper)
+    
+    def load_tree(self, root_path, extensions):
+        """Return {folder: (mtime, subfolder names, [(name, size, mtime)])} for a cached tree"""
+        tree = {}
+        with self.connect() as conn:
+            self.check_extensions(conn, extensions)
+            clause, params = self._subtree_clause(root_path)
+            for path, mtime, subdirs in conn.execute(
+                    f"SELECT path, mtime, subdirs FROM directories WHERE {clause}", params):
+                tree[path] = (mtime, json.loads(subdirs), [])
+            
+            file_clause = clause.replace("path", "directory")
+            for directory, name, size, mtime in conn.execute(
+                    f"SELECT directory, name, size, mtime FROM files WHERE {file_clause}", params):
+                if directory in tree:
+                    tree[directory][2].append((name, size, mtime))
+        conn.close()
+        return tree
+    
+    def save_tree(self, updates, removed=()):
+        """Store re-listed folders and forget folders that no longer exist"""
+        with self.connect() as conn:
+            changed = list(updates) + list(removed)
+            conn.executemany("DELETE FROM directories WHERE path = ?", ((p,) for p in changed))
+            conn.executemany("DELETE FROM files WHERE directory = ?", ((p,) for p in changed))
+            conn.executemany("INSERT INTO directories VALUES (?, ?, ?)",
+                             ((path, mtime, json.dumps(subdirs))
+                              for path, (mtime, subdirs, files) in updates.items()))
+            conn.executemany("INSERT INTO files VALUES (?, ?, ?, ?)",
+                             ((path, name, size, mtime)
+                              for path, (_, _, files) in updates.items()
+                              for name, size, mtime in files))
+        conn.close()
+
+class ScanCheckpoint:
+    """Progress of an unfinished scan kept in SQLite so it can resume where it stopped
+    
+    Folders the scan has fully read go into the ScanIndex with their files; the
+    checkpoint adds which folders this scan has done and the frontier of folders
+    it still has to list. Only what changed since the last save is written.
+    """
+    
+    def __init__(self, db_path="file_explorer_index.db"):
+        self.db_path = db_path
+    
+    def connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE IF NOT EXISTS checkpoints "
+                     "(root TEXT PRIMARY KEY, signature TEXT, saved REAL, done INTEGER, frontier INTEGER)")
+        conn.execute("CREATE TABLE IF NOT EXISTS checkpoint_done (root TEXT, path TEXT)")
+        conn.execute("CREATE INDEX IF NOT EXISTS checkpoint_done_root ON checkpoint_done (root)")
+        conn.execute("CREATE TABLE IF NOT EXISTS checkpoint_frontier (root TEXT, path TEXT, mtime REAL)")
+        return conn
+    
+    def start(self, scan_index, root_path, rules):
+        """Begin a new checkpoint for root_path, dropping any earlier one"""
+        # The index has to be kept for these rules too, or resuming would find it cleared
+        with scan_index.connect() as conn:
+            scan_index.check_extensions(conn, rules)
+        conn.close()
+        self.discard(root_path)
+        with self.connect() as conn:
+            conn.execute("INSERT INTO checkpoints VALUES (?, ?, ?, 0, 0)",
+                         (root_path, rules.signature(), time.time()))
+        conn.close()
+    
+    def save(self, scan_index, scanner):
+        """Write the scanner's folders done since the last save and its current frontier"""
+        frontier, done, updates = scanner.checkpoint_state()
+        scan_index.save_tree(updates)
+        with self.connect() as conn:
+            root = scanner.root_path
+            conn.executemany("INSERT INTO checkpoint_done VALUES (?, ?)", ((root, path) for path in done))
+            conn.execute("DELETE FROM checkpoint_frontier WHERE root = ?", (root,))
+            conn.executemany("INSERT INTO checkpoint_frontier VALUES (?, ?, ?)",
+                             ((root, path, mtime) for path, mtime in frontier))
+            conn.execute("UPDATE checkpoints SET saved = ?, done = done + ?, frontier = ? WHERE root = ?",
+                         (time.time(), len(done), len(frontier), root))
+        conn.close()
+    
+    def info(self, root_path, rules):
+        """{'saved', 'done', 'frontier'} of root_path's checkpoint, or None when there is none to resume"""
+        with self.connect() as conn:
+            row = conn.execute("SELECT signature, saved, done, frontier FROM checkpoints WHERE root = ?",
+                               (root_path,)).fetchone()
+        conn.close()
+        # Different rules would mix files the new rules reject with ones they want
+        if row is None or row[0] != rules.signature():
+            return None
+        return {'saved': row[1], 'done': row[2], 'frontier': row[3]}
+    
+    def load(self, root_path, rules):
+        """(done folders, [(frontier folder, mtime)]) to resume root_path, or None"""
+        if self.info(root_path, rules) is None:
+            return None
+        with self.connect() as conn:
+            done = {path for (path,) in conn.execute(
+                "SELECT path FROM checkpoint_done WHERE root = ?", (root_path,))}
+            frontier = conn.execute("SELECT path, mtime FROM checkpoint_frontier WHERE root = ?",
+                                    (root_path,)).fetchall()
+        conn.close()
+        return done, frontier
+    
+    def discard(self, root_path):
+        with self.connect() as conn:
+            for table in ("checkpoints", "checkpoint_done", "checkpoint_frontier"):
+                conn.execute(f"DELETE FROM {table} WHERE root = ?", (root_path,))
+        conn.close()
+
+# Paths looked up per query; SQLite before 3.32 allows at most 999 bound variables
+HASH_LOOKUP_BATCH = 900
+
+class HashCache:
+    """SQLite cache of file hashes keyed by path, valid while size and mtime are unchanged"""
+    
+    def __init__(self, db_path="file_explorer_index.db"):
+        self.db_path = db_path
+    
+    def connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE IF NOT EXISTS hashes "
+                     "(path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, partial TEXT, full TEXT)")
+        return conn
+    
+    def load(self, paths):
+        """Return {path: (size, mtime, partial hash, full hash or None)} for the cached paths"""
+        cached = {}
+        paths = list(paths)
+        with self.connect() as conn:
+            # Look up only these paths, in batches under SQLite's limit on bound variables
+            for start in range(0, len(paths), HASH_LOOKUP_BATCH):
+                batch = paths[start:start + HASH_LOOKUP_BATCH]
+                for path, size, mtime, partial, full in conn.execute(
+                        "SELECT path, size, mtime, partial, full FROM hashes WHERE path IN "
+                        f"({', '.join('?' * len(batch))})", batch):
+                    cached[path] = (size, mtime, partial, full)
+        conn.close()
+        return cached
+    
+    def save(self, entries):
+        """Store {path: (size, mtime, partial hash, full hash or None)}"""
+        with self.connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)",
+                             ((path, size, mtime, partial, full)
+                              for path, (size, mtime, partial, full) in entries.items()))
+        conn.close()
+
+class FileStore:
+    """Scan results kept column by column instead of one dict per file
+    
+    Categories are small integer codes, sizes and mtimes are integer arrays and
+    each folder path is stored once for all of its files. Rows are addressed by
+    their position; display strings are only built for rows that are shown.
+    """
+    
+    def __init__(self, file_categories):
+        self.category_names = list(file_categories) + ["Other"]
+        self.other_code = len(self.category_names) - 1
+        self.ext_codes = {}
+        for code, extensions in enumerate(file_categories.values()):
+            for ext in extensions:
+                self.ext_codes.setdefault(ext, code)
+        
+        self.directories = []
+        self.directory_ids = {}
+        self.dir_col = array('I')
+        self.names = []
+        self.sizes = array('q')
+        self.mtimes = array('q')
+        self.category_col = array('B')
+        
+        # Rows below count are complete; workers append under the lock
+        self.count = 0
+        self.lock = threading.Lock()
+        
+        # Rows a TreeWatcher found deleted or changed; they keep their slot so row ids
+        # stay valid, and the per-folder row lists are only built once a watcher needs them
+        self.removed = set()
+        self.directory_rows = None
+    
+    def __len__(self):
+        return self.count
+    
+    def live_count(self):
+        """Rows that have not been removed since the scan"""
+        return self.count - len(self.removed)
+    
+    def category_code(self, category):
+        try:
+            return self.category_names.index(category)
+        except ValueError:
+            return self.other_code
+    
+    def add_files(self, directory, files):
+        """Append the (name, size, mtime) tuples found in one folder"""
+        with self.lock:
+            self._append(directory, files)
+    
+    def _append(self, directory, files):
+        dir_id = self.directory_ids.get(directory)
+        if dir_id is None:
+            dir_id = len(self.directories)
+            self.directories.append(directory)
+            self.directory_ids[directory] = dir_id
+        
+        first_row = self.count
+        for name, size, mtime in files:
+            self.dir_col.append(dir_id)
+            self.names.append(name)
+            self.sizes.append(size)
+            self.mtimes.append(int(mtime))
+            self.category_col.append(self.ext_codes.get(os.path.splitext(name)[1].lower(),
+                                                        self.other_code))
+        self.count += len(files)
+        
+        if self.directory_rows is not None:
+            self.directory_rows.setdefault(dir_id, array('I')).extend(range(first_row, self.count))
+        return range(first_row, self.count)
+    
+    def replace_directory(self, directory, files):
+        """Make a folder's live rows match a fresh listing; return (added, removed) row ids
+        
+        Unchanged files keep their rows. Changed files get a new row and their old
+        one is removed, so every row still describes a single version of a file.
+        """
+        with self.lock:
+            if self.directory_rows is None:
+                rows = {}
+                for row_id in range(self.count):
+                    rows.setdefault(self.dir_col[row_id], array('I')).append(row_id)
+                self.directory_rows = rows
+            
+            dir_id = self.directory_ids.get(directory)
+            current = {}
+            if dir_id is not None:
+                current = {self.names[row_id]: row_id for row_id in self.directory_rows.get(dir_id, ())
+                           if row_id not in self.removed}
+            
+            listed = {name: (size, int(mtime)) for name, size, mtime in files}
+            removed = [row_id for name, row_id in current.items()
+                       if listed.get(name) != (self.sizes[row_id], self.mtimes[row_id])]
+            self.removed.update(removed)
+            
+            kept = set(current) - {self.names[row_id] for row_id in removed}
+            added = self._append(directory, [file for file in files if file[0] not in kept])
+            
+            if dir_id is not None and removed:
+                # Drop dead rows from the folder's list so it does not grow with every change
+                self.directory_rows[dir_id] = array('I', (row_id for row_id in self.directory_rows[dir_id]
+                                                          if row_id not in self.removed))
+        return added, removed
+    
+    def path(self, row_id):
+        return os.path.join(self.directories[self.dir_col[row_id]], self.names[row_id])
+    
+    def category(self, row_id):
+        return self.category_names[self.category_col[row_id]]
+    
+    def modified(self, row_id):
+        return datetime.fromtimestamp(self.mtimes[row_id])
+
+class FolderSizes:
+    """Bytes, file counts and per-category bytes rolled up the folder tree as a scan runs
+    
+    The walk only adds each folder's own matches (and links a new folder to its
+    parents), which is constant work per folder. Totals are rolled up in one pass
+    from the deepest folders upwards the first time they are asked for after new
+    files arrived. Only one small record per folder is kept - never the files -
+    which keeps 100k+ folder trees cheap and lets the CLI use it while streaming.
+    root_path may also be a list of roots scanned together; each is a top folder.
+    """
+    
+    # Slots of a folder record before the per-category bytes
+    BYTES, FILES = range(2)
+    
+    def __init__(self, root_path, file_categories):
+        # Same key for a root whether or not it was given with a trailing separator
+        roots = [root_path] if isinstance(root_path, str) else root_path
+        self.roots = [os.path.dirname(os.path.join(root, "x")) for root in roots]
+        self.root_path = self.roots[0]
+        self.category_names = list(file_categories) + ["Other"]
+        self.other_code = len(self.category_names) - 1
+        self.ext_codes = {}
+        for code, extensions in enumerate(file_categories.values()):
+            for ext in extensions:
+                self.ext_codes.setdefault(ext, code)
+        
+        # Own matches per folder, each folder's parent and subfolders, and the rolled-up totals
+        self.records = {}
+        self.parents = {}
+        self.children = {}
+        self.rolled_up = None
+        self.lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self.records)
+    
+    def _new_record(self):
+        return array('q', bytes(8 * (2 + len(self.category_names))))
+    
+    def _register(self, path):
+        """Record for path, creating it and any missing ancestors up to the root"""
+        record = self.records.get(path)
+        if record is not None:
+            return record
+        
+        record = self.records[path] = self._new_record()
+        root = self._root_of(path)
+        if root is None:
+            # Not below a root (e.g. a differently spelled path) - treat it as a top folder
+            return record
+        child = path
+        while child != root:
+            parent = os.path.dirname(child)
+            if parent == child:
+                break
+            self.parents[child] = parent
+            self.children.setdefault(parent, set()).add(child)
+            if parent in self.records:
+                break
+            self.records[parent] = self._new_record()
+            child = parent
+        return record
+    
+    def _root_of(self, path):
+        for root in self.roots:
+            if path == root or path.startswith(root.rstrip(os.sep) + os.sep):
+                return root
+        return None
+    
+    def root_bytes(self):
+        """Total bytes under all roots"""
+        total = 0
+        for root in self.roots:
+            record = self.totals(root)
+            if record:
+                total += record['bytes']
+        return total
+    
+    def add_files(self, directory, files):
+        """Add one folder's (name, size, mtime) tuples; safe to call from scanner threads"""
+        self._add(directory, files, 1)
+    
+    def remove_files(self, directory, files):
+        """Take back files added earlier, e.g. ones a watcher saw deleted"""
+        self._add(directory, files, -1)
+    
+    def _add(self, directory, files, sign):
+        if not files:
+            return
+        
+        total = 0
+        category_bytes = {}
+        for name, size, _ in files:
+            total += size
+            code = self.ext_codes.get(os.path.splitext(name)[1].lower(), self.other_code)
+            category_bytes[code] = category_bytes.get(code, 0) + size
+        
+        path = os.path.dirname(os.path.join(directory, "x"))
+        with self.lock:
+            record = self._register(path)
+            record[self.BYTES] += sign * total
+            record[self.FILES] += sign * len(files)
+            for code, size in category_bytes.items():
+                record[2 + code] += sign * size
+            self.rolled_up = None
+    
+    def _rollup(self):
+        # Children always have longer paths than their parents, so longest-first
+        # visits every folder after all of its subfolders
+        if self.rolled_up is None:
+            totals = {path: array('q', record) for path, record in self.records.items()}
+            parents = self.parents
+            for path in sorted(totals, key=len, reverse=True):
+                parent = parents.get(path)
+                if parent is not None:
+                    target = totals[parent]
+                    for slot, value in enumerate(totals[path]):
+                        if value:
+                            target[slot] += value
+            self.rolled_up = totals
+        return self.rolled_up
+    
+    def totals(self, path):
+        """{'bytes', 'files', 'own_bytes', 'own_files', 'categories'} for a folder, or None"""
+        with self.lock:
+            record = self._rollup().get(path)
+            own = self.records.get(path)
+        if record is None:
+            return None
+        
+        categories = {self.category_names[code]: record[2 + code]
+                      for code in range(len(self.category_names)) if record[2 + code]}
+        return {
+            'bytes': record[self.BYTES],
+            'files': record[self.FILES],
+            'own_bytes': own[self.BYTES],
+            'own_files': own[self.FILES],
+            'categories': categories
+        }
+    
+    def largest(self, limit=100, parent=None, key='bytes'):
+        """[(path, bytes, files)] of the biggest folders, or of parent's subfolders
+        
+        key is 'bytes', 'files' or 'name'; names sort ascending, the others descending.
+        """
+        with self.lock:
+            totals = self._rollup()
+            paths = self.children.get(parent, ()) if parent is not None else totals
+            rows = [(path, totals[path][self.BYTES], totals[path][self.FILES]) for path in paths]
+        
+        if key == 'name':
+            rows.sort(key=lambda row: row[0].lower())
+            return rows[:limit] if limit else rows
+        
+        column = 2 if key == 'files' else 1
+        if limit:
+            return heapq.nlargest(limit, rows, key=lambda row: row[column])
+        return sorted(rows, key=lambda row: row[column], reverse=True)
+    
+    def top_category(self, path):
+        """Name of the category using the most bytes under path, or ''"""
+        with self.lock:
+            record = self._rollup().get(path)
+            if record is None:
+                return ""
+            sizes = list(record[2:])
+        best = max(range(len(sizes)), key=sizes.__getitem__)
+        return self.category_names[best] if sizes[best] else ""
+
+def format_largest_folders(sizes, limit=20):
+    """Plain-text table of the largest folders under a scan root"""
+    root_bytes = sizes.root_bytes()
+    lines = [f"{'SIZE':>10}  {'SHARE':>6}  {'FILES':>9}  FOLDER"]
+    for path, size, files in sizes.largest(limit):
+        share = f"{100.0 * size / root_bytes:5.1f}%" if root_bytes else "     -"
+        lines.append(f"{format_file_size(size):>10}  {share:>6}  {files:>9,}  {path}")
+    return "\n".join(lines)
+
+class LatencyHistogram:
+    """Call latencies counted in fixed buckets, bounds in milliseconds"""
+    
+    BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+    
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(self.BOUNDS_MS, seconds * 1000)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+    
+    def percentile(self, fraction):
+        """Upper bound in ms of the bucket that holds the given fraction of the calls"""
+        running = 0
+        for bound, count in zip(self.BOUNDS_MS, self.counts):
+            running += count
+            if running >= fraction * self.count:
+                return min(bound, self.max * 1000)
+        return self.max * 1000
+    
+    def as_dict(self):
+        labels = [f"<={bound}ms" for bound in self.BOUNDS_MS] + [f">{self.BOUNDS_MS[-1]}ms"]
+        return {
+            'calls': self.count,
+            'mean_ms': round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(0.5), 3),
+            'p90_ms': round(self.percentile(0.9), 3),
+            'p99_ms': round(self.percentile(0.99), 3),
+            'max_ms': round(self.max * 1000, 3),
+            'buckets': {label: count for label, count in zip(labels, self.counts)}
+        }
+
+class ScanTelemetry:
+    """Counters and timers filled in by scan workers, read with snapshot() from any thread
+    
+    I/O time is the time workers spent listing folders and statting files, summed
+    over all workers. Callback time is spent in the scanner's on_directory/on_files
+    callbacks and UI time is whatever the GUI reports through record_ui().
+    """
+    
+    def __init__(self, slowest=10):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.finished = None
+        self.directories = 0
+        self.directories_cached = 0
+        self.files = 0
+        self.listing = LatencyHistogram()
+        self.stat = LatencyHistogram()
+        self.io_seconds = 0.0
+        self.callback_seconds = 0.0
+        self.ui_seconds = 0.0
+        self.slowest_count = slowest
+        self._slowest = []
+        # AdaptiveLimiter the scan ran under, if any; set by ParallelScanner
+        self.limiter = None
+    
+    def record_directory(self, path, listing_seconds, stat_seconds, files):
+        """Add one listed folder; stat_seconds holds the latency of each stat call made for it"""
+        with self.lock:
+            self.directories += 1
+            self.files += files
+            self.listing.add(listing_seconds)
+            for seconds in stat_seconds:
+                self.stat.add(seconds)
+            
+            total = listing_seconds + sum(stat_seconds)
+            self.io_seconds += total
+            # Min-heap, so the fastest of the slowest folders is the one replaced
+            if len(self._slowest) < self.slowest_count:
+                heapq.heappush(self._slowest, (total, path))
+            elif total > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, (total, path))
+    
+    def record_cached(self, stat_seconds, files):
+        """Add a folder reused from the index; only its own stat call touched the disk"""
+        with self.lock:
+            self.directories += 1
+            self.directories_cached += 1
+            self.files += files
+            for seconds in stat_seconds:
+                self.stat.add(seconds)
+            self.io_seconds += sum(stat_seconds)
+    
+    def record_callback(self, seconds):
+        with self.lock:
+            self.callback_seconds += seconds
+    
+    def record_ui(self, seconds):
+        with self.lock:
+            self.ui_seconds += seconds
+    
+    def finish(self):
+        self.finished = time.perf_counter()
+    
+    def snapshot(self):
+        with self.lock:
+            elapsed = (self.finished or time.perf_counter()) - self.started
+            return {
+                'elapsed_seconds': round(elapsed, 3),
+                'running': self.finished is None,
+                'directories': self.directories,
+                'directories_cached': self.directories_cached,
+                'files': self.files,
+                'directories_per_second': round(self.directories / elapsed, 1) if elapsed > 0 else 0.0,
+                'files_per_second': round(self.files / elapsed, 1) if elapsed > 0 else 0.0,
+                'io_seconds': round(self.io_seconds, 3),
+                'callback_seconds': round(self.callback_seconds, 3),
+                'ui_seconds': round(self.ui_seconds, 3),
+                'listing_latency': self.listing.as_dict(),
+                'stat_latency': self.stat.as_dict(),
+                'slowest_directories': [{'path': path, 'seconds': round(seconds, 6)}
+                                        for seconds, path in sorted(self._slowest, reverse=True)],
+                'concurrency': self.limiter.snapshot() if self.limiter else None
+            }
+
+def format_telemetry(snapshot):
+    """Plain text view of a ScanTelemetry snapshot"""
+    lines = [
+        f"⏱️ Elapsed: {snapshot['elapsed_seconds']:.1f} s{' (running)' if snapshot['running'] else ''}",
+        f"📂 Folders: {snapshot['directories']:,} ({snapshot['directories_per_second']:,.1f}/s, "
+        f"{snapshot['directories_cached']:,} from the index)",
+        f"📄 Files: {snapshot['files']:,} ({snapshot['files_per_second']:,.1f}/s)",
+        f"💾 I/O time (all workers): {snapshot['io_seconds']:.2f} s",
+        f"🔔 Scanner callbacks: {snapshot['callback_seconds']:.2f} s",
+        f"🖥️ UI updates: {snapshot['ui_seconds']:.2f} s"
+    ]
+    
+    concurrency = snapshot.get('concurrency')
+    if concurrency:
+        baseline = concurrency['baseline_ms']
+        lines.append(f"🚦 In flight on {concurrency['server']}: limit {concurrency['limit']} "
+                     f"(peak {concurrency['peak']}, cap {concurrency['cap']}), "
+                     f"{concurrency['increases']} raises, {concurrency['decreases']} backoffs"
+                     + (f", baseline {baseline:.2f} ms/call" if baseline is not None else ""))
+    
+    for title, key in (("LISTING LATENCY", 'listing_latency'), ("STAT LATENCY", 'stat_latency')):
+        latency = snapshot[key]
+        lines.append(f"\n{title} ({latency['calls']:,} calls)\n{'='*30}")
+        if not latency['calls']:
+            lines.append("No calls yet.")
+            continue
+        lines.append(f"mean {latency['mean_ms']:.2f} ms, p50 <= {latency['p50_ms']:.2f} ms, "
+                     f"p90 <= {latency['p90_ms']:.2f} ms, p99 <= {latency['p99_ms']:.2f} ms, "
+                     f"max {latency['max_ms']:.2f} ms")
+        peak = max(latency['buckets'].values())
+        for label, count in latency['buckets'].items():
+            if count:
+                lines.append(f"{label:>10} {'█' * max(1, round(30 * count / peak)):<30} {count:,}")
+    
+    lines.append(f"\nSLOWEST FOLDERS\n{'='*30}")
+    for folder in snapshot['slowest_directories']:
+        lines.append(f"{folder['seconds'] * 1000:>9.1f} ms  {folder['path']}")
+    if not snapshot['slowest_directories']:
+        lines.append("No folders listed yet.")
+    
+    return "\n".join(lines)
+
+# Errors that mean the server is struggling rather than that a folder is off limits
+OVERLOAD_ERRNOS = {errno.ETIMEDOUT, errno.EIO, errno.EAGAIN, errno.EBUSY, errno.ECONNRESET,
+                   errno.ECONNABORTED, errno.EHOSTUNREACH}
+# ERROR_BAD_NETPATH, ERROR_NETNAME_DELETED, ERROR_SEM_TIMEOUT, ERROR_UNEXP_NET_ERR
+OVERLOAD_WINERRORS = {53, 64, 121, 59}
+
+def is_overload_error(error):
+    return (getattr(error, 'winerror', None) in OVERLOAD_WINERRORS or
+            getattr(error, 'errno', None) in OVERLOAD_ERRNOS)
+
+class AdaptiveLimiter:
+    """In-flight limit for calls to one file server, adjusted AIMD style from their latency
+    
+    While calls come back close to the fastest latency seen, the limit grows by one
+    for every full window of `limit` completed calls (additive increase). When the
+    smoothed latency climbs past `slowdown` times that baseline, or a call fails
+    with a timeout-like error, the limit is cut by 30% (multiplicative decrease) -
+    at most once per window, so one slow burst is not punished twice. A gentler cut
+    than TCP's halving keeps the sawtooth from idling a server that is just full. Latencies under
+    `floor` never count as slow, which keeps local disks at full speed. `cap` is
+    the user's hard limit for the server.
+    """
+    
+    def __init__(self, name="", initial=4, cap=64, minimum=1, slowdown=1.5, floor=0.005):
+        self.name = name
+        self.cap = max(1, int(cap))
+        self.minimum = max(1, min(int(minimum), self.cap))
+        self.limit = float(max(self.minimum, min(initial, self.cap)))
+        self.slowdown = slowdown
+        self.floor = floor
+        
+        self.in_flight = 0
+        self.baseline = None
+        self.smoothed = None
+        self.completed = 0
+        self.increases = 0
+        self.decreases = 0
+        self.peak = int(self.limit)
+        self._window = 0
+        # Whether the limit was reached this window; it only grows while it is what holds calls back
+        self._limited = False
+        self._condition = threading.Condition()
+    
+    def acquire(self, should_continue=None):
+        """Wait for a free slot; False if should_continue() turned false meanwhile"""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                if should_continue and not should_continue():
+                    return False
+                self._condition.wait(0.1)
+            self.in_flight += 1
+            return True
+    
+    def release(self, latency=None, error=None):
+        """Free a slot, reporting the call's latency in seconds or the error it raised"""
+        with self._condition:
+            self._limited = self._limited or self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            self.completed += 1
+            self._window += 1
+            
+            if error is not None and is_overload_error(error):
+                self._decrease()
+            elif latency is not None:
+                self._observe(latency)
+            # Wake only as many waiters as there are free slots
+            self._condition.notify(max(1, int(self.limit) - self.in_flight))
+    
+    def _observe(self, latency):
+        # The baseline follows the fastest calls at once and slower ones only slowly,
+        # so it can still adapt when every folder on a share is large
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            self.baseline += (latency - self.baseline) * 0.001
+        self.smoothed = latency if self.smoothed is None else self.smoothed * 0.8 + latency * 0.2
+        
+        if self._window < self.limit:
+            return
+        if self.smoothed > self.floor and self.smoothed > self.slowdown * self.baseline:
+            self._decrease()
+            return
+        if self.limit < self.cap and self._limited:
+            self.limit = min(self.cap, self.limit + 1)
+            self.peak = max(self.peak, int(self.limit))
+            self.increases += 1
+        self._window = 0
+        self._limited = False
+    
+    def _decrease(self):
+        if self._window < self.limit and self.decreases:
+            return
+        self.limit = max(self.minimum, self.limit * 0.7)
+        self.decreases += 1
+        self._window = 0
+        self._limited = False
+    
+    def snapshot(self):
+        with self._condition:
+            return {
+                'server': self.name,
+                'limit': int(self.limit),
+                'cap': self.cap,
+                'peak': self.peak,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'increases': self.increases,
+                'decreases': self.decreases,
+                'baseline_ms': round(self.baseline * 1000, 3) if self.baseline is not None else None,
+                'smoothed_ms': round(self.smoothed * 1000, 3) if self.smoothed is not None else None
+            }
+
+def server_key(path):
+    """Name of the file server a path is served from, for per-server limits
+    
+    UNC paths give their server name, NFS and SMB mounts the server from the mount
+    source, and anything else its mount point (or drive on Windows).
+    """
+    if path.startswith(('\\\\', '//')):
+        return re.split(r'[\\/]+', path.lstrip('\\/'))[0].lower()
+    
+    if len(path) >= 2 and path[1] == ':':
+        return path[:2].upper()
+    
+    mount, fs_type, source = mount_for_path(path)
+    if fs_type in NETWORK_FILESYSTEMS:
+        if source.startswith('//'):
+            return source[2:].split('/')[0].lower()
+        if ':' in source:
+            return source.split(':')[0].lower()
+    return mount or os.path.abspath(path)
+
+class ServerLimits:
+    """One AdaptiveLimiter per file server, with optional hard caps per server
+    
+    caps maps server names (as returned by server_key, or any path on that server)
+    to the most calls allowed in flight there.
+    """
+    
+    def __init__(self, caps=None, default_cap=64, initial=4):
+        self.caps = {}
+        for server, cap in (caps or {}).items():
+            key = server_key(server) if any(sep in server for sep in '\\/:') else server.lower()
+            self.caps[key] = int(cap)
+        self.default_cap = default_cap
+        self.initial = initial
+        self.limiters = {}
+        self.lock = threading.Lock()
+    
+    def for_path(self, path):
+        key = server_key(path)
+        with self.lock:
+            limiter = self.limiters.get(key)
+            if limiter is None:
+                limiter = AdaptiveLimiter(key, self.initial, self.caps.get(key, self.default_cap))
+                self.limiters[key] = limiter
+            return limiter
+
+def parse_server_caps(lines):
+    """{server: cap} from 'server = N' or 'server=N' lines; blank lines and # comments are skipped"""
+    caps = {}
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        server, separator, cap = line.rpartition('=')
+        if not separator or not server.strip():
+            raise ValueError(f"expected 'server = limit', got '{line}'")
+        caps[server.strip()] = max(1, int(cap))
+    return caps
+
+# Unexpected worker errors kept with their folder for the report; the rest are only counted
+MAX_SCAN_FAILURES = 20
+
+class ParallelScanner:
+    """Walks a directory tree with a pool of worker threads sharing one directory queue"""
+    
+    def __init__(self, root_path, extensions, store=None, workers=8,
+                 should_continue=None, on_directory=None, cache=None, on_files=None,
+                 telemetry=None, rules=None, limiter=None, resume=None, on_checkpoint=None,
+                 checkpoint_interval=30.0):
+        self.root_path = root_path
+        self.extensions = extensions
+        # ScanRules checked while walking; plain extensions become an extension-only rule
+        self.rules = rules if rules is not None else ScanRules(extensions)
+        self.workers = max(1, int(workers))
+        self.should_continue = should_continue or (lambda: True)
+        self.on_directory = on_directory
+        
+        # Matches go into the FileStore and/or to on_files(folder, [(name, size, mtime)]),
+        # which is called from the worker threads
+        self.store = store
+        self.on_files = on_files
+        
+        # Folders from a ScanIndex; unchanged ones are reused instead of listed again
+        self.cache = cache
+        self.index_updates = {}
+        self.visited = set()
+        
+        # Checkpoint bookkeeping, also only with a cache: folders queued but not fully read
+        # yet, fully read folders in order, and how many of those a checkpoint has taken
+        self.frontier = {}
+        self.completed = []
+        self._checkpointed = 0
+        # (done folders, [(folder, mtime)]) from a ScanCheckpoint to continue instead of
+        # starting at the root, and on_checkpoint(scanner) called every checkpoint_interval
+        self.resume = resume
+        self.on_checkpoint = on_checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        
+        self.counters = new_scan_counters()
+        # (folder, error) for the first folders a worker failed on with an unexpected error,
+        # such as a bug in a callback; all of them are counted in directories_failed
+        self.failures = []
+        # Optional ScanTelemetry timing every listing, stat call and callback
+        self.telemetry = telemetry
+        
+        # Optional AdaptiveLimiter for the root's server; workers then only bound the
+        # number of folders in flight and the limiter decides how many really are
+        self.limiter = limiter
+        if telemetry is not None and limiter is not None:
+            telemetry.limiter = limiter
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._lock = threading.Lock()
+    
+    def run(self):
+        """Scan the whole tree and return the store"""
+        self._add_roots()
+        with self._lock:
+            idle = self._pending == 0
+        if idle:
+            # Nothing queued (a resumed scan with an empty frontier) - let the workers exit
+            for _ in range(self.workers):
+                self._queue.put(None)
+        
+        threads = []
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._worker)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        
+        if self.on_checkpoint:
+            # Progress is saved from this thread while the workers run
+            while threads[0].is_alive():
+                threads[0].join(self.checkpoint_interval)
+                if threads[0].is_alive():
+                    self.on_checkpoint(self)
+        for thread in threads:
+            thread.join()
+        
+        if self.telemetry:
+            self.telemetry.finish()
+        return self.store
+    
+    def _add_roots(self):
+        if self.resume is None:
+            self._add_directory(self.root_path)
+            return
+        
+        # Show what the stopped scan already found, then only list its frontier
+        done, frontier = self.resume
+        for path in done:
+            cached = self.cache.get(path)
+            self.visited.add(path)
+            if cached is not None:
+                self.counters['directories_resumed'] += 1
+                self._emit_files(path, cached[2])
+        for path, mtime in frontier:
+            self._add_directory(path, mtime)
+    
+    def _add_directory(self, path, mtime=None):
+        with self._lock:
+            if self.cache is not None:
+                # A resumed scan re-lists folders it had only partly read, whose
+                # subfolders can already be done or queued
+                if path in self.frontier or path in self.visited:
+                    return
+                self.frontier[path] = mtime
+            self._pending += 1
+        self._queue.put((path, mtime))
+    
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            
+            try:
+                self._process(item)
+            except Exception as e:
+                # Keep scanning, but never lose a folder without a trace
+                with self._lock:
+                    self.counters['directories_failed'] += 1
+                    if len(self.failures) < MAX_SCAN_FAILURES:
+                        self.failures.append((item[0], f"{type(e).__name__}: {e}"))
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                    finished = self._pending == 0
+                
+                # Last directory done - release every worker
+                if finished:
+                    for _ in range(self.workers):
+                        self._queue.put(None)
+    
+    def _process(self, item):
+        # Once stopped, keep draining the queue so the pending count reaches zero
+        if self.should_continue():
+            self._scan_directory(*item)
+    
+    def _current_limiter(self):
+        return self.limiter
+    
+    def _scan_directory(self, path, dir_mtime=None):
+        telemetry = self.telemetry
+        if self.on_directory:
+            started = time.perf_counter()
+            self.on_directory(path)
+            if telemetry:
+                telemetry.record_callback(time.perf_counter() - started)
+        
+        limiter = self._current_limiter()
+        if limiter is None:
+            self._read_directory(path, dir_mtime)
+            return
+        
+        # One slot per folder, covering its listing and the stat calls for its entries
+        if not limiter.acquire(self.should_continue):
+            return
+        started = time.perf_counter()
+        calls, error = 0, None
+        try:
+            calls, error = self._read_directory(path, dir_mtime)
+        finally:
+            # Per call, so a folder with many entries does not look like a slow server
+            limiter.release((time.perf_counter() - started) / max(1, calls), error)
+    
+    def _read_directory(self, path, dir_mtime=None):
+        """List (or reuse) one folder; return (remote calls made, listing error or None)"""
+        telemetry = self.telemetry
+        counters = new_scan_counters()
+        stat_times = []
+        
+        if self.cache is not None:
+            if dir_mtime is None:
+                started = time.perf_counter()
+                try:
+                    counters['stat_calls'] += 1
+                    dir_mtime = os.stat(path).st_mtime
+                except OSError:
+                    pass
+                stat_times.append(time.perf_counter() - started)
+            
+            cached = self.cache.get(path)
+            if cached is not None and dir_mtime is not None and cached[0] == dir_mtime:
+                self._reuse_cached_directory(path, cached, counters, stat_times)
+                return counters['stat_calls'], None
+        
+        rules = self.rules
+        subdirs = []
+        files = []
+        complete = False
+        error = None
+        listing_started = time.perf_counter()
+        stats_before = len(stat_times)
+        try:
+            with os.scandir(path) as entries:
+                counters['directories_listed'] += 1
+                for entry in entries:
+                    if not self.should_continue():
+                        break
+                    
+                    try:
+                        # Same rules as os.walk: symlinked folders are not followed
+                        if entry.is_dir():
+                            if entry.is_symlink():
+                                continue
+                            # Excluded folders are never queued, which prunes their whole subtree
+                            if not rules.wants_directory(entry.name, entry.path):
+                                counters['directories_pruned'] += 1
+                                continue
+                            sub_mtime = None
+                            if self.cache is not None:
+                                try:
+                                    sub_mtime = self._timed_stat(entry, counters, stat_times).st_mtime
+                                except OSError:
+                                    pass
+                            subdirs.append(entry.name)
+                            self._add_directory(entry.path, sub_mtime)
+                            continue
+                    except OSError:
+                        pass
+                    
+                    # Name rules come straight from the listing, so rejected files cost no stat call
+                    if rules.wants_name(entry.name):
+                        try:
+                            stat = self._timed_stat(entry, counters, stat_times)
+                        except (OSError, IOError):
+                            continue
+                        if rules.wants_stat(stat.st_size, stat.st_mtime):
+                            files.append((entry.name, stat.st_size, stat.st_mtime))
+                else:
+                    complete = True
+        except OSError as e:
+            # Unreadable folders are skipped, like os.walk does
+            error = e
+        
+        if telemetry:
+            # Listing time is the scandir work left after taking out the stat calls
+            listing_seconds = time.perf_counter() - listing_started - sum(stat_times[stats_before:])
+            telemetry.record_directory(path, max(0.0, listing_seconds), stat_times, len(files))
+        
+        # Denied or vanished folders will not list on a resume either; only failures
+        # that may pass (timeouts, a dropped connection) are left for one
+        unreadable = error is not None and not is_overload_error(error)
+        if unreadable:
+            counters['directories_unreadable'] += 1
+        
+        with self._lock:
+            # Folder bookkeeping is only needed to update an index
+            if self.cache is not None:
+                self.visited.add(path)
+                # Only fully listed folders go into the index, and only those (or unreadable
+                # ones) leave the frontier
+                if complete and dir_mtime is not None:
+                    self.index_updates[path] = (dir_mtime, subdirs, files)
+                if (complete and dir_mtime is not None) or unreadable:
+                    self.frontier.pop(path, None)
+                    self.completed.append(path)
+            for key, value in counters.items():
+                self.counters[key] += value
+        
+        self._emit_files(path, files)
+        return counters['directories_listed'] + counters['stat_calls'], error
+    
+    def _reuse_cached_directory(self, path, cached, counters, stat_times):
+        _, subdirs, files = cached
+        counters['directories_cached'] += 1
+        if self.telemetry:
+            self.telemetry.record_cached(stat_times, len(files))
+        
+        for name in subdirs:
+            self._add_directory(os.path.join(path, name))
+        
+        with self._lock:
+            self.visited.add(path)
+            self.frontier.pop(path, None)
+            self.completed.append(path)
+            for key, value in counters.items():
+                self.counters[key] += value
+        
+        self._emit_files(path, files)
+    
+    def _emit_files(self, path, files):
+        if not files:
+            return
+        if self.store is not None:
+            self.store.add_files(path, files)
+        if self.on_files:
+            started = time.perf_counter()
+            self.on_files(path, files)
+            if self.telemetry:
+                self.telemetry.record_callback(time.perf_counter() - started)
+    
+    def _timed_stat(self, entry, counters, stat_times):
+        started = time.perf_counter()
+        try:
+            return entry_stat(entry, counters)
+        finally:
+            stat_times.append(time.perf_counter() - started)
+    
+    def checkpoint_state(self):
+        """([(frontier folder, mtime)], folders done since the last call, their index updates)"""
+        with self._lock:
+            frontier = list(self.frontier.items())
+            done = self.completed[self._checkpointed:]
+            self._checkpointed = len(self.completed)
+            updates = {path: self.index_updates[path] for path in done if path in self.index_updates}
+        return frontier, done, updates
+    
+    def removed_directories(self):
+        """Cached folders that were not seen by a scan that ran to completion"""
+        if not self.cache:
+            return set()
+        return set(self.cache) - self.visited
+    
+    def directory_tree(self):
+        """{folder: (mtime, subfolder names)} for every fully read folder; needs a cache"""
+        tree = {}
+        for path in self.visited:
+            entry = self.index_updates.get(path) or self.cache.get(path)
+            if entry is not None:
+                tree[path] = (entry[0], entry[1])
+        return tree
+
+# One root in the path box: a quoted path (quotes inside it doubled) ending in ';' or the text
+QUOTED_ROOT = re.compile(r'\s*"((?:[^"]|"")*)"\s*(?:;|$)')
+
+def parse_roots(text):
+    """Scan roots typed in one text box
+    
+    ';' is legal in folder names on SMB and POSIX, so text is only split into several
+    roots when every root is in double quotes, as format_roots writes them. Anything
+    else is a single path.
+    """
+    text = text.strip()
+    if not text.startswith('"'):
+        return [text] if text else []
+    roots = []
+    position = 0
+    while text[position:].strip():
+        match = QUOTED_ROOT.match(text, position)
+        if match is None:
+            # Not a list of quoted roots after all - a path may start with a quote
+            return [text]
+        if match.group(1):
+            roots.append(match.group(1).replace('""', '"'))
+        position = match.end()
+    return roots
+
+def format_roots(roots):
+    """Text for the path box that parse_roots turns back into roots"""
+    if len(roots) == 1 and not roots[0].startswith('"'):
+        return roots[0]
+    return "; ".join('"' + root.replace('"', '""') + '"' for root in roots)
+
+def unique_roots(roots):
+    """Scan roots without duplicates or roots inside another root, in the given order
+    
+    Roots are compared after realpath and normcase, so a symlink and its target, or
+    two spellings of one folder, count as one root and no file is scanned twice.
+    A root listed after one of its own subfolders takes that subfolder's place.
+    """
+    kept = []
+    for root in roots:
+        root = root.strip()
+        if not root:
+            continue
+        key = os.path.normcase(os.path.realpath(root))
+        if any(key == other or key.startswith(other.rstrip(os.sep) + os.sep) for _, other in kept):
+            continue
+        kept = [(path, other) for path, other in kept if not other.startswith(key.rstrip(os.sep) + os.sep)]
+        kept.append((root, key))
+    return [root for root, _ in kept]
+
+class MultiRootScanner(ParallelScanner):
+    """Scans several roots with one shared folder queue and worker pool
+    
+    Roots go through unique_roots first, so each file lands in the store once. Every
+    root keeps its own progress counters and can be stopped alone with stop_root();
+    given ServerLimits, each root's folders are listed under its server's limiter.
+    """
+    
+    def __init__(self, roots, extensions, store=None, workers=8, limits=None, **options):
+        self.roots = unique_roots(roots)
+        super().__init__(self.roots[0] if self.roots else "", extensions, store, workers, **options)
+        self.progress_by_root = {root: {'directories': 0, 'files': 0, 'pending': 0, 'stopped': False}
+                                 for root in self.roots}
+        self.limiters = {root: limits.for_path(root) for root in self.roots} if limits is not None else {}
+        if self.telemetry is not None and self.limiters:
+            self.telemetry.limiter = self.limiters[self.roots[0]]
+        # Root of the folder each worker thread is on, for folders it queues and files it finds
+        self._local = threading.local()
+    
+    def run(self):
+        if not self.roots:
+            return self.store
+        return super().run()
+    
+    def _add_roots(self):
+        for root in self.roots:
+            self._add_directory(root, None, root)
+    
+    def _add_directory(self, path, mtime=None, root=None):
+        if root is None:
+            root = self._local.root
+        with self._lock:
+            self._pending += 1
+            self.progress_by_root[root]['pending'] += 1
+        self._queue.put((path, mtime, root))
+    
+    def _process(self, item):
+        path, mtime, root = item
+        progress = self.progress_by_root[root]
+        try:
+            if self.should_continue() and not progress['stopped']:
+                self._local.root = root
+                self._scan_directory(path, mtime)
+                with self._lock:
+                    progress['directories'] += 1
+        finally:
+            with self._lock:
+                progress['pending'] -= 1
+    
+    def _current_limiter(self):
+        return self.limiters.get(self._local.root, self.limiter)
+    
+    def _emit_files(self, path, files):
+        if files:
+            with self._lock:
+                self.progress_by_root[self._local.root]['files'] += len(files)
+        super()._emit_files(path, files)
+    
+    def stop_root(self, root):
+        """Stop queueing and listing folders of one root; the other roots carry on"""
+        with self._lock:
+            self.progress_by_root[root]['stopped'] = True
+    
+    def progress(self):
+        """[{'root', 'directories', 'files', 'state'}] with state scanning, stopped or done"""
+        running = self.should_continue()
+        with self._lock:
+            rows = []
+            for root in self.roots:
+                progress = self.progress_by_root[root]
+                if progress['pending'] == 0 and not progress['stopped']:
+                    state = 'done'
+                elif progress['stopped'] or not running:
+                    state = 'stopped'
+                else:
+                    state = 'scanning'
+                rows.append({'root': root, 'directories': progress['directories'],
+                             'files': progress['files'], 'state': state})
+            return rows
+    
+    def directory_tree(self, root=None):
+        """Like ParallelScanner.directory_tree, optionally only the folders under one root"""
+        tree = super().directory_tree()
+        if root is None:
+            return tree
+        prefix = root.rstrip(os.sep) + os.sep
+        return {path: entry for path, entry in tree.items() if path == root or path.startswith(prefix)}
+    
+    def removed_directories(self):
+        # Folders of a stopped root were not all visited, so none of them count as deleted
+        removed = super().removed_directories()
+        stopped = [root for root in self.roots if self.progress_by_root[root]['stopped']]
+        if not stopped:
+            return removed
+        prefixes = tuple(root.rstrip(os.sep) + os.sep for root in stopped)
+        return {path for path in removed if path not in stopped and not path.startswith(prefixes)}
+
+# inotify event bits (linux/inotify.h)
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+              IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW)
+INOTIFY_EVENT = struct.Struct("iIII")
+
+# Mounts whose changes made by other machines never reach the local inotify
+NETWORK_FILESYSTEMS = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'fuse.sshfs', '9p', 'afs', 'ceph',
+                       'glusterfs', 'fuse.glusterfs', 'lustre', 'davfs', 'fuse.rclone'}
+
+def load_inotify():
+    """libc with the inotify calls on Linux, else None"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+def unescape_mount_field(field):
+    # The kernel writes spaces, tabs and backslashes in mount fields as octal escapes
+    return re.sub(r'\\([0-7]{3})', lambda match: chr(int(match.group(1), 8)), field)
+
+def read_mounts():
+    """[(mount point, filesystem type, mount source)] from /proc/self/mountinfo, else /proc/mounts"""
+    mounts = []
+    try:
+        with open("/proc/self/mountinfo", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                # ID, parent, device, root, mount point, options, optional tags, "-", type, source, options
+                fields = line.split()
+                if '-' not in fields[6:]:
+                    continue
+                separator = fields.index('-', 6)
+                if len(fields) >= separator + 3:
+                    mounts.append((unescape_mount_field(fields[4]), fields[separator + 1],
+                                   unescape_mount_field(fields[separator + 2])))
+        return mounts
+    except OSError:
+        pass
+    
+    try:
+        with open("/proc/mounts", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 3:
+                    mounts.append((unescape_mount_field(fields[1]), fields[2], unescape_mount_field(fields[0])))
+    except OSError:
+        pass
+    return mounts
+
+def mount_for_path(path):
+    """(mount point, filesystem type, mount source) for path; blanks when unknown"""
+    best_mount, fs_type, source = "", "", ""
+    real_path = os.path.realpath(path)
+    for mount, mount_type, mount_source in read_mounts():
+        inside = real_path == mount or real_path.startswith(mount.rstrip("/") + "/")
+        if inside and len(mount) >= len(best_mount):
+            best_mount, fs_type, source = mount, mount_type, mount_source
+    return best_mount, fs_type, source
+
+def filesystem_type(path):
+    """Type of the filesystem path lives on; '' when unknown"""
+    return mount_for_path(path)[1]
+
+def watch_method(path):
+    """'inotify' where change events reach this machine for path, else 'poll'"""
+    if is_network_path(path) or filesystem_type(path) in NETWORK_FILESYSTEMS:
+        return 'poll'
+    return 'inotify' if load_inotify() is not None else 'poll'
+
+# Drive listing and path checks for the GUI; all of them must survive a hung mount
+
+# Drive probes share one deadline; a mapped drive or mount that has not answered by
+# then is listed as not responding
+DRIVE_TIMEOUT = 5.0
+
+class TimedCall:
+    """function(*args) running on a daemon thread, so a call stuck on a hung mount never blocks the caller"""
+    
+    def __init__(self, function, *args, **kwargs):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        threading.Thread(target=self._run, args=(function, args, kwargs), daemon=True).start()
+    
+    def _run(self, function, args, kwargs):
+        try:
+            self.value = function(*args, **kwargs)
+        except Exception as e:
+            self.error = e
+        self.done.set()
+    
+    def result(self, timeout=None):
+        """The return value; raises TimeoutError when the call has not finished in time"""
+        if not self.done.wait(timeout):
+            raise TimeoutError("no answer within the time limit")
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+# Path checks from the UI: how long to wait for an answer, and how long to trust one
+PROBE_TIMEOUT = 3.0
+PROBE_TTL = 10.0
+
+class PathProbe:
+    """Checks whether paths exist without ever waiting long on a hung mount
+    
+    Each check is a TimedCall. One that has not answered within timeout counts as
+    not responding and stays in flight, so asking again waits on the same call
+    instead of piling up threads. Paths that exist or do not respond are remembered
+    for ttl seconds; missing paths are checked afresh, as they can appear any time.
+    """
+    
+    EXISTS = 'exists'
+    MISSING = 'missing'
+    NOT_RESPONDING = 'not responding'
+    
+    def __init__(self, timeout=PROBE_TIMEOUT, ttl=PROBE_TTL):
+        self.timeout = timeout
+        self.ttl = ttl
+        self.states = {}
+        self.calls = {}
+        self.lock = threading.Lock()
+    
+    def cached_states(self, paths):
+        """{path: state} for the paths with a recent answer"""
+        now = time.monotonic()
+        with self.lock:
+            return {path: self.states[path][0] for path in paths
+                    if path in self.states and now - self.states[path][1] < self.ttl}
+    
+    def check_all(self, paths):
+        """{path: state} for every path, within timeout seconds in all; may block, so not for the UI thread"""
+        states = self.cached_states(paths)
+        calls = {}
+        with self.lock:
+            for path in paths:
+                if path not in states and path not in calls:
+                    if path not in self.calls:
+                        self.calls[path] = TimedCall(os.path.exists, path)
+                    calls[path] = self.calls[path]
+        
+        deadline = time.monotonic() + self.timeout
+        for path, call in calls.items():
+            try:
+                states[path] = self.EXISTS if call.result(max(0.0, deadline - time.monotonic())) else self.MISSING
+            except TimeoutError:
+                states[path] = self.NOT_RESPONDING
+        
+        with self.lock:
+            now = time.monotonic()
+            for path, call in calls.items():
+                if call.done.is_set() and self.calls.get(path) is call:
+                    del self.calls[path]
+                if states[path] == self.MISSING:
+                    self.states.pop(path, None)
+                else:
+                    self.states[path] = (states[path], now)
+        return states
+    
+    def check(self, path):
+        return self.check_all([path])[path]
+
+def describe_drive(path, kind):
+    """Quick Select label for a drive, or None when it does not exist"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return f"{path} ({kind} - {format_file_size(shutil.disk_usage(path).total)})"
+    except OSError:
+        return f"{path} ({kind})"
+
+def list_drives(timeout=DRIVE_TIMEOUT):
+    """Quick Select labels for this machine's drives, mapped shares and network mounts
+    
+    Every drive is probed on its own thread against a shared deadline, so one
+    disconnected share costs at most timeout seconds and never holds up the rest.
+    On Linux the CIFS, NFS and SSHFS mounts come from /proc/self/mountinfo.
+    """
+    deadline = time.monotonic() + timeout
+    
+    def wait(call):
+        return call.result(max(0.0, deadline - time.monotonic()))
+    
+    drives = []
+    if platform.system() == "Windows":
+        letters = [f"{letter}:\\" for letter in string.ascii_uppercase]
+        calls = [(drive, TimedCall(lambda drive: describe_drive(drive, get_drive_type(drive)), drive))
+                 for drive in letters]
+        net_use = TimedCall(subprocess.run, ['net', 'use'], capture_output=True, text=True, timeout=timeout)
+        for drive, call in calls:
+            try:
+                label = wait(call)
+            except TimeoutError:
+                label = f"{drive} (Network - not responding)"
+            if label:
+                drives.append(label)
+        
+        # Mapped network drives with the share they point to
+        try:
+            result = wait(net_use)
+            if result.returncode == 0:
+                for line in result.stdout.split('\n'):
+                    parts = line.strip().split()
+                    if ':' in line and len(parts) >= 2 and parts[1].startswith('\\\\'):
+                        drives.append(f"{parts[0]} → {parts[1]} (Network)")
+        except (TimeoutError, OSError, subprocess.SubprocessError):
+            pass
+        drives.append("\\\\localhost (Local Network)")
+    else:
+        drives.extend(["/ (Root)", "/home (Home)", "/mnt (Mount Points)", "/media (Media)"])
+        
+        # The same mount point can be listed more than once; the last mount is the visible one
+        mounts = {mount: (fs_type, source) for mount, fs_type, source in read_mounts()
+                  if fs_type in NETWORK_FILESYSTEMS}
+        calls = [(mount, fs_type, source, TimedCall(lambda path: shutil.disk_usage(path).total, mount))
+                 for mount, (fs_type, source) in mounts.items()]
+        for mount, fs_type, source, call in calls:
+            try:
+                size = format_file_size(wait(call))
+            except TimeoutError:
+                size = "not responding"
+            except OSError:
+                size = "unavailable"
+            drives.append(f"{mount} → {source} (Network {fs_type} - {size})")
+    return drives
+
+class TreeWatcher:
+    """Keeps a FileStore current after a scan by listing only the folders that change
+    
+    Uses inotify for local trees on Linux. Elsewhere, on network mounts (where other
+    machines' changes raise no events) or once the inotify watch limit runs out, it
+    polls folder mtimes instead. A folder's mtime moves when entries are added,
+    removed or renamed but not when a file is rewritten in place, so polling misses
+    in-place edits that inotify sees. Either way a changed folder is listed again
+    with the scan's rules and its rows replaced through FileStore.replace_directory.
+    
+    directories is {folder: (mtime, subfolder names)} from ParallelScanner.directory_tree.
+    on_change(added, removed) gets lists of row ids and is called from the watcher thread.
+    """
+    
+    def __init__(self, root_path, store, directories, rules, on_change=None, method=None,
+                 poll_interval=5.0, settle=0.3):
+        self.root_path = root_path
+        self.store = store
+        self.directories = dict(directories)
+        self.rules = rules
+        self.on_change = on_change
+        self.method = method or watch_method(root_path)
+        self.poll_interval = poll_interval
+        # Events keep arriving during a copy or unzip - wait this long for them to stop
+        self.settle = settle
+        
+        self._stop = threading.Event()
+        self._thread = None
+        self._libc = None
+        self._fd = -1
+        self._watches = {}
+        self._watch_paths = {}
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def _run(self):
+        try:
+            if self.method == 'inotify' and self._start_inotify():
+                # Catch what changed between the scan listing a folder and its watch being added
+                self._apply(self._changed_directories())
+                self._inotify_loop()
+            if not self._stop.is_set():
+                # No inotify here, or it ran out of watches - poll the whole tree instead
+                self.method = 'poll'
+                self._close_inotify()
+                self._poll_loop()
+        finally:
+            self._close_inotify()
+    
+    def _close_inotify(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._watches = {}
+        self._watch_paths = {}
+    
+    def _start_inotify(self):
+        self._libc = load_inotify()
+        if self._libc is None:
+            return False
+        
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            return False
+        
+        for path in list(self.directories):
+            if self._stop.is_set() or not self._watch(path):
+                # Out of watches (fs.inotify.max_user_watches)
+                return False
+        return True
+    
+    def _watch(self, path):
+        """Add an inotify watch; False only when the watch limit is reached"""
+        if self._fd < 0:
+            return True
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            # Folders that vanished or cannot be read are simply not watched
+            return ctypes.get_errno() != errno.ENOSPC
+        self._watches[wd] = path
+        self._watch_paths[path] = wd
+        return True
+    
+    def _unwatch(self, path):
+        wd = self._watch_paths.pop(path, None)
+        if wd is not None:
+            self._watches.pop(wd, None)
+            if self._fd >= 0:
+                self._libc.inotify_rm_watch(self._fd, wd)
+    
+    def _inotify_loop(self):
+        # Runs until stopped, or until a new folder could not be watched and polling takes over
+        while not self._stop.is_set() and self.method == 'inotify':
+            if not select.select([self._fd], [], [], 0.5)[0]:
+                continue
+            
+            dirty = set()
+            overflow = self._read_events(dirty)
+            
+            # Collect the rest of a burst so each folder is listed once for it
+            deadline = time.monotonic() + self.settle
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                if select.select([self._fd], [], [], 0.05)[0]:
+                    overflow = self._read_events(dirty) or overflow
+            
+            if overflow:
+                # The kernel dropped events - fall back to comparing every folder's mtime
+                dirty.update(self._changed_directories())
+            self._apply(dirty)
+    
+    def _read_events(self, dirty):
+        """Add the folders named by pending events to dirty; True if the queue overflowed"""
+        overflow = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return overflow
+            except OSError:
+                return overflow
+            
+            offset = 0
+            while offset + INOTIFY_EVENT.size <= len(data):
+                wd, mask, _, name_length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size + name_length
+                
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif mask & IN_IGNORED:
+                    # The kernel dropped the watch (folder deleted or unmounted)
+                    path = self._watches.pop(wd, None)
+                    if path is not None:
+                        self._watch_paths.pop(path, None)
+                else:
+                    path = self._watches.get(wd)
+                    if path is not None:
+                        dirty.add(path)
+    
+    def _poll_loop(self):
+        interval = self.poll_interval
+        while not self._stop.wait(interval):
+            started = time.monotonic()
+            self._apply(self._changed_directories())
+            # Big or slow trees: never spend more than a quarter of the time checking
+            interval = max(self.poll_interval, 4 * (time.monotonic() - started))
+    
+    def _changed_directories(self):
+        changed = set()
+        for path, (mtime, _) in list(self.directories.items()):
+            if self._stop.is_set():
+                break
+            try:
+                current = os.stat(path).st_mtime
+            except OSError:
+                current = None
+            if current != mtime:
+                changed.add(path)
+        return changed
+    
+    def _apply(self, dirty):
+        added = []
+        removed = []
+        # Parents first, so a deleted subtree is dropped once instead of per folder
+        pending = deque((path, False) for path in sorted(dirty, key=len))
+        while pending and not self._stop.is_set():
+            path, new = pending.popleft()
+            if new or path in self.directories:
+                pending.extend((subdir, True) for subdir in self._refresh(path, added, removed))
+        
+        if (added or removed) and self.on_change:
+            self.on_change(added, removed)
+    
+    def _refresh(self, path, added, removed):
+        """List one folder again and update the store; return the new subfolders"""
+        if path not in self.directories and not self._watch(path):
+            self.method = 'poll'
+        
+        rules = self.rules
+        files = []
+        subdirs = []
+        try:
+            # Read the mtime first, so a change made during the listing shows up next time
+            dir_mtime = os.stat(path).st_mtime
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            if not entry.is_symlink() and rules.wants_directory(entry.name, entry.path):
+                                subdirs.append(entry.name)
+                            continue
+                        if rules.wants_name(entry.name):
+                            stat = entry.stat()
+                            if rules.wants_stat(stat.st_size, stat.st_mtime):
+                                files.append((entry.name, stat.st_size, stat.st_mtime))
+                    except OSError:
+                        continue
+        except OSError:
+            # Folder gone or no longer readable - everything under it goes
+            self._drop(path, removed)
+            return []
+        
+        old_subdirs = set(self.directories.get(path, (None, ()))[1])
+        self.directories[path] = (dir_mtime, subdirs)
+        new_rows, gone_rows = self.store.replace_directory(path, files)
+        added.extend(new_rows)
+        removed.extend(gone_rows)
+        
+        for name in old_subdirs - set(subdirs):
+            self._drop(os.path.join(path, name), removed)
+        return [os.path.join(path, name) for name in subdirs if name not in old_subdirs]
+    
+    def _drop(self, path, removed):
+        prefix = path if path.endswith(os.sep) else path + os.sep
+        for directory in [d for d in self.directories if d == path or d.startswith(prefix)]:
+            removed.extend(self.store.replace_directory(directory, [])[1])
+            self._unwatch(directory)
+            del self.directories[directory]
+
+class TrigramIndex:
+    """Substring search over file names using trigram posting lists kept per category
+    
+    Row ids are FileStore rows and categories are the store's category codes. The
+    index follows the store as it grows and starts over when a new store replaces it.
+    Building can run on a background thread; searches and updates share a lock.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset(None)
+    
+    def reset(self, rows):
+        self.rows = rows
+        self.names = []
+        self.by_category = {}
+        self.postings = {}
+        self._last_query = None
+    
+    def covers(self, rows):
+        return rows is self.rows and len(self.names) == len(rows)
+    
+    def sync(self, rows, chunk_size=5000):
+        """Index any rows added to the list since the last call"""
+        with self.lock:
+            if rows is not self.rows:
+                self.reset(rows)
+        
+        while True:
+            # Short lock holds so searches are never kept waiting for long
+            with self.lock:
+                if rows is not self.rows:
+                    # Another list took over the index
+                    return
+                start = len(self.names)
+                end = min(len(rows), start + chunk_size)
+                if start >= end:
+                    return
+                for row_id in range(start, end):
+                    self.add(row_id, rows.names[row_id], rows.category_col[row_id])
+    
+    def add(self, row_id, name, category):
+        lower_name = name.lower()
+        # Share the store's string when the name is already lowercase
+        name = name if lower_name == name else lower_name
+        self.names.append(name)
+        
+        category_ids = self.by_category.get(category)
+        if category_ids is None:
+            category_ids = self.by_category[category] = array('I')
+            self.postings[category] = {}
+        category_ids.append(row_id)
+        
+        postings = self.postings[category]
+        for trigram in {name[i:i + 3] for i in range(len(name) - 2)}:
+            ids = postings.get(trigram)
+            if ids is None:
+                postings[trigram] = array('I', (row_id,))
+            else:
+                ids.append(row_id)
+    
+    def search(self, term, categories):
+        """Return the sorted row ids whose name contains term, limited to the given categories"""
+        with self.lock:
+            return self._search(term, categories)
+    
+    def _search(self, term, categories):
+        term = term.lower()
+        categories = frozenset(categories)
+        names = self.names
+        
+        # Typing more characters only narrows the previous hits
+        last = self._last_query
+        if (last and last[0] in term and last[1] == categories and last[2] == len(names)):
+            ids = [row_id for row_id in last[3] if term in names[row_id]]
+        else:
+            ids = []
+            trigrams = set(term[i:i + 3] for i in range(len(term) - 2))
+            for category in categories:
+                postings = self.postings.get(category)
+                if postings is None:
+                    continue
+                
+                if not trigrams:
+                    candidates = self.by_category[category]
+                else:
+                    lists = [postings.get(trigram) for trigram in trigrams]
+                    if any(ids_list is None for ids_list in lists):
+                        continue
+                    
+                    # Intersect from the shortest posting list
+                    lists.sort(key=len)
+                    candidates = set(lists[0])
+                    for ids_list in lists[1:]:
+                        candidates.intersection_update(ids_list)
+                        if not candidates:
+                            break
+                
+                # Trigrams can match out of order, so confirm the substring
+                ids.extend(row_id for row_id in candidates if term in names[row_id])
+            ids.sort()
+        
+        self._last_query = (term, categories, len(names), ids)
+        return ids
+
+class SortIndex:
+    """Orders of a FileStore's rows per column, reused to sort any subset of the rows
+    
+    A column's order - every row id, sorted by that column - is only computed the
+    first time the column is sorted and kept until a new store replaces it. Rows
+    added later are sorted on their own and merged in. Sorting a filtered subset
+    then walks the cached order (or, for a few rows, compares their positions in
+    it) instead of comparing names, sizes or dates again.
+    """
+    
+    COLUMNS = ("Name", "Type", "Size", "Modified", "Path")
+    
+    def __init__(self):
+        self.reset(None)
+    
+    def reset(self, store):
+        self.store = store
+        self.orders = {}
+        self.ranks = {}
+    
+    def sort_key(self, column):
+        store = self.store
+        names = store.names
+        if column == "Name":
+            return lambda row_id: names[row_id].lower()
+        if column == "Type":
+            category_names = store.category_names
+            category_col = store.category_col
+            return lambda row_id: (category_names[category_col[row_id]], names[row_id].lower())
+        if column == "Size":
+            return store.sizes.__getitem__
+        if column == "Modified":
+            return store.mtimes.__getitem__
+        if column == "Path":
+            directories = store.directories
+            dir_col = store.dir_col
+            return lambda row_id: (directories[dir_col[row_id]].lower(), names[row_id].lower())
+        raise ValueError(f"unknown sort column: {column}")
+    
+    def order(self, store, column):
+        """All row ids of store sorted by column, ascending"""
+        if store is not self.store:
+            self.reset(store)
+        
+        order = self.orders.get(column)
+        count = len(store)
+        if order is not None and len(order) == count:
+            return order
+        
+        key = self.sort_key(column)
+        if order and count - len(order) <= len(order) // 16:
+            # Sort the new rows and binary-search where each goes, then copy the old order
+            # across in slices; only the new rows' keys are compared one by one
+            merged = array('I')
+            start = 0
+            for row_id in sorted(range(len(order), count), key=key):
+                row_key = key(row_id)
+                low, high = start, len(order)
+                while low < high:
+                    middle = (low + high) // 2
+                    if key(order[middle]) <= row_key:
+                        low = middle + 1
+                    else:
+                        high = middle
+                merged.extend(order[start:low])
+                merged.append(row_id)
+                start = low
+            merged.extend(order[start:])
+            order = merged
+        elif order:
+            # Many new rows (a scan still streaming in) - one linear merge costs less
+            added = sorted(range(len(order), count), key=key)
+            order = array('I', heapq.merge(order, added, key=key))
+        elif column in ("Type", "Path"):
+            # Stable-sort the name order by category or folder - much cheaper than comparing tuples
+            order = self.order(store, "Name")
+            if column == "Type":
+                category_names = store.category_names
+                category_col = store.category_col
+                order = array('I', sorted(order, key=lambda row_id: category_names[category_col[row_id]]))
+            else:
+                folders = [directory.lower() for directory in store.directories]
+                dir_col = store.dir_col
+                order = array('I', sorted(order, key=lambda row_id: folders[dir_col[row_id]]))
+        else:
+            order = array('I', sorted(range(count), key=key))
+        self.orders[column] = order
+        self.ranks.pop(column, None)
+        return order
+    
+    def rank(self, store, column):
+        """Position of every row in the column's order"""
+        order = self.order(store, column)
+        rank = self.ranks.get(column)
+        if rank is None:
+            rank = array('I', bytes(4 * len(order)))
+            for position, row_id in enumerate(order):
+                rank[row_id] = position
+            self.ranks[column] = rank
+        return rank
+    
+    def sort(self, store, row_ids, column, descending=False):
+        """row_ids (rows of store) as a new array sorted by column"""
+        order = self.order(store, column)
+        if len(row_ids) * 16 < len(order):
+            # A few rows, e.g. search hits - sort them by their cached positions
+            rank = self.rank(store, column)
+            return array('I', sorted(row_ids, key=rank.__getitem__, reverse=descending))
+        
+        # Most rows - keep the wanted ones while walking the cached order
+        wanted = bytearray(len(order))
+        for row_id in row_ids:
+            wanted[row_id] = 1
+        rows = array('I', (row_id for row_id in order if wanted[row_id]))
+        if descending:
+            rows.reverse()
+        return rows
+
+def file_matches(store, row_id, selected_categories, search_term):
+    if store.category_col[row_id] not in selected_categories:
+        return False
+    
+    if search_term and search_term not in store.names[row_id].lower():
+        return False
+    
+    return True
+
+def filter_rows(store, rows, selected_categories, search_term="", search_index=None):
+    """Return the row ids in the range rows that match the categories and search term
+    
+    The search index is only used when it covers the whole store; otherwise the
+    names are scanned directly.
+    """
+    search_term = search_term.lower()
+    
+    if search_term and search_index is not None and search_index.covers(store):
+        row_ids = search_index.search(search_term, selected_categories)
+        # The index covers the whole store, so keep only the hits inside the range
+        row_ids = row_ids[bisect.bisect_left(row_ids, rows.start):bisect.bisect_left(row_ids, rows.stop)]
+        row_ids = array('I', row_ids)
+    elif search_term:
+        row_ids = array('I', (row_id for row_id in rows
+                              if file_matches(store, row_id, selected_categories, search_term)))
+    elif len(selected_categories) >= store.other_code:
+        # Scans only collect files with a known extension, so every named category means every row
+        row_ids = array('I', rows)
+    else:
+        category_col = store.category_col
+        row_ids = array('I', (row_id for row_id in rows if category_col[row_id] in selected_categories))
+    
+    # Rows a watcher removed keep their ids but are never shown
+    removed = store.removed
+    if removed:
+        row_ids = array('I', (row_id for row_id in row_ids if row_id not in removed))
+    return row_ids
+
+HASH_EDGE_SIZE = 4 * 1024
+HASH_READ_SIZE = 1024 * 1024
+
+def partial_hash(path, size):
+    """Hash of the first and last few KB; for small files this is the whole content"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        if size <= 2 * HASH_EDGE_SIZE:
+            digest.update(f.read())
+        else:
+            digest.update(f.read(HASH_EDGE_SIZE))
+            f.seek(-HASH_EDGE_SIZE, os.SEEK_END)
+            digest.update(f.read(HASH_EDGE_SIZE))
+    return digest.hexdigest()
+
+def full_hash(path, should_continue=None):
+    """Hash of the whole file read in large sequential blocks, or None once stopped"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb', buffering=0) as f:
+        buffer = bytearray(HASH_READ_SIZE)
+        view = memoryview(buffer)
+        while True:
+            if should_continue and not should_continue():
+                return None
+            count = f.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+    return digest.hexdigest()
+
+def find_duplicates(store, row_ids, workers=4, cache=None, should_continue=None, on_progress=None,
+                    min_size=1):
+    """Group store rows whose files have identical content
+    
+    Files are bucketed by exact size first, then by a hash of their first and last
+    few KB, and only files still sharing a bucket are hashed in full. Hashing runs
+    on a pool of workers threads. With a HashCache, files whose size and mtime are
+    unchanged reuse their stored hashes. on_progress(stage, done, total) is called
+    from the worker threads.
+    
+    Returns [(size, hash, [row ids])] with the most wasted space first, or None
+    when should_continue stopped the search.
+    """
+    should_continue = should_continue or (lambda: True)
+    
+    by_size = {}
+    for row_id in row_ids:
+        size = store.sizes[row_id]
+        if size >= min_size:
+            by_size.setdefault(size, []).append(row_id)
+    candidates = [row_id for rows in by_size.values() if len(rows) > 1 for row_id in rows]
+    
+    paths = {row_id: store.path(row_id) for row_id in candidates}
+    cached = cache.load(set(paths.values())) if cache else {}
+    hashes = {}
+    for row_id, path in paths.items():
+        entry = cached.get(path)
+        if entry and entry[0] == store.sizes[row_id] and entry[1] == store.mtimes[row_id]:
+            hashes[row_id] = [entry[2], entry[3]]
+    
+    def run_stage(stage, rows, work):
+        todo = [row_id for row_id in rows if hashes.get(row_id, (None, None))[stage] is None]
+        done = [0]
+        lock = threading.Lock()
+        
+        def hash_row(row_id):
+            if not should_continue():
+                return
+            try:
+                value = work(row_id)
+            except OSError:
+                # Unreadable files simply drop out of the comparison
+                value = None
+            with lock:
+                if value is not None:
+                    hashes.setdefault(row_id, [None, None])[stage] = value
+                done[0] += 1
+                if on_progress:
+                    on_progress(stage, done[0], len(todo))
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(hash_row, todo))
+    
+    def group(rows, key):
+        groups = {}
+        for row_id in rows:
+            value = key(row_id)
+            if value is not None:
+                groups.setdefault(value, []).append(row_id)
+        return [rows for rows in groups.values() if len(rows) > 1]
+    
+    # Stage 0: first and last few KB of every file that shares its size with another
+    run_stage(0, candidates, lambda row_id: partial_hash(paths[row_id], store.sizes[row_id]))
+    if not should_continue():
+        return None
+    partial_groups = group(candidates, lambda row_id: (store.sizes[row_id],
+                                                        hashes.get(row_id, (None, None))[0]))
+    partial_groups = [rows for rows in partial_groups if hashes[rows[0]][0] is not None]
+    
+    # Stage 1: whole content, only for files that still look alike; small files were read whole already
+    for row_id in (row_id for rows in partial_groups for row_id in rows):
+        if store.sizes[row_id] <= 2 * HASH_EDGE_SIZE:
+            hashes[row_id][1] = hashes[row_id][0]
+    full_candidates = [row_id for rows in partial_groups for row_id in rows]
+    run_stage(1, full_candidates, lambda row_id: full_hash(paths[row_id], should_continue))
+    if not should_continue():
+        return None
+    
+    if cache:
+        try:
+            cache.save({paths[row_id]: (store.sizes[row_id], store.mtimes[row_id], values[0], values[1])
+                        for row_id, values in hashes.items() if values[0] is not None})
+        except (sqlite3.Error, OSError):
+            pass
+    
+    def full_key(row_id):
+        # Files whose full hash could not be read stay out of every group
+        value = hashes[row_id][1]
+        return None if value is None else (store.sizes[row_id], value)
+    
+    duplicates = [(store.sizes[rows[0]], hashes[rows[0]][1], sorted(rows))
+                  for rows in group(full_candidates, full_key)]
+    duplicates.sort(key=lambda group: group[0] * (len(group[2]) - 1), reverse=True)
+    return duplicates
+
+# Extensions search_contents reads as text; DXF drawings are plain text too
+TEXT_EXTENSIONS = {'.txt', '.csv', '.tsv', '.log', '.md', '.rtf', '.json', '.xml', '.svg', '.ini',
+                   '.cfg', '.yaml', '.yml', '.sql', '.dxf', '.html', '.htm', '.css', '.js', '.py',
+                   '.c', '.h', '.cpp', '.java'}
+CONTENT_MAX_SIZE = 64 * 1024 * 1024
+CONTENT_READ_SIZE = 4 * 1024 * 1024
+# Bytes kept from the previous chunk, so a match across a chunk boundary is still found
+CONTENT_OVERLAP = 4 * 1024
+
+def compile_content_query(query, regex=False, ignore_case=True):
+    """Bytes pattern for search_contents from literal text or a regular expression
+    
+    Files are searched as raw bytes, so the query matches ASCII and UTF-8 text;
+    ignore_case only folds ASCII letters.
+    """
+    source = query.encode('utf-8')
+    if not regex:
+        source = re.escape(source)
+    return re.compile(source, re.IGNORECASE if ignore_case else 0)
+
+def file_contains(path, pattern, use_mmap=True, should_continue=None):
+    """Whether pattern matches the file's bytes; reading stops at the first match
+    
+    With use_mmap the file is mapped and searched in one pass. Mapped pages of a
+    network file fault in a few KB at a time, so those are better read in large
+    chunks, which is also the fallback for files that cannot be mapped.
+    """
+    with open(path, 'rb') as f:
+        if use_mmap:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return pattern.search(mapped) is not None
+            except (ValueError, OSError):
+                # Empty files cannot be mapped, and some filesystems refuse it
+                f.seek(0)
+        
+        tail = b""
+        while should_continue is None or should_continue():
+            chunk = f.read(CONTENT_READ_SIZE)
+            if not chunk:
+                return False
+            data = tail + chunk
+            if pattern.search(data):
+                return True
+            tail = data[-CONTENT_OVERLAP:]
+    return False
+
+def content_search_candidates(store, row_ids, max_size=CONTENT_MAX_SIZE, extensions=TEXT_EXTENSIONS):
+    """The rows search_contents should read: text-like files of at most max_size bytes"""
+    names = store.names
+    sizes = store.sizes
+    return array('I', (row_id for row_id in row_ids
+                       if 0 < sizes[row_id] <= max_size
+                       and os.path.splitext(names[row_id])[1].lower() in extensions))
+
+def search_contents(store, row_ids, pattern, workers=4, should_continue=None, on_match=None,
+                    on_progress=None):
+    """Rows whose file content matches pattern (from compile_content_query)
+    
+    Files are read on a pool of worker threads, each stopping at its first match;
+    local files are memory-mapped and network files read in large chunks. on_match(row_id)
+    and on_progress(done, total) are called from the worker threads, so matches can be
+    shown while the search runs. Unreadable files count as not matching.
+    
+    Returns the matching row ids in row order, or None when should_continue stopped it.
+    """
+    should_continue = should_continue or (lambda: True)
+    matches = []
+    done = [0]
+    lock = threading.Lock()
+    network_dirs = {}
+    
+    def search_row(row_id):
+        if not should_continue():
+            return
+        
+        dir_id = store.dir_col[row_id]
+        network = network_dirs.get(dir_id)
+        if network is None:
+            directory = store.directories[dir_id]
+            network = is_network_path(directory) or filesystem_type(directory) in NETWORK_FILESYSTEMS
+            network_dirs[dir_id] = network
+        
+        try:
+            found = file_contains(store.path(row_id), pattern, not network, should_continue)
+        except OSError:
+            found = False
+        
+        with lock:
+            if found:
+                matches.append(row_id)
+            done[0] += 1
+            if on_progress:
+                on_progress(done[0], len(row_ids))
+        if found and on_match:
+            on_match(row_id)
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(search_row, row_ids))
+    if not should_continue():
+        return None
+    return sorted(matches)
+
+# Previews for the Images and CAD categories. Thumbnails are stored as PNG bytes, which
+# Tk can show without Pillow; only making new ones needs it
+THUMBNAIL_SIZE = 192
+THUMBNAIL_MAX_SIZE = 64 * 1024 * 1024
+THUMBNAIL_CACHE_BYTES = 64 * 1024 * 1024
+# Last-shown times ThumbnailCache keeps in memory before writing them
+THUMBNAIL_TOUCH_BATCH = 64
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif', '.webp'}
+# Drawings carry a preview picture saved by the CAD program; DXF keeps it near the end
+THUMBNAIL_EXTENSIONS = IMAGE_EXTENSIONS | {'.dwg', '.dxf'}
+DXF_TAIL_SIZE = 2 * 1024 * 1024
+
+def dib_to_bmp(dib):
+    """A BMP file from a device-independent bitmap, the form CAD files store previews in"""
+    header_size, = struct.unpack_from('<I', dib, 0)
+    bit_count, = struct.unpack_from('<H', dib, 14)
+    colors = struct.unpack_from('<I', dib, 32)[0] if header_size >= 40 else 0
+    if bit_count <= 8 and not colors:
+        colors = 1 << bit_count
+    offset = 14 + header_size + 4 * colors
+    return b'BM' + struct.pack('<IHHI', 14 + len(dib), 0, 0, offset) + dib
+
+def dwg_preview(f):
+    """BMP or PNG bytes of the preview in a DWG file (R13 and later), or None"""
+    header = f.read(0x11)
+    if len(header) < 0x11 or not header.startswith(b'AC10') or header[:6] < b'AC1012':
+        return None
+    address, = struct.unpack_from('<I', header, 0x0D)
+    
+    # A 16 byte sentinel, the section size, then (type, start, size) for each picture
+    f.seek(address + 16)
+    section = f.read(5)
+    if len(section) < 5:
+        return None
+    entries = f.read(9 * section[4])
+    pictures = {}
+    for index in range(len(entries) // 9):
+        code, start, size = struct.unpack_from('<BII', entries, index * 9)
+        pictures[code] = (start, size)
+    
+    # 6 is a PNG (AutoCAD 2013 and later), 2 a bitmap without its file header
+    for code in (6, 2):
+        if code in pictures:
+            start, size = pictures[code]
+            f.seek(start)
+            data = f.read(size)
+            if len(data) == size:
+                return data if code == 6 else dib_to_bmp(data)
+    return None
+
+def dxf_preview(f):
+    """BMP bytes of the THUMBNAILIMAGE section of a DXF file, or None"""
+    f.seek(0, os.SEEK_END)
+    f.seek(max(0, f.tell() - DXF_TAIL_SIZE))
+    tail = f.read()
+    index = tail.rfind(b'THUMBNAILIMAGE')
+    if index < 0:
+        return None
+    
+    # Group code and value lines; the bitmap is hex split over 310 groups
+    lines = tail[index:].splitlines()
+    chunks = []
+    for code, value in zip(lines[1::2], lines[2::2]):
+        code = code.strip()
+        if code == b'0':
+            break
+        if code == b'310':
+            chunks.append(value.strip())
+    if not chunks:
+        return None
+    try:
+        return dib_to_bmp(bytes.fromhex(b''.join(chunks).decode('ascii')))
+    except (ValueError, struct.error):
+        return None
+
+def make_thumbnail(path, size=THUMBNAIL_SIZE):
+    """PNG bytes of a thumbnail fitting in size x size, or b'' when the file has no picture to show
+    
+    Images are read with one large read and decoded from memory, so a file on a
+    share costs a single sequential transfer. Raises OSError when the file cannot
+    be read and RuntimeError when Pillow is not installed.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is not installed")
+    
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, 'rb') as f:
+        try:
+            if extension == '.dwg':
+                data = dwg_preview(f)
+            elif extension == '.dxf':
+                data = dxf_preview(f)
+            else:
+                data = f.read(THUMBNAIL_MAX_SIZE + 1)
+                if len(data) > THUMBNAIL_MAX_SIZE:
+                    data = None
+        except struct.error:
+            data = None
+    if not data:
+        return b''
+    
+    try:
+        image = Image.open(io.BytesIO(data))
+        # JPEGs can decode straight at a fraction of their size
+        image.draft('RGB', (size, size))
+        image.thumbnail((size, size))
+        if image.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+            image = image.convert('RGBA')
+        output = io.BytesIO()
+        image.save(output, 'PNG')
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError):
+        return b''
+    return output.getvalue()
+
+def can_make_thumbnails():
+    return Image is not None
+
+def thumbnail_requests(store, row_ids):
+    """(path, size, mtime) of the rows a thumbnail can be made for"""
+    requests = []
+    for row_id in row_ids:
+        name = store.names[row_id]
+        if (store.sizes[row_id] <= THUMBNAIL_MAX_SIZE
+                and os.path.splitext(name)[1].lower() in THUMBNAIL_EXTENSIONS):
+            requests.append((store.path(row_id), store.sizes[row_id], store.mtimes[row_id]))
+    return requests
+
+class ThumbnailCache:
+    """SQLite file of thumbnails keyed by path, valid while size and mtime are unchanged
+    
+    The least recently shown thumbnails are dropped once the images pass max_bytes.
+    An empty image records that a file has no picture, so it is not read again.
+    The keys are also kept in memory, so contains() never touches the disk and can
+    be asked from the UI thread; everything else belongs on worker threads.
+    """
+    
+    def __init__(self, db_path="file_explorer_thumbnails.db", max_bytes=THUMBNAIL_CACHE_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.conn = None
+        self.total_bytes = 0
+        # path -> (size, mtime) of every stored thumbnail, read when the file is first opened
+        self.keys = {}
+        # path -> when it was last shown, written in batches instead of once per look-up
+        self.touched = {}
+        self.lock = threading.Lock()
+    
+    def connect(self):
+        if self.conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            # Losing the last few thumbnails in a crash is fine; waiting on every commit is not
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS thumbnails "
+                         "(path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, used REAL, image BLOB)")
+            conn.execute("CREATE INDEX IF NOT EXISTS thumbnails_used ON thumbnails (used)")
+            self.total_bytes = conn.execute("SELECT COALESCE(SUM(LENGTH(image)), 0) FROM thumbnails").fetchone()[0]
+            self.keys = {path: (size, mtime) for path, size, mtime in
+                         conn.execute("SELECT path, size, mtime FROM thumbnails")}
+            self.conn = conn
+        return self.conn
+    
+    def contains(self, request):
+        """Whether a current thumbnail for (path, size, mtime) is stored, from memory only"""
+        return self.keys.get(request[0]) == tuple(request[1:])
+    
+    def load(self, request):
+        """PNG bytes stored for (path, size, mtime), or None when missing or stale"""
+        with self.lock:
+            conn = self.connect()
+            row = conn.execute("SELECT size, mtime, image FROM thumbnails WHERE path = ?",
+                               (request[0],)).fetchone()
+            if not row or (row[0], row[1]) != tuple(request[1:]):
+                return None
+            self.touched[request[0]] = time.time()
+            if len(self.touched) >= THUMBNAIL_TOUCH_BATCH:
+                with conn:
+                    self._write_touched(conn)
+            return row[2]
+    
+    def save(self, path, size, mtime, image):
+        with self.lock:
+            conn = self.connect()
+            with conn:
+                self._write_touched(conn)
+                row = conn.execute("SELECT LENGTH(image) FROM thumbnails WHERE path = ?", (path,)).fetchone()
+                replaced = row[0] if row and row[0] else 0
+                conn.execute("INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?, ?, ?)",
+                             (path, size, mtime, time.time(), image))
+                self.keys[path] = (size, mtime)
+                self.total_bytes += len(image) - replaced
+                if self.total_bytes > self.max_bytes:
+                    self._evict(conn)
+    
+    def flush(self):
+        """Write the pending last-shown times"""
+        with self.lock:
+            if self.conn is not None and self.touched:
+                with self.conn:
+                    self._write_touched(self.conn)
+    
+    def _write_touched(self, conn):
+        conn.executemany("UPDATE thumbnails SET used = ? WHERE path = ?",
+                         ((used, path) for path, used in self.touched.items()))
+        self.touched = {}
+    
+    def _evict(self, conn):
+        # Trim to 90% so the next few saves do not each evict again
+        target = self.max_bytes * 9 // 10
+        evicted = []
+        for path, length in conn.execute("SELECT path, LENGTH(image) FROM thumbnails ORDER BY used"):
+            if self.total_bytes <= target:
+                break
+            evicted.append((path,))
+            self.total_bytes -= length or 0
+        conn.executemany("DELETE FROM thumbnails WHERE path = ?", evicted)
+        for (path,) in evicted:
+            self.keys.pop(path, None)
+    
+    def close(self):
+        self.flush()
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+class ThumbnailLoader:
+    """Makes thumbnails on a pool of worker threads, the most wanted files first
+    
+    Requests are (path, size, mtime) tuples. Each want() call replaces the waiting
+    requests, so files that scrolled out of view are never read. Thumbnails already
+    in the cache are read back by a thread of their own, so they show at once even
+    while the workers wait on a slow share. on_ready(request, image) is called from
+    those threads with the PNG bytes, or b'' when the file has no picture to show.
+    """
+    
+    def __init__(self, cache, on_ready, workers=4):
+        self.cache = cache
+        self.on_ready = on_ready
+        self.workers = workers
+        self.pending = deque()
+        self.cached = deque()
+        self.in_progress = set()
+        self.threads = []
+        self.stopped = False
+        self.condition = threading.Condition()
+        # Also opens the cache file, which reads its keys into memory
+        threading.Thread(target=self._read_cached, daemon=True).start()
+    
+    def want(self, requests):
+        """Queue requests, most wanted first; only memory is touched, so this suits the UI thread"""
+        with self.condition:
+            requests = [request for request in requests if request not in self.in_progress]
+            self.cached = deque(request for request in requests if self.cache.contains(request))
+            self.pending = deque(request for request in requests if not self.cache.contains(request))
+            self._start_workers()
+            self.condition.notify_all()
+    
+    def _start_workers(self):
+        while len(self.threads) < min(self.workers, len(self.pending)):
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+    
+    def _next(self, waiting):
+        with self.condition:
+            while not self.stopped and not getattr(self, waiting):
+                self.condition.wait()
+            if self.stopped:
+                return None
+            request = getattr(self, waiting).popleft()
+            self.in_progress.add(request)
+            return request
+    
+    def _done(self, request, image):
+        with self.condition:
+            self.in_progress.discard(request)
+        if image is not None:
+            self.on_ready(request, image)
+    
+    def _read_cached(self):
+        try:
+            self.cache.connect()
+        except sqlite3.Error:
+            pass
+        while True:
+            request = self._next('cached')
+            if request is None:
+                return
+            try:
+                image = self.cache.load(request)
+            except sqlite3.Error:
+                image = None
+            if image is None:
+                # Evicted since it was queued - make it again
+                with self.condition:
+                    self.pending.appendleft(request)
+                    self._start_workers()
+                    self.condition.notify_all()
+            self._done(request, image)
+            if not self.cached:
+                try:
+                    self.cache.flush()
+                except sqlite3.Error:
+                    pass
+    
+    def _work(self):
+        while True:
+            request = self._next('pending')
+            if request is None:
+                return
+            
+            # Made by another loader, or stored before the keys were in memory
+            try:
+                image = self.cache.load(request)
+            except sqlite3.Error:
+                image = None
+            if image is None:
+                try:
+                    image = make_thumbnail(request[0])
+                except (OSError, RuntimeError):
+                    # Unreadable now (or no Pillow) is not cached, so the file is tried again later
+                    image = None
+                if image is not None:
+                    try:
+                        self.cache.save(*request, image)
+                    except sqlite3.Error:
+                        pass
+            self._done(request, image)
+    
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.pending.clear()
+            self.cached.clear()
+            self.condition.notify_all()
+
+EXPORT_FIELDS = ["name", "category", "size", "modified", "path"]
+EXPORT_BUFFER_SIZE = 1024 * 1024
+JSON_STRING = json.JSONEncoder(ensure_ascii=False).encode
+
+class ResultWriter:
+    """Writes results as CSV, tab separated text or JSON lines with sizes in bytes and ISO timestamps
+    
+    Rows can come from a FileStore or straight from a ParallelScanner's on_files
+    callback, so a scan can be written out without keeping its results in memory.
+    """
+    
+    def __init__(self, stream, fmt="csv", file_categories=FILE_CATEGORIES):
+        self.stream = stream
+        self.fmt = fmt
+        self.ext_categories = {}
+        for category, extensions in file_categories.items():
+            for ext in extensions:
+                self.ext_categories.setdefault(ext, category)
+        
+        self.count = 0
+        self.lock = threading.Lock()
+        # ISO text of each minute seen; files of one folder usually share a few minutes
+        self._minutes = {}
+        self._csv = None
+        if fmt in ("csv", "tsv"):
+            self._csv = csv.writer(stream, delimiter="\t" if fmt == "tsv" else ",", lineterminator="\n")
+            self._csv.writerow(EXPORT_FIELDS)
+    
+    def iso_time(self, mtime):
+        mtime = int(mtime)
+        seconds = mtime % 60
+        minute = self._minutes.get(mtime - seconds)
+        if minute is None:
+            if len(self._minutes) > 100000:
+                self._minutes.clear()
+            minute = datetime.fromtimestamp(mtime - seconds).isoformat(timespec='seconds')[:-2]
+            self._minutes[mtime - seconds] = minute
+        return f"{minute}{seconds:02d}"
+    
+    def _write(self, rows):
+        """Write a batch of (name, category, size, mtime, path) rows with one lock hold"""
+        iso_time = self.iso_time
+        rows = [(name, category, size, iso_time(mtime), path)
+                for name, category, size, mtime, path in rows]
+        with self.lock:
+            if self._csv is not None:
+                self._csv.writerows(rows)
+            else:
+                # Same text as json.dumps of a dict per row, without building the dicts
+                encode = JSON_STRING
+                self.stream.write("".join(
+                    f'{{"name": {encode(name)}, "category": {encode(category)}, "size": {size}, '
+                    f'"modified": "{modified}", "path": {encode(path)}}}\n'
+                    for name, category, size, modified, path in rows))
+            self.count += len(rows)
+    
+    def write_row(self, name, category, size, mtime, path):
+        self._write([(name, category, size, mtime, path)])
+    
+    def write_files(self, directory, files):
+        """Write the (name, size, mtime) tuples found in one folder"""
+        ext_categories = self.ext_categories
+        self._write([(name, ext_categories.get(os.path.splitext(name)[1].lower(), "Other"),
+                      size, mtime, os.path.join(directory, name))
+                     for name, size, mtime in files])
+    
+    def write_store_rows(self, store, row_ids):
+        # Same result as store.path() without an os.path.join per row
+        prefixes = {}
+        rows = []
+        for row_id in row_ids:
+            dir_id = store.dir_col[row_id]
+            prefix = prefixes.get(dir_id)
+            if prefix is None:
+                prefix = prefixes[dir_id] = os.path.join(store.directories[dir_id], '')
+            name = store.names[row_id]
+            rows.append((name, store.category_names[store.category_col[row_id]],
+                         store.sizes[row_id], store.mtimes[row_id], prefix + name))
+        self._write(rows)
+
+def export_format(path):
+    """Output format implied by an export file name, ignoring a .gz suffix"""
+    name = path.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    if name.endswith('.jsonl') or name.endswith('.json'):
+        return "jsonl"
+    if name.endswith('.txt') or name.endswith('.tsv'):
+        return "tsv"
+    return "csv"
+
+def open_export(path):
+    """Open an export file for buffered text writing, gzip-compressed when the name ends in .gz"""
+    if path.lower().endswith('.gz'):
+        # Level 6 compresses nearly as well as the default 9 at a fraction of the time
+        compressed = gzip.open(path, 'wb', compresslevel=6)
+        return io.TextIOWrapper(io.BufferedWriter(compressed, EXPORT_BUFFER_SIZE),
+                                encoding='utf-8', newline='')
+    return open(path, 'w', newline='', encoding='utf-8', buffering=EXPORT_BUFFER_SIZE)
+
+def export_rows(store, row_ids, path, on_progress=None, should_continue=None, chunk_size=10000):
+    """Write store rows to path chunk by chunk
+    
+    Returns the number of rows written, or None when should_continue stopped the
+    export; the partial file is removed then.
+    """
+    should_continue = should_continue or (lambda: True)
+    total = len(row_ids)
+    
+    with open_export(path) as stream:
+        writer = ResultWriter(stream, export_format(path))
+        for start in range(0, total, chunk_size):
+            if not should_continue():
+                break
+            writer.write_store_rows(store, row_ids[start:start + chunk_size])
+            if on_progress:
+                on_progress(min(start + chunk_size, total), total)
+        else:
+            return writer.count
+    
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    return None
+
+def confidence_range(samples, lower_bound=0):
+    """Mean of the probe estimates with a 95% confidence interval, clipped below at what was counted"""
+    mean = statistics.fmean(samples)
+    if len(samples) < 2:
+        return mean, max(mean, lower_bound), None
+    half_width = 1.96 * statistics.stdev(samples) / math.sqrt(len(samples))
+    return mean, max(mean - half_width, lower_bound), mean + half_width
+
+def estimate_tree(path, extensions, budget=3.0, workers=8, should_continue=None,
+                  on_progress=None, rng=None, telemetry=None):
+    """Estimate the folder, file and scan time totals of a tree within a time budget
+    
+    The top of the tree is listed breadth first for up to a third of the budget; a
+    tree that small is counted exactly. Otherwise the remaining time goes to random
+    probes (Knuth's estimator) from a random folder of the unlisted frontier down to
+    a leaf: each folder on the path is weighted by the product of the fan-outs above
+    it, which makes every probe an unbiased estimate of what lies below the counted
+    top. The spread of the probes gives a normal-approximation interval, which is
+    optimistic on very uneven trees where one branch holds most of the folders.
+    Listings are cached, so only real listings count towards the folder latency.
+    """
+    should_continue = should_continue or (lambda: True)
+    rng = rng or random.Random()
+    start_time = time.perf_counter()
+    deadline = start_time + budget
+    
+    listings = {}
+    latencies = []
+    file_types = {}
+    large_folders = []
+    errors = []
+    seen = {'files': 0}
+    
+    def list_directory(directory):
+        listing = listings.get(directory)
+        if listing is not None:
+            return listing
+        
+        started = time.perf_counter()
+        stat_times = []
+        subdirs = []
+        files = 0
+        matching = 0
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        # Same rules as ParallelScanner
+                        if entry.is_dir():
+                            if not entry.is_symlink():
+                                subdirs.append(entry.path)
+                            continue
+                    except OSError:
+                        pass
+                    
+                    files += 1
+                    ext = os.path.splitext(entry.name)[1].lower()
+                    if ext in extensions:
+                        matching += 1
+                        file_types[ext] = file_types.get(ext, 0) + 1
+                        stat_started = time.perf_counter()
+                        try:
+                            # The scanner stats every match, so that is part of the cost
+                            entry.stat()
+                        except OSError:
+                            pass
+                        stat_times.append(time.perf_counter() - stat_started)
+        except OSError as e:
+            if len(errors) < 10:
+                errors.append(str(e))
+        latencies.append(time.perf_counter() - started)
+        if telemetry:
+            telemetry.record_directory(directory, latencies[-1] - sum(stat_times), stat_times, matching)
+        
+        if files > 100:
+            large_folders.append({'path': directory, 'file_count': files})
+        
+        seen['files'] += files
+        listing = listings[directory] = (subdirs, files, matching)
+        if on_progress and len(listings) % 50 == 0:
+            on_progress(len(listings), seen['files'])
+        return listing
+    
+    frontier = deque([path])
+    while frontier and should_continue() and time.perf_counter() < start_time + budget / 3:
+        frontier.extend(list_directory(frontier.popleft())[0])
+    exact = not frontier
+    frontier = list(frontier)
+    counted_top = (len(listings), seen['files'], sum(listing[2] for listing in listings.values()))
+    
+    samples = []
+    while not exact and should_continue() and time.perf_counter() < deadline:
+        directory = rng.choice(frontier)
+        weight = len(frontier)
+        totals = list(counted_top)
+        while directory is not None:
+            # A probe cut short would be biased, so it is dropped instead
+            if time.perf_counter() > deadline + budget / 2:
+                totals = None
+                break
+            subdirs, files, matching = list_directory(directory)
+            totals[0] += weight
+            totals[1] += weight * files
+            totals[2] += weight * matching
+            weight *= len(subdirs)
+            directory = rng.choice(subdirs) if subdirs else None
+        if totals is None:
+            break
+        samples.append(totals)
+        
+        # Stop early once the folder estimate is within 5%
+        if len(samples) >= 30:
+            folders, low, high = confidence_range([s[0] for s in samples])
+            if high - folders < 0.05 * folders:
+                break
+    
+    counted = (len(listings), seen['files'], sum(listing[2] for listing in listings.values()))
+    if samples:
+        folders, files, matching = (confidence_range([s[i] for s in samples], counted[i]) for i in range(3))
+    else:
+        # Counted exactly, or stopped before a single probe finished
+        folders, files, matching = ((total, total, total if exact else None) for total in counted)
+    
+    # Listings run in parallel during a scan, so divide by the worker count
+    folder_latency = statistics.fmean(latencies) if latencies else 0
+    scan_time = tuple(None if value is None else value * folder_latency / max(1, workers)
+                      for value in folders)
+    
+    return {
+        'exact': exact,
+        'probes': len(samples),
+        'listed_folders': len(listings),
+        'folder_latency': folder_latency,
+        'folders': folders,
+        'files': files,
+        'matching_files': matching,
+        'scan_time': scan_time,
+        'file_types': file_types,
+        'large_folders': large_folders,
+        'errors': errors
+    }
+
+def diagnose_path(path, extensions, should_continue=None, on_progress=None, workers=8, budget=3.0):
+    """Estimate the size and scan time of path by sampling it for a few seconds"""
+    diagnosis = {
+        'path': path,
+        'is_network': is_network_path(path),
+        'accessible': True,
+        'total_folders': 0,
+        'total_files': 0,
+        'file_types': {},
+        'large_folders': [],
+        'errors': [],
+        'estimated_scan_time': 0
+    }
+    
+    try:
+        with os.scandir(path):
+            pass
+    except OSError as e:
+        diagnosis['accessible'] = False
+        diagnosis['errors'].append(str(e))
+        return diagnosis
+    
+    telemetry = ScanTelemetry()
+    estimate = estimate_tree(path, extensions, budget, workers, should_continue, on_progress,
+                             telemetry=telemetry)
+    telemetry.finish()
+    diagnosis.update({
+        'total_folders': round(estimate['folders'][0]),
+        'total_files': round(estimate['files'][0]),
+        'matching_files': round(estimate['matching_files'][0]),
+        'estimated_scan_time': estimate['scan_time'][0],
+        'file_types': estimate['file_types'],
+        'large_folders': estimate['large_folders'],
+        'errors': estimate['errors'],
+        'estimate': estimate,
+        'workers': workers,
+        'telemetry': telemetry.snapshot()
+    })
+    return diagnosis
+
+def format_estimate(value_range, exact, fmt="{:,.0f}"):
+    """'~value (95% range: low - high)', or just the value when it was counted exactly"""
+    value, low, high = value_range
+    if exact:
+        return fmt.format(value)
+    if high is None:
+        return f"~{fmt.format(value)} (too few samples for a range)"
+    return f"~{fmt.format(value)} (95% range: {fmt.format(low)} - {fmt.format(high)})"
+
+def diagnosis_report(diagnosis, file_categories=FILE_CATEGORIES):
+    report = f"""🔍 FOLDER DIAGNOSIS REPORT
+{'='*50}
+
+📁 Path: {diagnosis['path']}
+🌐 Network Location: {'Yes' if diagnosis['is_network'] else 'No'}
+✅ Accessible: {'Yes' if diagnosis['accessible'] else 'No'}
+
+📊 SUMMARY STATISTICS
+{'='*25}"""
+    
+    estimate = diagnosis.get('estimate')
+    if estimate:
+        exact = estimate['exact']
+        report += f"\n📂 Total Folders: {format_estimate(estimate['folders'], exact)}"
+        report += f"\n📄 Total Files: {format_estimate(estimate['files'], exact)}"
+        report += f"\n🎯 Matching Files: {format_estimate(estimate['matching_files'], exact)}"
+        report += (f"\n⏱️ Estimated Scan Time: {format_estimate(estimate['scan_time'], exact, '{:.1f}')} seconds"
+                   f" with {diagnosis['workers']} workers")
+        if exact:
+            report += f"\n🔬 Sample: whole tree listed, {estimate['folder_latency'] * 1000:.1f} ms per folder"
+        else:
+            report += (f"\n🔬 Sample: {estimate['probes']} random probes over {estimate['listed_folders']:,} folders,"
+                       f" {estimate['folder_latency'] * 1000:.1f} ms per folder")
+    else:
+        report += f"\n📂 Total Folders: {diagnosis['total_folders']:,}"
+        report += f"\n📄 Total Files: {diagnosis['total_files']:,}"
+    
+    report += f"\n\n🎯 FILE TYPES FOUND\n{'='*20}"
+    
+    if diagnosis['file_types']:
+        for ext, count in sorted(diagnosis['file_types'].items(), key=lambda x: x[1], reverse=True):
+            category = get_file_category(ext, file_categories)
+            report += f"\n{ext.upper():>6} files: {count:>6,} ({category})"
+    else:
+        report += "\nNo matching file types found in sample."
+    
+    if diagnosis['large_folders']:
+        report += f"\n\n📁 LARGE FOLDERS (>100 files)\n{'='*30}"
+        for folder in diagnosis['large_folders'][:10]:
+            report += f"\n{folder['file_count']:>4} files: {folder['path']}"
+        if len(diagnosis['large_folders']) > 10:
+            report += f"\n... and {len(diagnosis['large_folders']) - 10} more folders"
+    
+    if diagnosis['errors']:
+        report += f"\n\n⚠️ ERRORS ENCOUNTERED\n{'='*20}"
+        for error in diagnosis['errors']:
+            report += f"\n• {error}"
+    
+    report += f"\n\n💡 RECOMMENDATIONS\n{'='*18}"
+    
+    if diagnosis['estimated_scan_time'] > 60:
+        report += f"\n• ⏰ Large folder detected - scan may take {diagnosis['estimated_scan_time']/60:.1f} minutes"
+        report += "\n• 💡 Consider using Quick Scan with specific file type filters"
+    
+    if diagnosis['is_network']:
+        report += "\n• 🌐 Network location - ensure stable connection during scan"
+        report += "\n• 🔄 Network scan may be slower than local scan"
+    
+    if len(diagnosis['large_folders']) > 5:
+        report += "\n• 📁 Many large folders detected - consider scanning subfolders individually"
+    
+    if not diagnosis['file_types']:
+        report += "\n• ❓ No matching file types found in sample - check your file filters"
+    
+    # Listing timings of the sample, and of the last scan when the GUI has one
+    telemetry = {key: diagnosis[key] for key in ('telemetry', 'scan_telemetry') if diagnosis.get(key)}
+    if telemetry:
+        report += f"\n\n📈 TELEMETRY (JSON)\n{'='*20}\n{json.dumps(telemetry, indent=2)}"
+    
+    report += f"\n\n📅 Diagnosis completed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    
+    return report
+
+def scan_to_writer(path, writer, extensions, name_filter=None, workers=8, stop_event=None,
+                   telemetry=None, rules=None, sizes=None, limits=None):
+    """Scan path and hand each folder's matches to writer without keeping them
+    
+    path may be a list of roots, which are then scanned together by one MultiRootScanner.
+    When sizes (a FolderSizes) is given, the written matches are also rolled up into it;
+    with limits (a ServerLimits) each server's concurrency adapts to its latency.
+    """
+    name_filter = name_filter.lower() if name_filter else None
+    stop_event = stop_event or threading.Event()
+    errors = []
+    
+    def on_files(directory, files):
+        if name_filter:
+            files = [file for file in files if name_filter in file[0].lower()]
+        if sizes is not None:
+            sizes.add_files(directory, files)
+        try:
+            writer.write_files(directory, files)
+        except (OSError, ValueError) as e:
+            # Output went away (closed pipe, full disk) - no point scanning further
+            errors.append(e)
+            stop_event.set()
+    
+    options = dict(workers=workers,
+                   should_continue=lambda: not stop_event.is_set(),
+                   on_files=on_files,
+                   telemetry=telemetry,
+                   rules=rules)
+    if isinstance(path, str):
+        limiter = limits.for_path(path) if limits is not None else None
+        scanner = ParallelScanner(path, extensions, limiter=limiter, **options)
+    else:
+        scanner = MultiRootScanner(path, extensions, limits=limits, **options)
+    scanner.run()
+    if errors:
+        raise errors[0]
+    return scanner
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Scan a folder or network share without the GUI and write the matching "
+                    "files as CSV or JSON lines.")
+    parser.add_argument("path", nargs="+",
+                        help="folder or UNC path to scan; give several to scan them together")
+    parser.add_argument("-f", "--format", choices=["csv", "tsv", "jsonl"],
+                        help="output format (default: from the output file name, else csv)")
+    parser.add_argument("-o", "--output",
+                        help="write to this file instead of stdout; a .gz name is gzip-compressed")
+    parser.add_argument("-c", "--category", action="append", choices=list(FILE_CATEGORIES),
+                        help="only files of this category; repeat for more")
+    parser.add_argument("-e", "--ext", action="append",
+                        help="only files with this extension, e.g. .pdf; repeat for more")
+    parser.add_argument("-n", "--name", help="only files whose name contains this text")
+    parser.add_argument("--include", action="append", default=[], metavar="GLOB",
+                        help="only files whose name matches this pattern, e.g. 'report*'; repeat for more")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                        help="skip files whose name matches this pattern; repeat for more")
+    parser.add_argument("--regex", help="only files whose name matches this regular expression")
+    parser.add_argument("--min-size", type=parse_size, metavar="SIZE",
+                        help="only files of at least this size, e.g. 10MB")
+    parser.add_argument("--max-size", type=parse_size, metavar="SIZE",
+                        help="only files of at most this size")
+    parser.add_argument("--newer", type=parse_date, metavar="DATE",
+                        help="only files modified on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--older", type=parse_date, metavar="DATE",
+                        help="only files modified before this date (YYYY-MM-DD)")
+    parser.add_argument("--exclude-dir", action="append", default=[], metavar="PATTERN",
+                        help="never enter folders matching this name or path pattern; repeat for more")
+    parser.add_argument("--no-default-excludes", action="store_true",
+                        help="also enter " + ", ".join(DEFAULT_EXCLUDED_DIRS))
+    parser.add_argument("-w", "--workers", type=int, default=8,
+                        help="parallel folder listings (default: 8)")
+    parser.add_argument("--server-cap", action="append", default=[], metavar="SERVER=N",
+                        help="never have more than N calls in flight to this server (UNC name, NFS "
+                             "server or mount point); repeat for more")
+    parser.add_argument("--fixed-workers", action="store_true",
+                        help="keep all workers busy instead of adapting to the server's latency")
+    parser.add_argument("--diagnose", action="store_true",
+                        help="print a diagnosis report for the path instead of scanning")
+    parser.add_argument("--largest", type=int, metavar="N",
+                        help="after the scan, list the N folders holding the most matching bytes")
+    parser.add_argument("--telemetry", metavar="FILE",
+                        help="write scan timings (rates, latency histograms, slowest folders) as JSON")
+    return parser.parse_args(argv)
+
+def rules_from_args(args, extensions):
+    excluded = ([] if args.no_default_excludes else list(DEFAULT_EXCLUDED_DIRS)) + args.exclude_dir
+    return ScanRules(extensions, include=args.include, exclude=args.exclude, regex=args.regex,
+                     min_size=args.min_size, max_size=args.max_size, modified_after=args.newer,
+                     modified_before=args.older, exclude_dirs=excluded)
+
+def main(argv=None):
+    args = parse_args(argv)
+    
+    for path in args.path:
+        if not os.path.isdir(path):
+            print(f"Error: the path '{path}' does not exist or is not accessible.", file=sys.stderr)
+            return 2
+    roots = unique_roots(args.path)
+    scan_path = roots[0] if len(roots) == 1 else roots
+    
+    extensions = select_extensions(FILE_CATEGORIES, args.category, args.ext)
+    try:
+        rules = rules_from_args(args, extensions)
+    except re.error as e:
+        print(f"Error: invalid --regex: {e}", file=sys.stderr)
+        return 2
+    
+    try:
+        caps = parse_server_caps(args.server_cap)
+    except ValueError as e:
+        print(f"Error: invalid --server-cap: {e}", file=sys.stderr)
+        return 2
+    limits = None if args.fixed_workers else ServerLimits(caps, default_cap=args.workers)
+    
+    if args.diagnose:
+        print("\n\n".join(diagnosis_report(diagnose_path(root, extensions, workers=args.workers))
+                          for root in roots))
+        return 0
+    
+    try:
+        output = open_export(args.output) if args.output else sys.stdout
+    except OSError as e:
+        print(f"Error: could not open output file: {e}", file=sys.stderr)
+        return 2
+    
+    writer = ResultWriter(output, args.format or export_format(args.output or ""))
+    telemetry = ScanTelemetry()
+    sizes = FolderSizes(roots, FILE_CATEGORIES) if args.largest else None
+    stop_event = threading.Event()
+    outcome = {}
+    done = threading.Event()
+    
+    def run():
+        try:
+            outcome['scanner'] = scan_to_writer(scan_path, writer, extensions, args.name,
+                                                args.workers, stop_event, telemetry, rules, sizes,
+                                                limits)
+        except Exception as e:
+            outcome['error'] = e
+        finally:
+            done.set()
+    
+    # The scan runs on its own thread so Ctrl+C reaches the main thread and stops it cleanly
+    start_time = time.time()
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    
+    # Waiting on an event rather than join() keeps Ctrl+C responsive on every platform
+    interrupted = False
+    try:
+        while not done.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        interrupted = True
+        stop_event.set()
+        done.wait()
+    finally:
+        try:
+            if output is sys.stdout:
+                output.flush()
+            else:
+                output.close()
+        except OSError:
+            pass
+    
+    if isinstance(outcome.get('error'), BrokenPipeError):
+        # The reader went away early (e.g. piped into head) - quietly drop what is left
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    
+    if 'error' in outcome:
+        print(f"Error: {outcome['error']}", file=sys.stderr)
+        return 1
+    
+    counters = outcome['scanner'].counters
+    elapsed = time.time() - start_time
+    status = "Scan stopped" if interrupted else "Scan complete"
+    snapshot = telemetry.snapshot()
+    pruned = f" ({counters['directories_pruned']} excluded)" if counters['directories_pruned'] else ""
+    print(f"{status}: {writer.count} files from {counters['directories_listed']} folders{pruned} "
+          f"in {elapsed:.1f} seconds ({snapshot['directories_per_second']:,.0f} folders/s, "
+          f"listing p90 <= {snapshot['listing_latency']['p90_ms']} ms)", file=sys.stderr)
+    if counters['directories_failed']:
+        print(f"Warning: {counters['directories_failed']} folders failed and were not scanned:", file=sys.stderr)
+        for path, error in outcome['scanner'].failures:
+            print(f"  {path}: {error}", file=sys.stderr)
+    if len(roots) > 1:
+        for row in outcome['scanner'].progress():
+            print(f"  {row['root']}: {row['files']} files from {row['directories']} folders",
+                  file=sys.stderr)
+    if sizes is not None:
+        print(format_largest_folders(sizes, args.largest), file=sys.stderr)
+    
+    if args.telemetry:
+        try:
+            with open(args.telemetry, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, indent=2)
+        except OSError as e:
+            print(f"Error: could not write telemetry: {e}", file=sys.stderr)
+            return 1
+    return 130 if interrupted else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,277 @@
+import io
+import os
+import csv
+import gzip
+import json
+import random
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+from unittest import mock
+
+import scan_engine
+from scan_engine import (FILE_CATEGORIES, FileStore, ParallelScanner, ScanIndex, SortIndex,
+                         all_extensions, find_duplicates, parse_roots, format_roots)
+
+# Headless checks of the scan engine on small trees built in a temporary folder.
+# Run from the repository root: python -m unittest discover tests (or pytest).
+
+EXTENSIONS = all_extensions(FILE_CATEGORIES)
+
+def write_file(path, data, mtime=1600000000):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    os.utime(path, (mtime, mtime))
+
+def scan(root, workers=4, **options):
+    store = FileStore(FILE_CATEGORIES)
+    scanner = ParallelScanner(root, EXTENSIONS, store, workers=workers, **options)
+    scanner.run()
+    return store, scanner
+
+def store_files(store):
+    """Sorted (path, size, mtime) of the store's live rows"""
+    return sorted((store.path(row_id), store.sizes[row_id], store.mtimes[row_id])
+                  for row_id in range(len(store)) if row_id not in store.removed)
+
+class TreeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="scan_engine_test_")
+        self.addCleanup(shutil.rmtree, self.root, True)
+    
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+    
+    def make_tree(self, depth=3, fanout=3, files=4):
+        """Nested folders with matching and non-matching files; returns the matching paths"""
+        expected = []
+        folders = [self.root]
+        for level in range(depth + 1):
+            next_folders = []
+            for folder in folders:
+                for i in range(files):
+                    for ext in ('.pdf', '.tmp'):
+                        path = os.path.join(folder, f"file_{level}_{i}{ext}")
+                        write_file(path, b"x" * (i + 1), 1600000000 + i)
+                        if ext == '.pdf':
+                            expected.append((path, i + 1, 1600000000 + i))
+                if level < depth:
+                    for i in range(fanout):
+                        subfolder = os.path.join(folder, f"folder_{i}")
+                        os.mkdir(subfolder)
+                        next_folders.append(subfolder)
+            folders = next_folders
+        return sorted(expected)
+
+class ParallelScannerTest(TreeTestCase):
+    def test_worker_count_does_not_change_the_result(self):
+        expected = self.make_tree()
+        results = []
+        for workers in (1, 8):
+            store, scanner = scan(self.root, workers=workers)
+            self.assertEqual(store_files(store), expected)
+            results.append((scanner.counters['directories_listed'], scanner.counters['directories_failed']))
+        self.assertEqual(results, [(40, 0), (40, 0)])
+    
+    def test_failing_callback_is_counted_not_fatal(self):
+        self.make_tree(depth=1, fanout=2, files=1)
+        
+        def on_files(directory, files):
+            raise RuntimeError("callback bug")
+        
+        _, scanner = scan(self.root, workers=2, on_files=on_files)
+        self.assertEqual(scanner.counters['directories_failed'], 3)
+        self.assertEqual(len(scanner.failures), 3)
+
+class CommandLineTest(TreeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.expected = self.make_tree(depth=2, fanout=3, files=2)
+        out_dir = tempfile.mkdtemp(prefix="scan_engine_out_")
+        self.addCleanup(shutil.rmtree, out_dir, True)
+        self.out_dir = out_dir
+    
+    def run_main(self, *args):
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            status = scan_engine.main(list(args))
+        self.assertEqual(status, 0, stderr.getvalue())
+        return stderr.getvalue()
+    
+    def test_csv_matches_a_store_scan(self):
+        output = os.path.join(self.out_dir, "files.csv")
+        report = self.run_main(self.root, "-o", output, "-w", "4")
+        with open(output, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        
+        store, _ = scan(self.root)
+        self.assertEqual(sorted((row['path'], int(row['size'])) for row in rows),
+                         [(path, size) for path, size, _ in store_files(store)])
+        self.assertIn(f"Scan complete: {len(self.expected)} files from 13 folders", report)
+    
+    def test_filters_and_gzip_jsonl(self):
+        output = os.path.join(self.out_dir, "files.jsonl.gz")
+        self.run_main(self.root, "-o", output, "--exclude-dir", "folder_1", "--min-size", "2")
+        with gzip.open(output, 'rt', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        
+        excluded = os.sep + "folder_1"
+        self.assertEqual(sorted((row['path'], row['size'], row['category']) for row in rows),
+                         [(path, size, 'Documents') for path, size, _ in self.expected
+                          if size >= 2 and excluded not in path[len(self.root):]])
+
+class ScanIndexTest(TreeTestCase):
+    def setUp(self):
+        super().setUp()
+        # The database lives outside the scanned tree so it never changes a folder's mtime
+        db_dir = tempfile.mkdtemp(prefix="scan_engine_index_")
+        self.addCleanup(shutil.rmtree, db_dir, True)
+        self.index = ScanIndex(os.path.join(db_dir, "index.db"))
+        self.expected = self.make_tree(depth=2, fanout=2, files=2)
+        self.rescan()
+    
+    def rescan(self):
+        store, scanner = scan(self.root, cache=self.index.load_tree(self.root, EXTENSIONS))
+        self.index.save_tree(scanner.index_updates, scanner.removed_directories())
+        return store, scanner
+    
+    def touch_folder(self, folder, mtime=1700000000):
+        # Some filesystems keep coarse folder mtimes; a fixed new one is always a change
+        os.utime(folder, (mtime, mtime))
+    
+    def test_unchanged_tree_is_not_listed_again(self):
+        store, scanner = self.rescan()
+        self.assertEqual(store_files(store), self.expected)
+        self.assertEqual(scanner.counters['directories_listed'], 0)
+        self.assertEqual(scanner.counters['directories_cached'], 7)
+    
+    def test_added_file_is_found(self):
+        folder = self.path("folder_1")
+        write_file(os.path.join(folder, "new.pdf"), b"new", 1650000000)
+        self.touch_folder(folder)
+        
+        store, scanner = self.rescan()
+        self.assertEqual(store_files(store),
+                         sorted(self.expected + [(os.path.join(folder, "new.pdf"), 3, 1650000000)]))
+        self.assertEqual(scanner.counters['directories_listed'], 1)
+        self.assertEqual(store_files(self.rescan()[0]), store_files(store))
+    
+    def test_removed_file_and_folder_are_dropped(self):
+        removed_file = self.path("folder_0", "file_1_0.pdf")
+        os.remove(removed_file)
+        self.touch_folder(self.path("folder_0"))
+        shutil.rmtree(self.path("folder_1", "folder_0"))
+        self.touch_folder(self.path("folder_1"))
+        
+        store, scanner = self.rescan()
+        removed_folder = self.path("folder_1", "folder_0") + os.sep
+        self.assertEqual(store_files(store),
+                         [file for file in self.expected
+                          if file[0] != removed_file and not file[0].startswith(removed_folder)])
+        self.assertEqual(scanner.counters['directories_listed'], 2)
+        self.assertEqual(scanner.removed_directories(), {self.path("folder_1", "folder_0")})
+        self.assertNotIn(self.path("folder_1", "folder_0"), self.index.load_tree(self.root, EXTENSIONS))
+
+class FindDuplicatesTest(TreeTestCase):
+    def setUp(self):
+        super().setUp()
+        edge = b"e" * scan_engine.HASH_EDGE_SIZE
+        # Same size and same first and last few KB, so only the full hash tells them apart
+        self.first = edge + b"a" * 20000 + edge
+        self.second = edge + b"b" * 20000 + edge
+    
+    def duplicates(self):
+        store, _ = scan(self.root)
+        result = find_duplicates(store, range(len(store)), workers=2)
+        return [(size, sorted(store.names[row_id] for row_id in group)) for size, _, group in result]
+    
+    def test_groups_identical_files_only(self):
+        write_file(self.path("a.txt"), self.first)
+        write_file(self.path("sub", "a copy.txt"), self.first)
+        write_file(self.path("b.txt"), self.second)
+        write_file(self.path("small.txt"), b"same")
+        write_file(self.path("sub", "small copy.txt"), b"same")
+        write_file(self.path("other.txt"), b"diff")
+        write_file(self.path("alone.txt"), b"only one of this size")
+        
+        groups = self.duplicates()
+        self.assertEqual(groups, [(len(self.first), ["a copy.txt", "a.txt"]),
+                                  (4, ["small copy.txt", "small.txt"])])
+    
+    def test_unreadable_full_hash_is_not_a_duplicate(self):
+        write_file(self.path("a.txt"), self.first)
+        write_file(self.path("b.txt"), self.second)
+        
+        with mock.patch.object(scan_engine, 'full_hash', side_effect=OSError("read failed")):
+            groups = self.duplicates()
+        self.assertEqual(groups, [])
+    
+    def test_unreadable_file_drops_out_of_its_group(self):
+        write_file(self.path("a.txt"), self.first)
+        write_file(self.path("a copy.txt"), self.first)
+        write_file(self.path("a gone.txt"), self.first)
+        store, _ = scan(self.root)
+        os.remove(self.path("a gone.txt"))
+        
+        result = find_duplicates(store, range(len(store)), workers=2)
+        self.assertEqual([sorted(store.names[row_id] for row_id in group) for _, _, group in result],
+                         [["a copy.txt", "a.txt"]])
+
+class RootsTextTest(unittest.TestCase):
+    def test_semicolon_stays_in_a_single_path(self):
+        self.assertEqual(parse_roots("  /srv/a;b  "), ["/srv/a;b"])
+        self.assertEqual(parse_roots("\\\\nas01\\plans;2024"), ["\\\\nas01\\plans;2024"])
+        self.assertEqual(parse_roots(""), [])
+    
+    def test_quoted_roots(self):
+        self.assertEqual(parse_roots('"/srv/a;b"; "Z:\\"'), ["/srv/a;b", "Z:\\"])
+        self.assertEqual(parse_roots('"/srv/a";'), ["/srv/a"])
+        # Text that is not a list of quoted roots is one path, quotes and all
+        self.assertEqual(parse_roots('"/srv/a" b'), ['"/srv/a" b'])
+    
+    def test_format_round_trip(self):
+        for roots in (["/srv/a;b"], ["/srv/a;b", "/srv/c"], ['/srv/say "hi"', "Z:\\"], ['"quoted']):
+            self.assertEqual(parse_roots(format_roots(roots)), roots)
+
+class SortIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(0)
+        self.store = FileStore(FILE_CATEGORIES)
+        self.index = SortIndex()
+    
+    def add_rows(self, count):
+        # Few distinct names, sizes and dates, so every column has plenty of ties
+        rng = self.rng
+        for _ in range(count // 10):
+            folder = f"/share/{rng.choice(['b', 'A', 'c'])}/{rng.randrange(5)}"
+            self.store.add_files(folder, [(f"{rng.choice(['Plan', 'plan', 'notes', 'z'])}{rng.randrange(4)}"
+                                           f"{rng.choice(['.pdf', '.dwg', '.png', '.tmp'])}",
+                                           rng.randrange(50), 1600000000 + rng.randrange(20))
+                                          for _ in range(10)])
+    
+    def assert_full_sort_order(self):
+        for column in SortIndex.COLUMNS:
+            order = list(self.index.order(self.store, column))
+            self.assertEqual(order, sorted(range(len(self.store)), key=self.index.sort_key(column)), column)
+    
+    def test_merged_orders_match_a_full_sort(self):
+        self.add_rows(3200)
+        self.assert_full_sort_order()
+        # Few new rows take the binary search merge, many new rows the linear merge
+        self.add_rows(100)
+        self.assert_full_sort_order()
+        self.add_rows(2000)
+        self.assert_full_sort_order()
+    
+    def test_sorting_a_subset(self):
+        self.add_rows(2000)
+        for count in (50, 1500):
+            rows = self.rng.sample(range(len(self.store)), count)
+            for column in SortIndex.COLUMNS:
+                ascending = list(self.index.sort(self.store, rows, column))
+                key = self.index.sort_key(column)
+                self.assertEqual(ascending, sorted(rows, key=lambda row_id: (key(row_id), row_id)))
+                self.assertEqual(list(self.index.sort(self.store, rows, column, descending=True)),
+                                 ascending[::-1])
\ No newline at end of file